@@ -0,0 +1,269 @@
+"""
+Control de admisión y descarte de carga.
+
+Ante una sobrecarga es preferible rechazar pronto (429/503 con
+Retry-After) que dejar que los requests se encolen esperando una
+conexión: los requests aceptados conservan su latencia y /health sigue
+respondiendo. Se aplican, en orden, un límite global de requests en
+curso, límites de concurrencia y de tasa (token bucket) por clase de
+ruta, y un umbral sobre la espera del pool de conexiones.
+
+Las rutas pesadas (exportación y administración) tienen su propia clase
+"heavy": unas pocas exportaciones largas no ocupan los cupos de lectura
+que necesita GET /tasks.
+"""
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from database import PoolWaitMonitor
+
+# Rutas que nunca se descartan: salud, monitoreo y documentación
+EXEMPT_PATHS = {"/", "/health", "/metrics", "/docs", "/redoc", "/openapi.json", "/tasks/stream"}
+EXEMPT_PREFIXES = ("/docs/",)
+
+# Rutas largas o costosas, limitadas aparte de las lecturas y escrituras
+HEAVY_PATHS = {"/tasks/export"}
+HEAVY_PREFIXES = ("/admin/",)
+
+# Métodos que escriben en la base (SQLite admite un solo escritor)
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+# POST que solo leen
+READ_ONLY_POSTS = {"/tasks:batchGet"}
+
+
+class TokenBucket:
+    """
+    Limitador de tasa: `rate` tokens por segundo con ráfagas de hasta `burst`.
+    """
+
+    def __init__(self, rate: float, burst: int, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = float(burst)
+        self._updated = clock()
+
+    def take(self) -> float:
+        """
+        Intenta consumir un token.
+
+        Returns:
+            0 si se obtuvo el token; si no, segundos hasta el próximo token
+        """
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+@dataclass
+class RouteClass:
+    """
+    Clase de rutas con límites propios.
+
+    Atributos:
+        name: Nombre de la clase ("read", "write" o "heavy")
+        max_concurrent: Requests simultáneos permitidos (0 = sin límite)
+        bucket: Limitador de tasa (None = sin límite)
+        in_flight: Requests de la clase en curso
+    """
+    name: str
+    max_concurrent: int = 0
+    bucket: Optional[TokenBucket] = None
+    in_flight: int = 0
+    admitted: int = 0
+    shed: dict = field(default_factory=lambda: {"concurrency": 0, "rate": 0, "pool": 0})
+
+
+@dataclass(frozen=True)
+class Rejection:
+    """
+    Motivo de rechazo de un request.
+    """
+    status_code: int
+    retry_after: int
+    reason: str
+
+
+class AdmissionController:
+    """
+    Decide si un request entra o se descarta.
+
+    Se usa solo desde el event loop (en el middleware), por lo que los
+    contadores no necesitan lock.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = 0,
+        classes: Optional[dict[str, RouteClass]] = None,
+        pool_monitor: Optional[PoolWaitMonitor] = None,
+        pool_wait_ms: float = 0,
+        retry_after_seconds: int = 1
+    ):
+        self.max_in_flight = max_in_flight
+        self.classes = classes or {
+            "read": RouteClass("read"), "write": RouteClass("write"), "heavy": RouteClass("heavy"),
+        }
+        self.pool_monitor = pool_monitor
+        self.pool_wait_ms = pool_wait_ms
+        self.retry_after_seconds = retry_after_seconds
+        self.in_flight = 0
+        self.shed_global = 0
+
+    def classify(self, method: str, path: str) -> Optional[RouteClass]:
+        """
+        Retorna la clase de la ruta, o None si está exenta.
+        """
+        if path in EXEMPT_PATHS or path.startswith(EXEMPT_PREFIXES):
+            return None
+        if path in HEAVY_PATHS or path.startswith(HEAVY_PREFIXES):
+            return self.classes["heavy"]
+        if method in WRITE_METHODS and path not in READ_ONLY_POSTS:
+            return self.classes["write"]
+        return self.classes["read"]
+
+    def pool_saturated(self) -> bool:
+        """
+        True si la espera reciente del pool supera el umbral.
+        """
+        if self.pool_monitor is None or self.pool_wait_ms <= 0:
+            return False
+        return self.pool_monitor.average_wait * 1000 > self.pool_wait_ms
+
+    def admit(self, route: RouteClass) -> Optional[Rejection]:
+        """
+        Intenta admitir un request de la clase `route`.
+        Si lo admite incrementa los contadores: llamar a `release` al terminar.
+
+        Returns:
+            None si se admitió, o el motivo del rechazo
+        """
+        if self.max_in_flight and self.in_flight >= self.max_in_flight:
+            self.shed_global += 1
+            return Rejection(503, self.retry_after_seconds, "Servidor sobrecargado")
+        if route.max_concurrent and route.in_flight >= route.max_concurrent:
+            route.shed["concurrency"] += 1
+            return Rejection(503, self.retry_after_seconds, "Demasiadas solicitudes simultáneas")
+        if self.pool_saturated():
+            route.shed["pool"] += 1
+            return Rejection(503, self.retry_after_seconds, "Base de datos saturada")
+        if route.bucket is not None:
+            wait = route.bucket.take()
+            if wait:
+                route.shed["rate"] += 1
+                return Rejection(429, max(1, int(wait + 0.999)), "Límite de solicitudes excedido")
+        self.in_flight += 1
+        route.in_flight += 1
+        route.admitted += 1
+        return None
+
+    def release(self, route: RouteClass) -> None:
+        self.in_flight -= 1
+        route.in_flight -= 1
+
+    def stats(self) -> dict:
+        """
+        Requests en curso, admitidos y descartados por motivo.
+        """
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "shed_global": self.shed_global,
+            "classes": {
+                name: {
+                    "in_flight": route.in_flight,
+                    "max_concurrent": route.max_concurrent,
+                    "admitted": route.admitted,
+                    "shed": dict(route.shed),
+                }
+                for name, route in self.classes.items()
+            },
+            "pool": self.pool_monitor.stats() if self.pool_monitor is not None else None,
+        }
+
+
+def build_controller(settings, pool_monitor: Optional[PoolWaitMonitor] = None) -> AdmissionController:
+    """
+    Construye el controlador a partir del módulo de configuración.
+    """
+    def bucket(rate: float, burst: int) -> Optional[TokenBucket]:
+        return TokenBucket(rate, burst) if rate > 0 else None
+
+    return AdmissionController(
+        max_in_flight=settings.ADMISSION_MAX_IN_FLIGHT,
+        classes={
+            "read": RouteClass(
+                "read",
+                settings.ADMISSION_READ_CONCURRENCY,
+                bucket(settings.ADMISSION_READ_RATE, settings.ADMISSION_READ_BURST),
+            ),
+            "write": RouteClass(
+                "write",
+                settings.ADMISSION_WRITE_CONCURRENCY,
+                bucket(settings.ADMISSION_WRITE_RATE, settings.ADMISSION_WRITE_BURST),
+            ),
+            "heavy": RouteClass(
+                "heavy",
+                settings.ADMISSION_HEAVY_CONCURRENCY,
+                bucket(settings.ADMISSION_HEAVY_RATE, settings.ADMISSION_HEAVY_BURST),
+            ),
+        },
+        pool_monitor=pool_monitor,
+        pool_wait_ms=settings.ADMISSION_POOL_WAIT_MS,
+        retry_after_seconds=settings.ADMISSION_RETRY_AFTER_SECONDS,
+    )
+
+
+async def send_rejection(send, status_code: int, retry_after: int, detail: str) -> None:
+    """
+    Envía una respuesta JSON de rechazo con el header Retry-After.
+    """
+    body = json.dumps({"detail": detail}, ensure_ascii=False).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(retry_after).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionMiddleware:
+    """
+    Middleware ASGI puro: rechaza antes de tocar el threadpool o el pool
+    de conexiones. Los WebSocket y las rutas exentas pasan sin control.
+    """
+
+    def __init__(self, app, controller: AdmissionController, enabled: bool = True):
+        self.app = app
+        self.controller = controller
+        self.enabled = enabled
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route = self.controller.classify(scope["method"], scope["path"])
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+
+        rejection = self.controller.admit(route)
+        if rejection is not None:
+            await send_rejection(send, rejection.status_code, rejection.retry_after, rejection.reason)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(route)
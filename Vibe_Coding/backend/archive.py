@@ -0,0 +1,176 @@
+"""
+Archivado de tareas completadas (almacenamiento frío).
+
+Mueve las tareas completadas hace más de N días de la tabla 'tasks' a
+'tasks_archive' en lotes pequeños, cada uno en su propia transacción
+corta, para que los listados y conteos solo recorran las filas activas.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from sqlalchemy import func, insert, literal, select
+from sqlalchemy.orm import Session
+
+import cache
+import crud
+import events
+from models import ArchivedTask, Task
+
+logger = logging.getLogger(__name__)
+
+# Columnas copiadas tal cual de 'tasks' a 'tasks_archive'
+ARCHIVED_COLUMNS = [
+    "id", "title", "description", "due_date", "completed", "created_at", "completed_at", "version", "user_id",
+    "parent_id", "subtask_count", "subtasks_completed",
+]
+
+
+def archive_batch(db: Session, cutoff: datetime, batch_size: int, now: Optional[datetime] = None) -> int:
+    """
+    Mueve un lote de tareas completadas antes de `cutoff` al archivo.
+
+    Args:
+        db: Sesión de base de datos
+        cutoff: Se archivan las tareas completadas antes de esta fecha
+        batch_size: Máximo de tareas a mover en esta transacción
+        now: Fecha de archivado (por defecto utcnow)
+
+    Returns:
+        Número de tareas movidas
+    """
+    now = now or datetime.utcnow()
+    # Tareas antiguas sin completed_at usan created_at como referencia
+    rows = db.execute(
+        select(Task.id, Task.user_id)
+        .where(Task.completed == True)  # noqa: E712
+        .where(Task.deleted_at.is_(None))
+        # Una tarea con subtareas visibles espera a que se archiven o eliminen
+        .where(Task.subtask_count == 0)
+        .where(func.coalesce(Task.completed_at, Task.created_at) < cutoff)
+        .order_by(Task.id)
+        .limit(batch_size)
+    ).all()
+    ids = [row.id for row in rows]
+    if not ids:
+        return 0
+
+    columns = [getattr(Task, name) for name in ARCHIVED_COLUMNS]
+    db.execute(
+        insert(ArchivedTask).from_select(
+            ARCHIVED_COLUMNS + ["archived_at"],
+            select(*columns, literal(now, ArchivedTask.archived_at.type)).where(Task.id.in_(ids))
+        )
+    )
+    # Las etiquetas se conservan con el mismo ID, pero dejan de contar como activas
+    crud.release_tag_counts(db, ids)
+    db.query(Task).filter(Task.id.in_(ids)).delete(synchronize_session=False)
+    db.commit()
+    cache.write_generation.bump()
+
+    for task_id, user_id in rows:
+        events.hub.publish("archived", task_id, user_id=user_id)
+    return len(ids)
+
+
+def archive_completed_tasks(
+    db: Session,
+    older_than_days: int,
+    batch_size: int = 500,
+    pause_seconds: float = 0.0,
+    now: Optional[datetime] = None
+) -> int:
+    """
+    Archiva todas las tareas elegibles, lote por lote.
+
+    Args:
+        db: Sesión de base de datos
+        older_than_days: Antigüedad mínima (días desde que se completó)
+        batch_size: Tareas por transacción
+        pause_seconds: Pausa entre lotes para ceder el bloqueo de escritura
+        now: Instante de referencia (por defecto utcnow)
+
+    Returns:
+        Total de tareas archivadas
+    """
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(days=older_than_days)
+    total = 0
+    while True:
+        moved = archive_batch(db, cutoff, batch_size, now=now)
+        total += moved
+        if moved < batch_size:
+            return total
+        if pause_seconds:
+            time.sleep(pause_seconds)
+
+
+class Archiver:
+    """
+    Hilo en segundo plano que ejecuta el archivado periódicamente.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        older_than_days: int,
+        batch_size: int = 500,
+        interval_seconds: float = 3600,
+        pause_seconds: float = 0.05
+    ):
+        self.session_factory = session_factory
+        self.older_than_days = older_than_days
+        self.batch_size = batch_size
+        self.interval_seconds = interval_seconds
+        self.pause_seconds = pause_seconds
+        self.archived_total = 0
+        self.last_run: Optional[datetime] = None
+        self.last_duration_ms = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self) -> int:
+        """
+        Ejecuta una pasada completa de archivado.
+        """
+        started = time.perf_counter()
+        db = self.session_factory()
+        try:
+            moved = archive_completed_tasks(
+                db, self.older_than_days, self.batch_size, self.pause_seconds
+            )
+        finally:
+            db.close()
+        self.archived_total += moved
+        self.last_run = datetime.utcnow()
+        self.last_duration_ms = (time.perf_counter() - started) * 1000
+        return moved
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Error archivando tareas")
+            self._stop.wait(self.interval_seconds)
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="task-archiver", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "older_than_days": self.older_than_days,
+            "archived_total": self.archived_total,
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+            "last_duration_ms": round(self.last_duration_ms, 3),
+        }
@@ -0,0 +1,371 @@
+"""
+Backups en línea de la base de datos SQLite.
+
+Usa la API de backup de sqlite3 copiando N páginas por paso y durmiendo
+entre pasos, de modo que los escritores nunca esperan más que un paso.
+Opcionalmente comprime el resultado con gzip y lo verifica con
+PRAGMA integrity_check antes de darlo por bueno.
+
+Una escritura desde otra conexión durante la copia la reinicia desde la
+primera página. Bajo carga continua la copia por pasos no terminaría
+nunca: tras `max_restarts` reinicios se copia todo en un solo paso (un
+único snapshot de lectura; los escritores esperan lo que dure la copia).
+"""
+import gzip
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+
+class BackupInProgress(Exception):
+    """
+    Ya hay un backup en curso.
+    """
+    pass
+
+
+class _TooManyRestarts(Exception):
+    """
+    La copia por pasos se reinició demasiadas veces (interrumpe backup()).
+    """
+    pass
+
+
+@dataclass
+class BackupReport:
+    """
+    Estado y resultado de un backup.
+
+    Atributos:
+        status: "running", "done" o "failed"
+        path: Ruta del archivo generado
+        pages_total: Páginas de la base al iniciar
+        pages_done: Páginas copiadas hasta el momento
+        steps: Pasos de backup ejecutados
+        restarts: Veces que una escritura concurrente reinició la copia
+        single_step: La copia terminó en un solo paso tras demasiados reinicios
+        duration_ms: Duración total (o parcial si sigue en curso)
+        size_bytes: Tamaño del archivo final
+        integrity: Resultado de PRAGMA integrity_check (None si no se verificó)
+    """
+    status: str = "running"
+    started_at: str = field(default_factory=lambda: datetime.utcnow().isoformat())
+    path: Optional[str] = None
+    compressed: bool = False
+    pages_total: int = 0
+    pages_done: int = 0
+    steps: int = 0
+    restarts: int = 0
+    single_step: bool = False
+    duration_ms: float = 0.0
+    size_bytes: int = 0
+    integrity: Optional[str] = None
+    error: Optional[str] = None
+
+    @property
+    def progress(self) -> float:
+        return self.pages_done / self.pages_total if self.pages_total else 0.0
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data["progress"] = round(self.progress, 4)
+        return data
+
+
+def run_backup(
+    engine: Engine,
+    dest_dir: str,
+    pages_per_step: int = 256,
+    sleep_seconds: float = 0.005,
+    compress: bool = True,
+    verify: bool = True,
+    report: Optional[BackupReport] = None,
+    max_restarts: int = 3
+) -> BackupReport:
+    """
+    Copia la base de datos del motor a un archivo nuevo en `dest_dir`.
+
+    Args:
+        engine: Motor SQLite de origen
+        dest_dir: Directorio de destino (se crea si no existe)
+        pages_per_step: Páginas copiadas por paso de la API de backup
+        sleep_seconds: Pausa entre pasos para no bloquear a los escritores
+        compress: Comprimir el resultado con gzip
+        verify: Ejecutar PRAGMA integrity_check sobre la copia
+        report: Reporte a actualizar con el progreso (se crea si no se pasa)
+        max_restarts: Reinicios tolerados antes de copiar en un solo paso
+
+    Returns:
+        Reporte final del backup
+    """
+    report = report or BackupReport()
+    started = time.perf_counter()
+    os.makedirs(dest_dir, exist_ok=True)
+    name = f"quicktask-{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}.db"
+    final_path = os.path.join(dest_dir, name)
+    tmp_path = final_path + ".partial"
+
+    def on_progress(status, remaining, total):
+        report.steps += 1
+        report.pages_total = total
+        if remaining and total - remaining <= report.pages_done:
+            # Sin avance: otra conexión escribió y la copia volvió a empezar
+            report.restarts += 1
+            if report.restarts > max_restarts:
+                raise _TooManyRestarts()
+        report.pages_done = total - remaining
+        report.duration_ms = (time.perf_counter() - started) * 1000
+        if remaining and sleep_seconds:
+            # Se llama entre pasos, sin bloqueos tomados sobre el origen
+            time.sleep(sleep_seconds)
+
+    raw_connection = engine.raw_connection()
+    try:
+        destination = sqlite3.connect(tmp_path)
+        try:
+            try:
+                raw_connection.driver_connection.backup(
+                    destination, pages=pages_per_step, progress=on_progress
+                )
+            except _TooManyRestarts:
+                logger.warning("Backup reiniciado %d veces, se copia en un solo paso", report.restarts)
+                report.single_step = True
+                raw_connection.driver_connection.backup(destination)
+                report.pages_total = destination.execute("PRAGMA page_count").fetchone()[0]
+                report.pages_done = report.pages_total
+            if verify:
+                report.integrity = destination.execute("PRAGMA integrity_check").fetchone()[0]
+        finally:
+            destination.close()
+    except Exception as exc:
+        report.status = "failed"
+        report.error = str(exc)
+        _remove(tmp_path)
+        raise
+    finally:
+        raw_connection.close()
+
+    if verify and report.integrity != "ok":
+        report.status = "failed"
+        report.error = f"integrity_check: {report.integrity}"
+        _remove(tmp_path)
+        return report
+
+    if compress:
+        final_path += ".gz"
+        with open(tmp_path, "rb") as source, gzip.open(final_path + ".partial", "wb", compresslevel=6) as target:
+            shutil.copyfileobj(source, target, length=1024 * 1024)
+        _remove(tmp_path)
+        os.replace(final_path + ".partial", final_path)
+    else:
+        os.replace(tmp_path, final_path)
+
+    report.path = final_path
+    report.compressed = compress
+    report.size_bytes = os.path.getsize(final_path)
+    report.duration_ms = (time.perf_counter() - started) * 1000
+    report.status = "done"
+    return report
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class BackupManager:
+    """
+    Ejecuta backups bajo demanda o programados, uno a la vez,
+    y conserva solo los últimos `keep` archivos.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        dest_dir: str,
+        pages_per_step: int = 256,
+        sleep_seconds: float = 0.005,
+        compress: bool = True,
+        verify: bool = True,
+        keep: int = 7,
+        interval_seconds: float = 0,
+        max_restarts: int = 3
+    ):
+        self.engine = engine
+        self.dest_dir = dest_dir
+        self.pages_per_step = pages_per_step
+        self.sleep_seconds = sleep_seconds
+        self.compress = compress
+        self.verify = verify
+        self.keep = keep
+        self.interval_seconds = interval_seconds
+        self.max_restarts = max_restarts
+        self.current: Optional[BackupReport] = None
+        self.last: Optional[BackupReport] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._scheduler: Optional[threading.Thread] = None
+
+    def _begin(self) -> BackupReport:
+        with self._lock:
+            if self.current is not None:
+                raise BackupInProgress()
+            self.current = BackupReport()
+            return self.current
+
+    def _execute(self, report: BackupReport, compress: bool, verify: bool) -> BackupReport:
+        try:
+            run_backup(
+                self.engine, self.dest_dir, self.pages_per_step, self.sleep_seconds,
+                compress=compress, verify=verify, report=report, max_restarts=self.max_restarts
+            )
+            self._prune()
+        except Exception:
+            logger.exception("Error en el backup de la base de datos")
+        finally:
+            with self._lock:
+                self.current = None
+                self.last = report
+        logger.info("Backup %s en %.0f ms (%s)", report.status, report.duration_ms, report.path)
+        return report
+
+    def run(self, compress: Optional[bool] = None, verify: Optional[bool] = None) -> BackupReport:
+        """
+        Ejecuta un backup de forma síncrona.
+        """
+        report = self._begin()
+        return self._execute(
+            report,
+            self.compress if compress is None else compress,
+            self.verify if verify is None else verify,
+        )
+
+    def start(self, compress: Optional[bool] = None, verify: Optional[bool] = None) -> BackupReport:
+        """
+        Inicia un backup en un hilo y retorna su reporte en curso.
+
+        Raises:
+            BackupInProgress: Si ya hay un backup ejecutándose
+        """
+        report = self._begin()
+        threading.Thread(
+            target=self._execute,
+            args=(
+                report,
+                self.compress if compress is None else compress,
+                self.verify if verify is None else verify,
+            ),
+            name="db-backup",
+            daemon=True,
+        ).start()
+        return report
+
+    def _prune(self) -> None:
+        files = sorted(
+            name for name in os.listdir(self.dest_dir)
+            if name.startswith("quicktask-") and not name.endswith(".partial")
+        )
+        for name in files[:-self.keep] if self.keep > 0 else []:
+            _remove(os.path.join(self.dest_dir, name))
+
+    def list_backups(self) -> list[dict]:
+        """
+        Lista los backups disponibles (nombre y tamaño).
+        """
+        if not os.path.isdir(self.dest_dir):
+            return []
+        return [
+            {"name": name, "size_bytes": os.path.getsize(os.path.join(self.dest_dir, name))}
+            for name in sorted(os.listdir(self.dest_dir))
+            if name.startswith("quicktask-") and not name.endswith(".partial")
+        ]
+
+    def _run_scheduled(self) -> None:
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                self.run()
+            except BackupInProgress:
+                logger.info("Backup programado omitido: ya hay uno en curso")
+
+    def start_schedule(self) -> None:
+        """
+        Inicia los backups periódicos si hay un intervalo configurado.
+        """
+        if self.interval_seconds <= 0:
+            return
+        self._stop.clear()
+        self._scheduler = threading.Thread(target=self._run_scheduled, name="db-backup-schedule", daemon=True)
+        self._scheduler.start()
+
+    def stop_schedule(self) -> None:
+        self._stop.set()
+        if self._scheduler is not None:
+            self._scheduler.join(timeout=5)
+            self._scheduler = None
+
+    def status(self) -> dict:
+        with self._lock:
+            current, last = self.current, self.last
+        return {
+            "current": current.to_dict() if current else None,
+            "last": last.to_dict() if last else None,
+            "backups": self.list_backups(),
+        }
+
+
+class ShardedBackupManager:
+    """
+    Un BackupManager por shard con la misma interfaz que uno solo: cada
+    shard se copia en su propio subdirectorio (`shard<N>`).
+    """
+
+    def __init__(self, managers: list[BackupManager]):
+        self.managers = managers
+
+    def run(self, compress: Optional[bool] = None, verify: Optional[bool] = None) -> "ShardedBackupReport":
+        return ShardedBackupReport([manager.run(compress, verify) for manager in self.managers])
+
+    def start(self, compress: Optional[bool] = None, verify: Optional[bool] = None) -> "ShardedBackupReport":
+        """
+        Inicia el backup de todos los shards.
+
+        Raises:
+            BackupInProgress: Si algún shard tiene un backup ejecutándose
+        """
+        if any(manager.current is not None for manager in self.managers):
+            raise BackupInProgress()
+        return ShardedBackupReport([manager.start(compress, verify) for manager in self.managers])
+
+    def start_schedule(self) -> None:
+        for manager in self.managers:
+            manager.start_schedule()
+
+    def stop_schedule(self) -> None:
+        for manager in self.managers:
+            manager.stop_schedule()
+
+    def status(self) -> dict:
+        return {"shards": [manager.status() for manager in self.managers]}
+
+
+@dataclass
+class ShardedBackupReport:
+    """
+    Reportes de un backup de todos los shards (en orden de shard).
+    """
+    reports: list[BackupReport]
+
+    def to_dict(self) -> dict:
+        return {"shards": [report.to_dict() for report in self.reports]}
@@ -0,0 +1,139 @@
+"""
+Caché de respuestas de listados versionada por generación de escritura.
+
+Cada mutación incrementa un contador global (la generación). Las
+entradas guardan la generación con la que se calcularon; si no coincide
+con la actual se descartan en O(1), sin rastrear qué filas pertenecen a
+qué página.
+"""
+import multiprocessing
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+import config
+
+
+class WriteGeneration:
+    """
+    Contador monótono de escrituras. crud lo incrementa tras cada commit.
+
+    Con `shared=True` el contador vive en memoria compartida: creado en el
+    maestro de gunicorn (preload_app) lo heredan todos los workers, así una
+    escritura en un worker invalida la caché de listados de los demás.
+    """
+
+    def __init__(self, shared: bool = False):
+        if shared:
+            self._lock = multiprocessing.Lock()
+            self._shared = multiprocessing.RawValue("Q", 0)
+        else:
+            self._lock = threading.Lock()
+            self._shared = None
+        self._value = 0
+
+    @property
+    def value(self) -> int:
+        if self._shared is not None:
+            return self._shared.value
+        return self._value
+
+    def bump(self) -> int:
+        """
+        Incrementa la generación y retorna el nuevo valor.
+        """
+        with self._lock:
+            if self._shared is not None:
+                self._shared.value += 1
+                return self._shared.value
+            self._value += 1
+            return self._value
+
+
+class ResponseCache:
+    """
+    Caché LRU de cuerpos serializados con límite de memoria en bytes.
+    """
+
+    def __init__(self, max_bytes: int, generation: WriteGeneration):
+        self.max_bytes = max_bytes
+        self.generation = generation
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Hashable, tuple[int, bytes]] = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        """
+        Retorna el cuerpo cacheado si pertenece a la generación actual.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            generation, body = entry
+            if generation != self.generation.value:
+                # Entrada de una generación anterior: descartar
+                del self._entries[key]
+                self._bytes -= len(body)
+                self.stale += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key: Hashable, generation: int, body: bytes) -> None:
+        """
+        Guarda un cuerpo calculado con la generación `generation`.
+        Debe leerse la generación ANTES de consultar la base.
+        """
+        size = len(body)
+        if not self.enabled or size > self.max_bytes or generation != self.generation.value:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous[1])
+            self._entries[key] = (generation, body)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        """
+        Estadísticas de uso, memoria y expulsiones.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "generation": self.generation.value,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "stale": self.stale,
+                "evictions": self.evictions,
+            }
+
+
+# Generación global de escrituras (compartida entre workers) y caché de listados del proceso
+write_generation = WriteGeneration(shared=config.WORKERS > 1)
+response_cache = ResponseCache(config.RESPONSE_CACHE_MAX_BYTES, write_generation)
@@ -0,0 +1,154 @@
+"""
+Configuración de QuickTask leída desde variables de entorno.
+Centraliza los parámetros ajustables sin modificar el código.
+"""
+import os
+
+
+def env_int(name: str, default: int) -> int:
+    """
+    Lee una variable de entorno entera.
+
+    Args:
+        name: Nombre de la variable
+        default: Valor si la variable no existe o está vacía
+
+    Returns:
+        Valor entero de la variable
+    """
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def env_float(name: str, default: float) -> float:
+    """
+    Lee una variable de entorno decimal.
+    """
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def env_bool(name: str, default: bool = False) -> bool:
+    """
+    Lee una variable de entorno booleana ("1", "true", "yes", "on").
+    """
+    value = os.getenv(name)
+    if not value:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Eventos en tiempo real (SSE / WebSocket)
+EVENTS_QUEUE_SIZE = env_int("QUICKTASK_EVENTS_QUEUE_SIZE", 64)
+EVENTS_HEARTBEAT_SECONDS = env_float("QUICKTASK_EVENTS_HEARTBEAT_SECONDS", 15.0)
+
+# Recordatorios de vencimiento
+REMINDERS_ENABLED = env_bool("QUICKTASK_REMINDERS_ENABLED")
+REMINDER_SINK = os.getenv("QUICKTASK_REMINDER_SINK", "log")
+REMINDER_WEBHOOK_URL = os.getenv("QUICKTASK_REMINDER_WEBHOOK_URL", "")
+REMINDER_WINDOW_SECONDS = env_int("QUICKTASK_REMINDER_WINDOW_SECONDS", 3600)
+# Con varios workers: cada cuánto releer la ventana (escrituras de otros procesos)
+REMINDER_REFRESH_SECONDS = env_float("QUICKTASK_REMINDER_REFRESH_SECONDS", 30.0)
+
+# Archivado de tareas completadas (0 = desactivado)
+ARCHIVE_AFTER_DAYS = env_int("QUICKTASK_ARCHIVE_AFTER_DAYS", 0)
+ARCHIVE_BATCH_SIZE = env_int("QUICKTASK_ARCHIVE_BATCH_SIZE", 500)
+ARCHIVE_INTERVAL_SECONDS = env_float("QUICKTASK_ARCHIVE_INTERVAL_SECONDS", 3600.0)
+ARCHIVE_PAUSE_SECONDS = env_float("QUICKTASK_ARCHIVE_PAUSE_SECONDS", 0.05)
+
+# Purga de tareas eliminadas (soft delete) y vacuum incremental
+PURGE_ENABLED = env_bool("QUICKTASK_PURGE_ENABLED")
+PURGE_GRACE_SECONDS = env_float("QUICKTASK_PURGE_GRACE_SECONDS", 86400.0)
+PURGE_BATCH_SIZE = env_int("QUICKTASK_PURGE_BATCH_SIZE", 200)
+PURGE_INTERVAL_SECONDS = env_float("QUICKTASK_PURGE_INTERVAL_SECONDS", 300.0)
+PURGE_DUTY_CYCLE = env_float("QUICKTASK_PURGE_DUTY_CYCLE", 0.1)
+VACUUM_PAGES_PER_STEP = env_int("QUICKTASK_VACUUM_PAGES_PER_STEP", 256)
+
+# Token para los endpoints de administración (vacío = deshabilitados)
+ADMIN_TOKEN = os.getenv("QUICKTASK_ADMIN_TOKEN", "")
+
+# Backups en línea de la base de datos
+BACKUP_DIR = os.getenv("QUICKTASK_BACKUP_DIR", "./data/backups")
+BACKUP_INTERVAL_SECONDS = env_float("QUICKTASK_BACKUP_INTERVAL_SECONDS", 0.0)
+BACKUP_PAGES_PER_STEP = env_int("QUICKTASK_BACKUP_PAGES_PER_STEP", 256)
+BACKUP_STEP_SLEEP_SECONDS = env_float("QUICKTASK_BACKUP_STEP_SLEEP_SECONDS", 0.005)
+BACKUP_COMPRESS = env_bool("QUICKTASK_BACKUP_COMPRESS", True)
+BACKUP_VERIFY = env_bool("QUICKTASK_BACKUP_VERIFY", True)
+BACKUP_KEEP = env_int("QUICKTASK_BACKUP_KEEP", 7)
+# Reinicios por escrituras concurrentes antes de copiar en un solo paso
+BACKUP_MAX_RESTARTS = env_int("QUICKTASK_BACKUP_MAX_RESTARTS", 3)
+
+# Caché de respuestas de listados (bytes; 0 = desactivada)
+RESPONSE_CACHE_MAX_BYTES = env_int("QUICKTASK_RESPONSE_CACHE_MAX_BYTES", 16 * 1024 * 1024)
+
+# Pool de conexiones de la base de datos
+DB_POOL_SIZE = env_int("QUICKTASK_DB_POOL_SIZE", 5)
+DB_MAX_OVERFLOW = env_int("QUICKTASK_DB_MAX_OVERFLOW", 10)
+DB_POOL_TIMEOUT_SECONDS = env_float("QUICKTASK_DB_POOL_TIMEOUT_SECONDS", 5.0)
+
+# Control de admisión (límites de concurrencia y tasa; 0 = sin límite)
+ADMISSION_ENABLED = env_bool("QUICKTASK_ADMISSION_ENABLED", True)
+ADMISSION_MAX_IN_FLIGHT = env_int("QUICKTASK_ADMISSION_MAX_IN_FLIGHT", 64)
+ADMISSION_READ_CONCURRENCY = env_int("QUICKTASK_ADMISSION_READ_CONCURRENCY", 32)
+ADMISSION_WRITE_CONCURRENCY = env_int("QUICKTASK_ADMISSION_WRITE_CONCURRENCY", 8)
+ADMISSION_READ_RATE = env_float("QUICKTASK_ADMISSION_READ_RATE", 0.0)
+ADMISSION_READ_BURST = env_int("QUICKTASK_ADMISSION_READ_BURST", 100)
+ADMISSION_WRITE_RATE = env_float("QUICKTASK_ADMISSION_WRITE_RATE", 0.0)
+ADMISSION_WRITE_BURST = env_int("QUICKTASK_ADMISSION_WRITE_BURST", 50)
+# Exportación y rutas /admin/ (clase "heavy")
+ADMISSION_HEAVY_CONCURRENCY = env_int("QUICKTASK_ADMISSION_HEAVY_CONCURRENCY", 2)
+ADMISSION_HEAVY_RATE = env_float("QUICKTASK_ADMISSION_HEAVY_RATE", 0.0)
+ADMISSION_HEAVY_BURST = env_int("QUICKTASK_ADMISSION_HEAVY_BURST", 10)
+ADMISSION_POOL_WAIT_MS = env_float("QUICKTASK_ADMISSION_POOL_WAIT_MS", 250.0)
+ADMISSION_RETRY_AFTER_SECONDS = env_int("QUICKTASK_ADMISSION_RETRY_AFTER_SECONDS", 1)
+
+# Perfilado de CPU por request (1 de cada N; 0 = solo bajo demanda con ?__profile=1)
+PROFILE_SAMPLE_EVERY = env_int("QUICKTASK_PROFILE_SAMPLE_EVERY", 0)
+PROFILE_DIR = os.getenv("QUICKTASK_PROFILE_DIR", "./data/profiles")
+PROFILE_KEEP = env_int("QUICKTASK_PROFILE_KEEP", 50)
+PROFILE_TOP = env_int("QUICKTASK_PROFILE_TOP", 30)
+
+# Armar el JSON de los listados en SQLite (json_object/json_group_array)
+LIST_SQL_JSON = env_bool("QUICKTASK_LIST_SQL_JSON", True)
+
+# Exportación columnar (filas por lote / row group)
+EXPORT_BATCH_SIZE = env_int("QUICKTASK_EXPORT_BATCH_SIZE", 10000)
+
+# Índice en memoria para autocompletar títulos
+SUGGEST_MAX_BYTES = env_int("QUICKTASK_SUGGEST_MAX_BYTES", 8 * 1024 * 1024)
+SUGGEST_MAX_WORDS = env_int("QUICKTASK_SUGGEST_MAX_WORDS", 8)
+# Con varios workers: edad máxima del índice (se reconstruye con las escrituras de todos)
+SUGGEST_MAX_AGE_SECONDS = env_float("QUICKTASK_SUGGEST_MAX_AGE_SECONDS", 30.0)
+
+# Write-behind de cambios de estado completado (PATCH {"completed": ...})
+WRITE_BEHIND_ENABLED = env_bool("QUICKTASK_WRITE_BEHIND_ENABLED", False)
+WRITE_BEHIND_INTERVAL_MS = env_float("QUICKTASK_WRITE_BEHIND_INTERVAL_MS", 50.0)
+WRITE_BEHIND_FLUSH_ENTRIES = env_int("QUICKTASK_WRITE_BEHIND_FLUSH_ENTRIES", 256)
+WRITE_BEHIND_MAX_ENTRIES = env_int("QUICKTASK_WRITE_BEHIND_MAX_ENTRIES", 10000)
+
+# Backend de almacenamiento de tareas: "sql" (SQLite) o "memory" (efímero, sin persistencia)
+STORAGE_BACKEND = os.getenv("QUICKTASK_STORAGE_BACKEND", "sql")
+
+# Particionado por usuario: N archivos SQLite (<= 1 = un solo archivo)
+SHARD_COUNT = env_int("QUICKTASK_SHARD_COUNT", 0)
+SHARD_URL_TEMPLATE = os.getenv("QUICKTASK_SHARD_URL_TEMPLATE", "sqlite:///./quicktask-shard{shard}.db")
+
+# Servir con varios procesos (gunicorn_conf.py fija QUICKTASK_WORKERS antes de importar la app)
+WORKERS = env_int("QUICKTASK_WORKERS", 1)
+WORKER_JOBS_LOCK_FILE = os.getenv("QUICKTASK_WORKER_JOBS_LOCK_FILE", "./data/quicktask-jobs.lock")
+# RSS máxima por worker antes de reciclarlo (MB; 0 = sin límite)
+WORKER_MAX_RSS_MB = env_int("QUICKTASK_WORKER_MAX_RSS_MB", 0)
+WORKER_RSS_CHECK_SECONDS = env_float("QUICKTASK_WORKER_RSS_CHECK_SECONDS", 10.0)
+
+# Idempotency-Key en POST /tasks y POST /batch
+IDEMPOTENCY_TTL_SECONDS = env_float("QUICKTASK_IDEMPOTENCY_TTL_SECONDS", 86400.0)
+IDEMPOTENCY_CACHE_ENTRIES = env_int("QUICKTASK_IDEMPOTENCY_CACHE_ENTRIES", 10000)
+IDEMPOTENCY_WAIT_SECONDS = env_float("QUICKTASK_IDEMPOTENCY_WAIT_SECONDS", 10.0)
+# Tras este tiempo una clave "en curso" se considera de un proceso muerto
+IDEMPOTENCY_LEASE_SECONDS = env_float("QUICKTASK_IDEMPOTENCY_LEASE_SECONDS", 600.0)
+
+# Columnas de fecha de las tareas: "text" (ISO, por defecto) o "epoch_us" (INTEGER de microsegundos UTC)
+TIMESTAMP_STORAGE = os.getenv("QUICKTASK_TIMESTAMP_STORAGE", "text")
+
+# Esquema OpenAPI generado al construir la imagen (python openapi_doc.py)
+OPENAPI_ARTIFACT = os.getenv("QUICKTASK_OPENAPI_ARTIFACT", "./openapi.json")
@@ -2,15 +2,24 @@
 Configuración global de pytest.
 Define fixtures compartidos por todos los tests.
 """
+from typing import Optional
+
 import pytest
+from fastapi import Depends
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
+import database
 from database import Base, get_db
+import main
 from main import app
+import cache
+import idempotency
 import models
+import repository
+import suggest
 
 
 # URL de base de datos en memoria para tests
@@ -31,6 +40,9 @@ def test_db():
         connect_args={"check_same_thread": False},
         poolclass=StaticPool,  # Mantiene la conexión en memoria
     )
+    # Mismos PRAGMA que la aplicación (triggers recursivos de subtareas)
+    event.listen(engine, "connect", database._set_sqlite_pragmas)
+    event.listen(engine, "connect", database._register_sqlite_functions)
     
     # Crear todas las tablas
     Base.metadata.create_all(bind=engine)
@@ -45,7 +57,7 @@ def test_db():
 
 
 @pytest.fixture(scope="function")
-def client(test_db):
+def sql_client(test_db, monkeypatch):
     """
     Fixture que proporciona un cliente de prueba de FastAPI
     con la base de datos de test inyectada.
@@ -66,6 +78,15 @@ def client(test_db):
     # Sobreescribir la dependencia de base de datos
     app.dependency_overrides[get_db] = override_get_db
     
+    # La caché de listados y el índice de sugerencias son globales:
+    # no deben filtrar datos entre tests
+    cache.response_cache.clear()
+    suggest.index.reset()
+    # Las claves de idempotencia se guardan en la BD de test
+    monkeypatch.setattr(idempotency, "store", idempotency.IdempotencyStore(
+        sessionmaker(autocommit=False, autoflush=False, bind=test_db.get_bind())
+    ))
+    
     # Crear cliente de prueba
     with TestClient(app) as test_client:
         yield test_client
@@ -74,6 +95,37 @@ def client(test_db):
     app.dependency_overrides.clear()
 
 
+@pytest.fixture(scope="function", params=["sql", "memory"])
+def client(request):
+    """
+    Cliente de prueba por defecto: cada test corre con ambos backends de
+    almacenamiento. Los tests propios de SQL piden sql_client directamente.
+    """
+    return request.getfixturevalue(f"{request.param}_client")
+
+
+@pytest.fixture(scope="function")
+def memory_client(monkeypatch):
+    """
+    Cliente de prueba con el backend de almacenamiento en memoria:
+    cada test recibe un MemoryStore vacío y no se abre ninguna sesión.
+    """
+    store = repository.MemoryStore()
+    
+    def override_get_repository(user_id: Optional[int] = Depends(main.get_user_id)):
+        return repository.MemoryTaskRepository(store, user_id)
+    
+    app.dependency_overrides[main.get_repository] = override_get_repository
+    cache.response_cache.clear()
+    suggest.index.reset()
+    monkeypatch.setattr(idempotency, "store", idempotency.IdempotencyStore(None))
+    
+    with TestClient(app) as test_client:
+        yield test_client
+    
+    app.dependency_overrides.clear()
+
+
 @pytest.fixture(scope="function")
 def sample_task_data():
     """
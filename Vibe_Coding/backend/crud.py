@@ -2,24 +2,159 @@
 Operaciones CRUD (Create, Read, Update, Delete) para tareas.
 Contiene la lógica de negocio para interactuar con la base de datos.
 """
-from sqlalchemy.orm import Session
-from typing import Optional
-from models import Task
-from schemas import TaskCreate, TaskUpdate
+import heapq
+from datetime import datetime
+from sqlalchemy import case, event, func, intersect, literal, null, select, union, union_all, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.orm.exc import StaleDataError
+from typing import Callable, Collection, Iterator, Optional
+from models import ArchivedTask, TagCount, Task, TaskTag
+from timestamps import EpochMicros
+from schemas import BatchOperation, BatchOperationResult, TaskCreate, TaskUpdate
+import cache
+import events
 
 
-def get_task(db: Session, task_id: int) -> Optional[Task]:
+class VersionConflict(Exception):
+    """
+    La versión de la tarea no coincide con la esperada (If-Match).
+    
+    Atributos:
+        current_version: Versión actual de la tarea
+    """
+    
+    def __init__(self, current_version: int):
+        super().__init__(f"Versión actual: {current_version}")
+        self.current_version = current_version
+
+
+class ParentNotFound(Exception):
+    """
+    La tarea padre indicada en `parent_id` no existe (o no es del usuario).
+    """
+    
+    def __init__(self, parent_id: int):
+        super().__init__(f"Tarea padre no encontrada: {parent_id}")
+        self.parent_id = parent_id
+
+
+def get_task(db: Session, task_id: int, user_id: Optional[int] = None) -> Optional[Task]:
     """
     Obtiene una tarea por su ID.
     
     Args:
         db: Sesión de base de datos
         task_id: ID de la tarea a buscar
+        user_id: Solo si pertenece a este usuario (None = cualquier dueño)
+    
+    Returns:
+        Task o None si no existe (o fue eliminada)
+    """
+    query = db.query(Task).filter(Task.id == task_id, Task.deleted_at.is_(None))
+    if user_id is not None:
+        query = query.filter(Task.user_id == user_id)
+    return query.first()
+
+
+# SQLite limita los parámetros por sentencia (999 en versiones antiguas)
+SQLITE_MAX_VARIABLES = 900
+
+# Intentos de delete_task sin If-Match ante escrituras concurrentes
+DELETE_ATTEMPTS = 3
+
+
+def get_tasks_by_ids(
+    db: Session,
+    task_ids: list[int],
+    user_id: Optional[int] = None
+) -> tuple[list[Task], list[int]]:
+    """
+    Obtiene varias tareas por ID con consultas `WHERE id IN (...)`,
+    divididas en bloques que respetan el límite de variables de SQLite.
+    
+    Args:
+        db: Sesión de base de datos
+        task_ids: IDs solicitados (los duplicados se ignoran)
+        user_id: Solo tareas de este usuario (None = cualquier dueño)
     
     Returns:
-        Task o None si no existe
+        Tupla (tareas encontradas en el orden solicitado, IDs inexistentes)
+    """
+    unique_ids = list(dict.fromkeys(task_ids))
+    found: dict[int, Task] = {}
+    for start in range(0, len(unique_ids), SQLITE_MAX_VARIABLES):
+        chunk = unique_ids[start:start + SQLITE_MAX_VARIABLES]
+        query = db.query(Task).filter(Task.id.in_(chunk), Task.deleted_at.is_(None))
+        if user_id is not None:
+            query = query.filter(Task.user_id == user_id)
+        for task in query:
+            found[task.id] = task
+    
+    tasks = [found[task_id] for task_id in unique_ids if task_id in found]
+    missing = [task_id for task_id in unique_ids if task_id not in found]
+    return tasks, missing
+
+
+def _tag_filter(tags: list[str], match: str):
+    """
+    Subconsulta de IDs con las etiquetas pedidas.
+    
+    Cada etiqueta es un rango del índice (tag, task_id); "all" las
+    intersecta y "any" las une, sin recorrer la tabla 'tasks'.
+    """
+    selects = [select(TaskTag.task_id).where(TaskTag.tag == tag) for tag in tags]
+    if len(selects) == 1:
+        return selects[0]
+    return intersect(*selects) if match == "all" else union(*selects)
+
+
+def _apply_filters(
+    query,
+    model,
+    completed: Optional[bool],
+    search: Optional[str],
+    tags: Optional[list[str]] = None,
+    match: str = "all",
+    user_id: Optional[int] = None
+):
     """
-    return db.query(Task).filter(Task.id == task_id).first()
+    Aplica los filtros de usuario, estado, búsqueda de texto y etiquetas sobre una consulta.
+    
+    Args:
+        query: Consulta a filtrar
+        model: Modelo consultado (Task o ArchivedTask)
+        completed: Filtrar por estado (True/False/None para todos)
+        search: Buscar en título o descripción
+        tags: Etiquetas requeridas (normalizadas)
+        match: "all" (todas las etiquetas) o "any" (alguna)
+        user_id: Solo tareas de este usuario (None = cualquier dueño)
+    """
+    # Las tareas eliminadas (soft delete) nunca se leen
+    if model is Task:
+        query = query.filter(Task.deleted_at.is_(None))
+    
+    if user_id is not None:
+        query = query.filter(model.user_id == user_id)
+    
+    # Filtro por estado de completado
+    if completed is not None:
+        query = query.filter(model.completed == completed)
+    
+    # Filtro de búsqueda por texto
+    if search:
+        search_pattern = f"%{search}%"
+        query = query.filter(
+            (model.title.ilike(search_pattern)) | 
+            (model.description.ilike(search_pattern))
+        )
+    
+    # Filtro por etiquetas
+    if tags:
+        query = query.filter(model.id.in_(_tag_filter(tags, match)))
+    
+    return query
 
 
 def get_tasks(
@@ -27,7 +162,11 @@ def get_tasks(
     skip: int = 0, 
     limit: int = 100,
     completed: Optional[bool] = None,
-    search: Optional[str] = None
+    search: Optional[str] = None,
+    include_archived: bool = False,
+    tags: Optional[list[str]] = None,
+    match: str = "all",
+    user_id: Optional[int] = None
 ) -> list[Task]:
     """
     Obtiene una lista de tareas con filtros opcionales.
@@ -38,31 +177,50 @@ def get_tasks(
         limit: Número máximo de registros a retornar
         completed: Filtrar por estado (True/False/None para todos)
         search: Buscar en título o descripción
+        include_archived: Incluir también las tareas archivadas (orden por ID)
+        tags: Etiquetas requeridas
+        match: "all" o "any" para combinar las etiquetas
+        user_id: Solo tareas de este usuario (None = cualquier dueño)
     
     Returns:
-        Lista de tareas
+        Lista de tareas (Task o ArchivedTask)
     """
-    query = db.query(Task)
+    if not include_archived:
+        query = _apply_filters(db.query(Task), Task, completed, search, tags, match, user_id)
+        return query.offset(skip).limit(limit).all()
     
-    # Filtro por estado de completado
-    if completed is not None:
-        query = query.filter(Task.completed == completed)
+    # Paginar sobre la unión de IDs y luego cargar cada grupo por separado
+    hot = _apply_filters(
+        db.query(Task.id.label("id"), literal(False).label("archived")),
+        Task, completed, search, tags, match, user_id
+    )
+    cold = _apply_filters(
+        db.query(ArchivedTask.id.label("id"), literal(True).label("archived")),
+        ArchivedTask, completed, search, tags, match, user_id
+    )
+    page = union_all(hot.statement, cold.statement).subquery()
+    rows = db.execute(
+        select(page.c.id, page.c.archived).order_by(page.c.id).offset(skip).limit(limit)
+    ).all()
     
-    # Filtro de búsqueda por texto
-    if search:
-        search_pattern = f"%{search}%"
-        query = query.filter(
-            (Task.title.ilike(search_pattern)) | 
-            (Task.description.ilike(search_pattern))
-        )
-    
-    return query.offset(skip).limit(limit).all()
+    hot_ids = [row.id for row in rows if not row.archived]
+    cold_ids = [row.id for row in rows if row.archived]
+    hot_tasks = {task.id: task for task in db.query(Task).filter(Task.id.in_(hot_ids))} if hot_ids else {}
+    cold_tasks = (
+        {task.id: task for task in db.query(ArchivedTask).filter(ArchivedTask.id.in_(cold_ids))}
+        if cold_ids else {}
+    )
+    return [cold_tasks[row.id] if row.archived else hot_tasks[row.id] for row in rows]
 
 
 def count_tasks(
     db: Session,
     completed: Optional[bool] = None,
-    search: Optional[str] = None
+    search: Optional[str] = None,
+    include_archived: bool = False,
+    tags: Optional[list[str]] = None,
+    match: str = "all",
+    user_id: Optional[int] = None
 ) -> int:
     """
     Cuenta el número total de tareas con filtros opcionales.
@@ -71,85 +229,635 @@ def count_tasks(
         db: Sesión de base de datos
         completed: Filtrar por estado
         search: Buscar en título o descripción
+        include_archived: Sumar también las tareas archivadas
+        tags: Etiquetas requeridas
+        match: "all" o "any" para combinar las etiquetas
+        user_id: Solo tareas de este usuario (None = cualquier dueño)
     
     Returns:
         Número total de tareas
     """
-    query = db.query(Task)
+    total = _apply_filters(db.query(Task), Task, completed, search, tags, match, user_id).count()
+    if include_archived:
+        total += _apply_filters(
+            db.query(ArchivedTask), ArchivedTask, completed, search, tags, match, user_id
+        ).count()
+    return total
+
+
+def _json_datetime(column):
+    """
+    Convierte un DateTime guardado por SQLAlchemy ("YYYY-MM-DD HH:MM:SS.ffffff")
+    al formato ISO que emite Pydantic: separador "T" y sin fracción si los
+    microsegundos son cero. Con QUICKTASK_TIMESTAMP_STORAGE=epoch_us la
+    columna guarda microsegundos desde 1970 y se formatea con strftime.
+    """
+    if isinstance(column.type, EpochMicros):
+        # División entera hacia abajo también para fechas anteriores a 1970
+        micros = (column % 1000000 + 1000000) % 1000000
+        whole = func.strftime("%Y-%m-%dT%H:%M:%S", (column - micros) // 1000000, "unixepoch")
+        return case(
+            (column.is_(None), None),
+            (micros == 0, whole),
+            else_=whole.concat(".").concat(func.printf("%06d", micros)),
+        )
+    return case(
+        (column.is_(None), None),
+        (
+            (func.length(column) == 19) | (func.substr(column, 21) == "000000"),
+            func.replace(func.substr(column, 1, 19), " ", "T"),
+        ),
+        else_=func.replace(column, " ", "T"),
+    )
+
+
+def _task_json_object():
+    """
+    Expresión json_object() de una fila de 'tasks' con los campos y el
+    orden de TaskResponse (title, description, due_date, completed, tags,
+    parent_id, id, created_at, version, subtask_count, subtasks_completed),
+    byte a byte igual a model_dump_json().
+    """
+    # ix_task_tags_task_id (task_id, tag) entrega las etiquetas ya ordenadas
+    tags = select(func.json_group_array(TaskTag.tag)).where(TaskTag.task_id == Task.id).scalar_subquery()
+    return func.json_object(
+        "title", Task.title,
+        "description", Task.description,
+        "due_date", _json_datetime(Task.due_date),
+        "completed", func.json(case((Task.completed == True, "true"), else_="false")),  # noqa: E712
+        "tags", func.json(tags),
+        "parent_id", Task.parent_id,
+        "id", Task.id,
+        "created_at", _json_datetime(Task.created_at),
+        "version", Task.version,
+        "subtask_count", Task.subtask_count,
+        "subtasks_completed", Task.subtasks_completed,
+    )
+
+
+# None = aún no comprobado si SQLite incluye las funciones JSON
+_sql_json_supported: Optional[bool] = None
+
+
+def sql_json_supported(db: Session) -> bool:
+    """
+    Indica si SQLite tiene las funciones JSON (incluidas desde 3.38).
+    """
+    global _sql_json_supported
+    if _sql_json_supported is None:
+        try:
+            db.execute(select(func.json_object()))
+            _sql_json_supported = True
+        except OperationalError:
+            db.rollback()
+            _sql_json_supported = False
+    return _sql_json_supported
+
+
+def get_tasks_json(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    completed: Optional[bool] = None,
+    search: Optional[str] = None,
+    tags: Optional[list[str]] = None,
+    match: str = "all",
+    user_id: Optional[int] = None
+) -> str:
+    """
+    Arma en SQLite el cuerpo JSON de TaskListResponse para una página de
+    tareas activas, sin crear objetos Python por fila.
     
-    if completed is not None:
-        query = query.filter(Task.completed == completed)
+    Usa los mismos filtros (y por tanto el mismo plan y orden) que
+    get_tasks y count_tasks.
     
-    if search:
-        search_pattern = f"%{search}%"
-        query = query.filter(
-            (Task.title.ilike(search_pattern)) | 
-            (Task.description.ilike(search_pattern))
+    Returns:
+        JSON '{"total":N,"tasks":[...]}' compatible con TaskListResponse
+    """
+    page = (
+        _apply_filters(
+            db.query(_task_json_object().label("obj")), Task, completed, search, tags, match, user_id
         )
+        .offset(skip)
+        .limit(limit)
+        .subquery()
+    )
+    total = _apply_filters(db.query(func.count(Task.id)), Task, completed, search, tags, match, user_id)
+    # json() recupera el subtipo JSON que se pierde al pasar por la subconsulta
+    tasks = select(func.coalesce(func.json_group_array(func.json(page.c.obj)), "[]"))
+    return db.execute(
+        select(func.json_object(
+            "total", total.scalar_subquery(),
+            "tasks", func.json(tasks.scalar_subquery()),
+        ))
+    ).scalar_one()
+
+
+def iter_tasks(db: Session, batch_size: int = 500, completed: Optional[bool] = None) -> Iterator[Task]:
+    """
+    Recorre las tareas activas en orden de ID por páginas (keyset sobre
+    la clave primaria). Cada página se saca de la sesión antes de leer la
+    siguiente, así la memoria queda acotada por `batch_size`.
+    """
+    last_id = 0
+    while True:
+        page = (
+            _apply_filters(db.query(Task), Task, completed, None)
+            .filter(Task.id > last_id)
+            .order_by(Task.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not page:
+            return
+        yield from page
+        last_id = page[-1].id
+        db.expunge_all()
+
+
+def iter_shards(
+    factories: list[Callable[[], Session]],
+    batch_size: int = 500,
+    completed: Optional[bool] = None
+) -> Iterator[tuple[int, Task]]:
+    """
+    Mezcla en orden de (ID, shard) las tareas activas de varios archivos.
+    
+    Cada shard se recorre con iter_tasks en su propia sesión y heapq.merge
+    toma la siguiente tarea de la cabeza de cada recorrido: nunca hay más
+    de una página por shard en memoria.
+    
+    Returns:
+        Iterador de (índice del shard, tarea)
+    """
+    def stream(shard: int, factory: Callable[[], Session]) -> Iterator[tuple[int, int, Task]]:
+        db = factory()
+        try:
+            for task in iter_tasks(db, batch_size, completed):
+                yield task.id, shard, task
+        finally:
+            db.close()
     
-    return query.count()
+    streams = [stream(shard, factory) for shard, factory in enumerate(factories)]
+    try:
+        for _, shard, task in heapq.merge(*streams, key=lambda item: item[:2]):
+            yield shard, task
+    finally:
+        for pending in streams:
+            pending.close()
+
+
+def get_task_or_archived(db: Session, task_id: int, user_id: Optional[int] = None):
+    """
+    Obtiene una tarea por ID buscando primero en la tabla activa y,
+    si no existe, en el archivo.
+    
+    Returns:
+        Task, ArchivedTask o None si no existe en ninguna
+    """
+    db_task = get_task(db, task_id, user_id)
+    if db_task is not None:
+        return db_task
+    query = db.query(ArchivedTask).filter(ArchivedTask.id == task_id)
+    if user_id is not None:
+        query = query.filter(ArchivedTask.user_id == user_id)
+    return query.first()
 
 
-def create_task(db: Session, task: TaskCreate) -> Task:
+def get_task_tree(db: Session, task_id: int, depth: int, user_id: Optional[int] = None) -> list[Task]:
+    """
+    Una tarea y sus subtareas hasta `depth` niveles con una sola consulta
+    (CTE recursiva sobre ix_tasks_parent_id).
+    
+    Returns:
+        Tareas del subárbol por nivel y luego por ID (la raíz primero);
+        lista vacía si la tarea no existe
+    """
+    root = select(Task.id, literal(0).label("depth")).where(Task.id == task_id, Task.deleted_at.is_(None))
+    if user_id is not None:
+        root = root.where(Task.user_id == user_id)
+    tree = root.cte("tree", recursive=True)
+    child = aliased(Task)
+    tree = tree.union_all(
+        select(child.id, tree.c.depth + 1)
+        .where(child.parent_id == tree.c.id, child.deleted_at.is_(None), tree.c.depth < depth)
+    )
+    return db.query(Task).join(tree, Task.id == tree.c.id).order_by(tree.c.depth, Task.id).all()
+
+
+def _descendant_ids(db: Session, task_id: int) -> list[int]:
+    """
+    IDs de todas las subtareas visibles de una tarea (CTE recursiva).
+    """
+    tree = select(Task.id).where(Task.parent_id == task_id, Task.deleted_at.is_(None)).cte(
+        "descendants", recursive=True
+    )
+    child = aliased(Task)
+    tree = tree.union_all(select(child.id).where(child.parent_id == tree.c.id, child.deleted_at.is_(None)))
+    return list(db.scalars(select(tree.c.id)))
+
+
+def _stage_create(db: Session, task: TaskCreate, user_id: Optional[int] = None) -> Task:
+    """
+    Agrega una tarea nueva a la sesión sin confirmar la transacción.
+    
+    Raises:
+        ParentNotFound: Si `parent_id` no es una tarea visible del usuario
+    """
+    if task.parent_id is not None and get_task(db, task.parent_id, user_id) is None:
+        raise ParentNotFound(task.parent_id)
+    db_task = Task(**task.model_dump(exclude={"tags"}), user_id=user_id)
+    _set_tags(db_task, task.tags)
+    if db_task.completed:
+        db_task.completed_at = datetime.utcnow()
+    db.add(db_task)
+    return db_task
+
+
+def _stage_update(db_task: Task, task_update: TaskUpdate) -> Task:
+    """
+    Aplica una actualización parcial sobre la tarea sin confirmar.
+    """
+    update_data = task_update.model_dump(exclude_unset=True)
+    tags = update_data.pop("tags", None)
+    if tags is not None:
+        _set_tags(db_task, tags)
+    if "completed" in update_data and update_data["completed"] != db_task.completed:
+        db_task.completed_at = datetime.utcnow() if update_data["completed"] else None
+    for field, value in update_data.items():
+        setattr(db_task, field, value)
+    return db_task
+
+
+def _set_tags(db_task: Task, tags: list[str]) -> None:
+    """
+    Reemplaza las etiquetas de la tarea conservando las filas existentes;
+    las quitadas se borran al hacer flush (delete-orphan).
+    """
+    current = {row.tag: row for row in db_task.tag_rows}
+    db_task.tag_rows = [current.get(tag) or TaskTag(tag=tag) for tag in tags]
+
+
+def _tag_count_delta(tag: str, delta: int):
+    statement = sqlite_insert(TagCount).values(tag=tag, count=delta)
+    return statement.on_conflict_do_update(
+        index_elements=[TagCount.tag], set_={"count": TagCount.count + delta}
+    )
+
+
+@event.listens_for(TaskTag, "after_insert")
+def _count_tag_insert(mapper, connection, target):
+    # Mismo flush y transacción que la etiqueta: los conteos no se desincronizan
+    connection.execute(_tag_count_delta(target.tag, 1))
+
+
+@event.listens_for(TaskTag, "after_delete")
+def _count_tag_delete(mapper, connection, target):
+    connection.execute(_tag_count_delta(target.tag, -1))
+
+
+def release_tag_counts(db: Session, task_ids: list[int]) -> None:
+    """
+    Descuenta de las facetas las etiquetas de tareas que dejan de estar
+    activas sin pasar por el ORM (archivado en bloque). No confirma.
+    """
+    tagged = select(TaskTag.tag, func.count().label("n")).where(
+        TaskTag.task_id.in_(task_ids)
+    ).group_by(TaskTag.tag)
+    for tag, count in db.execute(tagged).all():
+        db.execute(update(TagCount).where(TagCount.tag == tag).values(count=TagCount.count - count))
+
+
+def get_tag_counts(db: Session, user_id: Optional[int] = None) -> list[TagCount]:
+    """
+    Etiquetas con tareas activas, de la más usada a la menos usada.
+    
+    Los conteos globales se leen de 'tag_counts'; los de un usuario se
+    agregan al vuelo sobre sus tareas (índice ix_tasks_user_id).
+    """
+    if user_id is not None:
+        count = func.count().label("n")
+        rows = db.execute(
+            select(TaskTag.tag, count)
+            .join(Task, Task.id == TaskTag.task_id)
+            .where(Task.user_id == user_id, Task.deleted_at.is_(None))
+            .group_by(TaskTag.tag)
+            .order_by(count.desc(), TaskTag.tag)
+        ).all()
+        return [TagCount(tag=tag, count=n) for tag, n in rows]
+    return (
+        db.query(TagCount)
+        .filter(TagCount.count > 0)
+        .order_by(TagCount.count.desc(), TagCount.tag)
+        .all()
+    )
+
+
+def create_task(db: Session, task: TaskCreate, user_id: Optional[int] = None) -> Task:
     """
     Crea una nueva tarea en la base de datos.
     
     Args:
         db: Sesión de base de datos
         task: Datos de la tarea a crear
+        user_id: Usuario dueño de la tarea
     
     Returns:
         La tarea creada con su ID generado
+    
+    Raises:
+        ParentNotFound: Si `parent_id` no es una tarea visible del usuario
     """
-    db_task = Task(**task.model_dump())
-    db.add(db_task)
+    db_task = _stage_create(db, task, user_id)
     db.commit()
+    cache.write_generation.bump()
     db.refresh(db_task)
+    events.hub.publish("created", db_task.id, db_task)
     return db_task
 
 
-def update_task(db: Session, task_id: int, task_update: TaskUpdate) -> Optional[Task]:
+def update_task(
+    db: Session,
+    task_id: int,
+    task_update: TaskUpdate,
+    expected_versions: Optional[Collection[int]] = None,
+    user_id: Optional[int] = None
+) -> Optional[Task]:
     """
     Actualiza una tarea existente.
     Solo actualiza los campos proporcionados (actualización parcial).
     
+    La comprobación de versión y el incremento ocurren en el mismo UPDATE
+    (`WHERE id = ? AND version IN (...)`, con RETURNING): no se lee la
+    tarea antes ni se toman bloqueos. Solo si no se actualizó ninguna fila
+    se consulta la tarea para distinguir 404 de conflicto.
+    
     Args:
         db: Sesión de base de datos
         task_id: ID de la tarea a actualizar
         task_update: Datos a actualizar
+        expected_versions: Versiones aceptadas (If-Match); None = cualquiera
+        user_id: Solo si pertenece a este usuario (None = cualquier dueño)
     
     Returns:
         La tarea actualizada o None si no existe
-    """
-    db_task = get_task(db, task_id)
-    if not db_task:
-        return None
     
-    # Actualizar solo los campos proporcionados
+    Raises:
+        VersionConflict: Si la versión actual no está entre las esperadas
+    """
     update_data = task_update.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_task, field, value)
+    tags = update_data.pop("tags", None)
+    values = dict(update_data)
+    if "completed" in values:
+        # completed_at solo cambia si el estado cambia
+        values["completed_at"] = case(
+            (Task.completed == values["completed"], Task.completed_at),
+            else_=literal(datetime.utcnow(), Task.completed_at.type) if values["completed"] else null(),
+        )
+    values["version"] = Task.version + 1
+    
+    statement = update(Task).where(Task.id == task_id, Task.deleted_at.is_(None))
+    if user_id is not None:
+        statement = statement.where(Task.user_id == user_id)
+    if expected_versions is not None:
+        statement = statement.where(Task.version.in_(expected_versions))
+    db_task = db.scalars(
+        statement.values(**values).returning(Task),
+        execution_options={"populate_existing": True, "synchronize_session": False},
+    ).one_or_none()
+    
+    if db_task is None:
+        current = get_task(db, task_id, user_id)
+        db.rollback()
+        if current is None:
+            return None
+        raise VersionConflict(current.version)
     
+    if tags is not None:
+        _set_tags(db_task, tags)
     db.commit()
+    cache.write_generation.bump()
     db.refresh(db_task)
+    events.hub.publish("updated", db_task.id, db_task)
     return db_task
 
 
-def delete_task(db: Session, task_id: int) -> bool:
+def _stage_delete(db_task: Task) -> Task:
+    """
+    Marca la tarea como eliminada (soft delete) sin confirmar.
+    La fila se borra físicamente más tarde (ver purge.py).
+    """
+    db_task.deleted_at = datetime.utcnow()
+    # Las tareas eliminadas no cuentan en las facetas
+    db_task.tag_rows = []
+    return db_task
+
+
+def _stage_delete_subtree(db: Session, db_task: Task) -> list[int]:
+    """
+    Marca como eliminadas la tarea y todas sus subtareas sin confirmar.
+    
+    Returns:
+        IDs de las subtareas eliminadas junto con la tarea
+    """
+    descendant_ids = _descendant_ids(db, db_task.id)
+    for start in range(0, len(descendant_ids), SQLITE_MAX_VARIABLES):
+        chunk = descendant_ids[start:start + SQLITE_MAX_VARIABLES]
+        for descendant in db.query(Task).filter(Task.id.in_(chunk)):
+            _stage_delete(descendant)
+    _stage_delete(db_task)
+    return descendant_ids
+
+
+def delete_task(
+    db: Session,
+    task_id: int,
+    expected_versions: Optional[Collection[int]] = None,
+    user_id: Optional[int] = None
+) -> bool:
     """
-    Elimina una tarea de la base de datos.
+    Elimina una tarea y sus subtareas (soft delete): dejan de ser visibles
+    de inmediato y el purgador las borra físicamente en segundo plano.
     
     Args:
         db: Sesión de base de datos
         task_id: ID de la tarea a eliminar
+        expected_versions: Versiones aceptadas (If-Match); None = cualquiera
+        user_id: Solo si pertenece a este usuario (None = cualquier dueño)
     
     Returns:
         True si se eliminó, False si no existía
+    
+    Raises:
+        VersionConflict: Si la versión actual no está entre las esperadas
+            (sin If-Match, solo si la tarea cambia en cada reintento)
     """
-    db_task = get_task(db, task_id)
-    if not db_task:
-        return False
+    for attempt in range(DELETE_ATTEMPTS):
+        db_task = get_task(db, task_id, user_id)
+        if not db_task:
+            return False
+        if expected_versions is not None and db_task.version not in expected_versions:
+            raise VersionConflict(db_task.version)
+        
+        descendant_ids = _stage_delete_subtree(db, db_task)
+        try:
+            # El flush usa WHERE version = ?: detecta una escritura concurrente
+            db.commit()
+            break
+        except StaleDataError:
+            db.rollback()
+            # Sin If-Match cualquier versión vale: se relee y se reintenta
+            if expected_versions is None and attempt + 1 < DELETE_ATTEMPTS:
+                continue
+            current = get_task(db, task_id, user_id)
+            if current is None:
+                return False
+            raise VersionConflict(current.version)
+    cache.write_generation.bump()
+    for deleted_id in [task_id] + descendant_ids:
+        events.hub.publish("deleted", deleted_id, user_id=db_task.user_id)
+    return True
+
+
+# Evento publicado por cada tipo de operación del lote
+BATCH_EVENTS = {"create": "created", "update": "updated", "delete": "deleted"}
+
+
+def apply_batch(
+    db: Session,
+    operations: list[BatchOperation],
+    atomic: bool = True,
+    user_id: Optional[int] = None
+) -> tuple[list[BatchOperationResult], bool]:
+    """
+    Ejecuta una lista ordenada de operaciones en una sola transacción.
+    
+    Cada operación se valida antes de tocar la sesión, de modo que una
+    operación fallida no deja cambios parciales. En modo atómico, el primer
+    fallo revierte todo el lote; en modo best-effort cada operación corre
+    en su propio SAVEPOINT, un error (incluido uno de la base de datos)
+    revierte solo esa operación y el resto se confirma con un único commit.
+    
+    Args:
+        db: Sesión de base de datos
+        operations: Operaciones create/update/delete en orden
+        atomic: True para todo-o-nada, False para best-effort
+        user_id: Usuario dueño de las tareas creadas y modificadas
+    
+    Returns:
+        Tupla (resultados por operación, si se confirmó la transacción)
+    """
+    results: list[BatchOperationResult] = []
+    staged: list[tuple[int, str, Task, int]] = []
+    cascaded: list[tuple[int, Optional[int]]] = []
+    failed = False
+    
+    if not atomic:
+        _begin_transaction(db)
+    for index, operation in enumerate(operations):
+        savepoint = None if atomic else db.begin_nested()
+        try:
+            status, error, db_task, descendant_ids = _apply_operation(db, operation, user_id)
+        except SQLAlchemyError as exc:
+            results.append(BatchOperationResult(
+                index=index, op=operation.op, status=500, error=str(exc.__class__.__name__)
+            ))
+            if atomic:
+                # Un error de la base de datos invalida la transacción completa
+                db.rollback()
+                return _mark_rolled_back(results, operations), False
+            savepoint.rollback()
+            failed = True
+            continue
+        
+        results.append(BatchOperationResult(index=index, op=operation.op, status=status, error=error))
+        if error is not None:
+            failed = True
+            if atomic:
+                break
+            savepoint.rollback()
+            continue
+        if savepoint is not None:
+            savepoint.commit()
+        staged.append((index, BATCH_EVENTS[operation.op], db_task, db_task.id))
+        # Las subtareas son del mismo usuario que su padre
+        cascaded += [(task_id, db_task.user_id) for task_id in descendant_ids]
+    
+    if failed and atomic:
+        db.rollback()
+        return _mark_rolled_back(results, operations), False
     
-    db.delete(db_task)
     db.commit()
-    return True
+    cache.write_generation.bump()
+    for index, event_type, db_task, task_id in staged:
+        if event_type == "deleted":
+            events.hub.publish("deleted", task_id, user_id=db_task.user_id)
+            continue
+        db.refresh(db_task)
+        results[index].task = db_task
+        events.hub.publish(event_type, task_id, db_task)
+    for task_id, owner_id in cascaded:
+        events.hub.publish("deleted", task_id, user_id=owner_id)
+    return results, True
+
+
+def _apply_operation(
+    db: Session,
+    operation: BatchOperation,
+    user_id: Optional[int]
+) -> tuple[int, Optional[str], Optional[Task], list[int]]:
+    """
+    Aplica una operación del lote sobre la sesión (flush, sin confirmar).
+    
+    Returns:
+        Tupla (status HTTP, error o None, tarea, IDs de subtareas eliminadas)
+    """
+    if operation.op == "create":
+        try:
+            db_task = _stage_create(db, operation.data, user_id)
+        except ParentNotFound:
+            return 422, "Tarea padre no encontrada", None, []
+        db.flush()
+        return 201, None, db_task, []
+    
+    db_task = get_task(db, operation.task_id, user_id)
+    if db_task is None:
+        return 404, "Tarea no encontrada", None, []
+    if operation.op == "update":
+        _stage_update(db_task, operation.data)
+        db.flush()
+        return 200, None, db_task, []
+    descendant_ids = _stage_delete_subtree(db, db_task)
+    db.flush()
+    return 204, None, db_task, descendant_ids
+
+
+def _begin_transaction(db: Session) -> None:
+    """
+    Abre la transacción de la conexión antes del primer SAVEPOINT.
+    
+    pysqlite solo emite BEGIN antes de un INSERT/UPDATE/DELETE: un
+    SAVEPOINT fuera de transacción la abre él mismo y su RELEASE la
+    confirmaría, así que un rollback posterior ya no lo desharía.
+    """
+    connection = db.connection()
+    if not connection.connection.driver_connection.in_transaction:
+        connection.exec_driver_sql("BEGIN")
+
+
+def _mark_rolled_back(
+    results: list[BatchOperationResult],
+    operations: list[BatchOperation]
+) -> list[BatchOperationResult]:
+    """
+    Marca con 424 (Failed Dependency) las operaciones revertidas o no ejecutadas.
+    """
+    for result in results:
+        if result.error is None:
+            result.status = 424
+            result.error = "Revertida por un fallo en el lote"
+    for index in range(len(results), len(operations)):
+        results.append(BatchOperationResult(
+            index=index, op=operations[index].op, status=424, error="No ejecutada por un fallo en el lote"
+        ))
+    return results
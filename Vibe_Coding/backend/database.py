@@ -2,35 +2,222 @@
 Configuración de la base de datos SQLite con SQLAlchemy.
 Este módulo gestiona la conexión y sesiones a la base de datos.
 """
-from sqlalchemy import create_engine
+import os
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+
+import config
+import memory
+import suggest
 
 # URL de conexión a SQLite (archivo local)
-SQLALCHEMY_DATABASE_URL = "sqlite:///./quicktask.db"
+# Docker Compose la define para ubicar la base en el volumen /app/data
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./quicktask.db")
+
+# Tamaño del pool y espera máxima por una conexión. Con un timeout corto
+# una sobrecarga falla rápido (503) en lugar de encolar requests sin fin.
+POOL_OPTIONS = {
+    "pool_size": config.DB_POOL_SIZE,
+    "max_overflow": config.DB_MAX_OVERFLOW,
+    "pool_timeout": config.DB_POOL_TIMEOUT_SECONDS,
+}
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    auto_vacuum=INCREMENTAL permite devolver páginas libres al sistema
+    con PRAGMA incremental_vacuum. Solo tiene efecto en archivos nuevos
+    (antes de crear tablas); en una base existente el VACUUM único lo
+    ejecuta migrations.enable_incremental_vacuum.
+    
+    recursive_triggers propaga los contadores de subtareas hasta la raíz
+    (ver models.ROLLUP_TRIGGERS).
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    cursor.execute("PRAGMA recursive_triggers = ON")
+    cursor.close()
+
+
+def _fold(value: Optional[str]) -> Optional[str]:
+    return suggest.normalize(value) if value is not None else None
+
+
+def _register_sqlite_functions(dbapi_connection, connection_record):
+    """
+    Funciones SQL propias: `fold(texto)` normaliza como suggest.normalize
+    (sin acentos, casefold), para que la búsqueda de títulos en la base
+    coincida con la del índice de autocompletado.
+    """
+    dbapi_connection.create_function("fold", 1, _fold, deterministic=True)
+
+
+def create_sqlite_engine(url: str) -> Engine:
+    """
+    Crea un motor SQLite con el pool y los PRAGMA de la aplicación.
+    check_same_thread=False es necesario para SQLite con FastAPI; las
+    bases en memoria usan un pool por hilo que no admite POOL_OPTIONS.
+    """
+    sqlite_engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False},
+        **({} if ":memory:" in url else POOL_OPTIONS)
+    )
+    event.listen(sqlite_engine, "connect", _set_sqlite_pragmas)
+    event.listen(sqlite_engine, "connect", _register_sqlite_functions)
+    return sqlite_engine
+
 
 # Crear el motor de base de datos
-# check_same_thread=False es necesario para SQLite con FastAPI
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, 
-    connect_args={"check_same_thread": False}
-)
+engine = create_sqlite_engine(SQLALCHEMY_DATABASE_URL)
 
 # Crear la sesión local
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+class ShardRouter:
+    """
+    Reparte los usuarios entre N archivos SQLite por hash del user_id.
+
+    Cada shard tiene su propio engine y pool, y por tanto su propio lock
+    de escritura: usuarios en shards distintos escriben en paralelo. El
+    hash (CRC32) es estable entre procesos y reinicios; cambiar el número
+    de shards reubica usuarios y requiere mover sus datos.
+    """
+
+    def __init__(self, urls: list[str]):
+        self.urls = urls
+        self.engines = [create_sqlite_engine(url) for url in urls]
+        self.sessionmakers = [
+            sessionmaker(autocommit=False, autoflush=False, bind=shard_engine)
+            for shard_engine in self.engines
+        ]
+
+    def __len__(self) -> int:
+        return len(self.engines)
+
+    def shard_for(self, user_id: int) -> int:
+        """
+        Índice del shard que guarda las tareas del usuario.
+        """
+        return zlib.crc32(str(user_id).encode()) % len(self.engines)
+
+    def sessionmaker_for(self, user_id: int) -> Callable[[], Session]:
+        return self.sessionmakers[self.shard_for(user_id)]
+
+    def dispose(self) -> None:
+        for shard_engine in self.engines:
+            shard_engine.dispose()
+
+
+def shard_urls(count: int, template: str) -> list[str]:
+    """
+    URLs de los shards a partir de una plantilla con `{shard}`.
+    """
+    return [template.format(shard=shard) for shard in range(count)]
+
+
+# Shards por usuario (None = un solo archivo, QUICKTASK_SHARD_COUNT <= 1)
+shards: Optional[ShardRouter] = (
+    ShardRouter(shard_urls(config.SHARD_COUNT, config.SHARD_URL_TEMPLATE))
+    if config.SHARD_COUNT > 1 else None
+)
+
 # Base para los modelos declarativos
 Base = declarative_base()
 
 
+class PoolWaitMonitor:
+    """
+    Mide la espera para obtener una conexión del pool.
+
+    Mantiene cuántos requests esperan en este momento y una media móvil
+    exponencial de la espera que decae con el tiempo, para que un pico
+    pasado deje de contar aunque no lleguen nuevas muestras.
+    """
+
+    def __init__(self, alpha: float = 0.2, half_life_seconds: float = 2.0, clock=time.monotonic):
+        self.alpha = alpha
+        self.half_life_seconds = half_life_seconds
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._ewma = 0.0
+        self._updated = clock()
+        self.waiting = 0
+        self.samples = 0
+        self.max_wait = 0.0
+
+    def begin(self) -> float:
+        with self._lock:
+            self.waiting += 1
+        return self.clock()
+
+    def end(self, started: float) -> None:
+        now = self.clock()
+        waited = now - started
+        with self._lock:
+            self.waiting -= 1
+            self._ewma = self._decayed(now) * (1 - self.alpha) + waited * self.alpha
+            self._updated = now
+            self.samples += 1
+            self.max_wait = max(self.max_wait, waited)
+
+    def _decayed(self, now: float) -> float:
+        return self._ewma * 0.5 ** ((now - self._updated) / self.half_life_seconds)
+
+    @property
+    def average_wait(self) -> float:
+        """
+        Espera media reciente en segundos.
+        """
+        with self._lock:
+            return self._decayed(self.clock())
+
+    def stats(self) -> dict:
+        return {
+            "waiting": self.waiting,
+            "avg_wait_ms": round(self.average_wait * 1000, 3),
+            "max_wait_ms": round(self.max_wait * 1000, 3),
+            "samples": self.samples,
+        }
+
+
+# Monitor global de espera del pool (lo consulta el control de admisión)
+pool_monitor = PoolWaitMonitor()
+
+
+@contextmanager
+def session_scope(factory: Callable[[], Session]) -> Iterator[Session]:
+    """
+    Abre una sesión midiendo la espera del pool y la cierra al salir.
+    """
+    db = factory()
+    try:
+        # Obtener la conexión aquí para medir la espera del pool
+        started = pool_monitor.begin()
+        try:
+            db.connection()
+        finally:
+            pool_monitor.end(started)
+        yield db
+    finally:
+        memory.session_stats.record(len(db.identity_map))
+        db.close()
+
+
 def get_db():
     """
     Generador que proporciona una sesión de base de datos.
     Se usa como dependencia en los endpoints de FastAPI.
     Garantiza que la sesión se cierre después de cada request.
     """
-    db = SessionLocal()
-    try:
+    with session_scope(SessionLocal) as db:
         yield db
-    finally:
-        db.close()
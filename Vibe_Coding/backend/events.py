@@ -0,0 +1,344 @@
+"""
+Hub de eventos en tiempo real para cambios en tareas.
+Distribuye los eventos de creación, actualización y eliminación emitidos
+por crud hacia los suscriptores SSE/WebSocket del proceso y hacia los
+listeners internos (otros módulos que reaccionan a las escrituras).
+"""
+import abc
+import asyncio
+import functools
+import itertools
+import json
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Optional
+
+import config
+import database
+import schemas
+
+logger = logging.getLogger(__name__)
+
+
+class SubscriptionClosed(Exception):
+    """
+    El suscriptor fue cerrado (por ejemplo, por no consumir a tiempo).
+    """
+    pass
+
+
+@dataclass(frozen=True)
+class TaskEvent:
+    """
+    Evento de cambio de una tarea.
+
+    Atributos:
+        id: Número de secuencia del evento (creciente por proceso)
+        type: Tipo de evento ("created", "updated", "deleted", "archived")
+        task_id: ID de la tarea afectada
+        task: Tarea serializada en modo JSON (None en eliminaciones y
+            archivado, o si nadie recibe eventos)
+        data: Evento completo codificado como JSON (se codifica una vez,
+            al primer uso, y se comparte entre suscriptores)
+        user_id: Dueño de la tarea (None = tarea sin dueño)
+        shard: Shard que guarda la tarea (None sin particionado); con
+            shards, (shard, task_id) identifica la tarea: los IDs se repiten
+    """
+    id: int
+    type: str
+    task_id: int
+    task: Optional[dict]
+    user_id: Optional[int] = None
+    shard: Optional[int] = None
+
+    @functools.cached_property
+    def data(self) -> str:
+        return json.dumps(
+            {
+                "id": self.id, "type": self.type, "task_id": self.task_id,
+                "user_id": self.user_id, "shard": self.shard, "task": self.task,
+            },
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+
+
+class Subscriber:
+    """
+    Suscriptor con cola acotada ligada a un event loop.
+    Usa __slots__ y un deque para que miles de conexiones inactivas
+    ocupen poca memoria. Con `user_id` solo recibe los eventos de las
+    tareas de ese usuario.
+    """
+    __slots__ = ("loop", "maxsize", "user_id", "closed", "dropped", "_queue", "_waiter")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, maxsize: int, user_id: Optional[int] = None):
+        self.loop = loop
+        self.maxsize = maxsize
+        self.user_id = user_id
+        self.closed = False
+        self.dropped = False
+        self._queue: deque = deque()
+        self._waiter: Optional[asyncio.Future] = None
+
+    def push(self, event: TaskEvent) -> None:
+        """
+        Encola un evento. Debe llamarse desde el hilo del event loop.
+        Si la cola está llena el suscriptor se descarta (consumidor lento).
+        """
+        if self.closed:
+            return
+        if len(self._queue) >= self.maxsize:
+            self.dropped = True
+            self.close()
+            return
+        self._queue.append(event)
+        self._wake()
+
+    def close(self) -> None:
+        """
+        Cierra el suscriptor y despierta a quien esté esperando.
+        """
+        self.closed = True
+        self._queue.clear()
+        self._wake()
+
+    def _wake(self) -> None:
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    async def next_event(self, timeout: float) -> Optional[TaskEvent]:
+        """
+        Espera el siguiente evento.
+
+        Args:
+            timeout: Segundos máximos de espera (intervalo de heartbeat)
+
+        Returns:
+            El evento, o None si venció el timeout (enviar heartbeat)
+
+        Raises:
+            SubscriptionClosed: Si el suscriptor fue cerrado
+        """
+        if not self._queue and not self.closed:
+            self._waiter = self.loop.create_future()
+            try:
+                await asyncio.wait_for(self._waiter, timeout)
+            except asyncio.TimeoutError:
+                return None
+            finally:
+                self._waiter = None
+        if self._queue:
+            return self._queue.popleft()
+        raise SubscriptionClosed()
+
+
+class HubAdapter(abc.ABC):
+    """
+    Interfaz de transporte del hub.
+    Un adaptador recibe los eventos publicados y los entrega a `deliver`
+    en cada proceso. El adaptador local entrega en el mismo proceso; uno
+    distribuido (Redis, NATS, ...) publicaría hacia los demás workers y
+    llamaría a `deliver` al recibir.
+    """
+
+    # Solo entrega en este proceso: sin suscriptores ni listeners locales
+    # nadie recibe el evento
+    local = False
+
+    def attach(self, deliver: Callable[[TaskEvent], None]) -> None:
+        self._deliver = deliver
+
+    @abc.abstractmethod
+    def publish(self, event: TaskEvent) -> None:
+        ...
+
+    def close(self) -> None:
+        pass
+
+
+class LocalAdapter(HubAdapter):
+    """
+    Adaptador en proceso: entrega directamente a los suscriptores locales.
+    """
+
+    local = True
+
+    def publish(self, event: TaskEvent) -> None:
+        self._deliver(event)
+
+
+class EventHub:
+    """
+    Pub/sub en proceso para eventos de tareas.
+
+    Los suscriptores se agrupan por event loop para que una publicación
+    desde un hilo del threadpool programe un único callback por loop,
+    sin importar cuántos suscriptores haya.
+    """
+
+    def __init__(self, queue_size: int = 64, adapter: Optional[HubAdapter] = None):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._subscribers: dict[asyncio.AbstractEventLoop, set[Subscriber]] = {}
+        self._listeners: list[Callable[[TaskEvent], None]] = []
+        self._sequence = itertools.count(1)
+        self.published = 0
+        self.dropped_subscribers = 0
+        self.adapter = adapter or LocalAdapter()
+        self.adapter.attach(self._deliver)
+
+    def subscribe(self, user_id: Optional[int] = None) -> Subscriber:
+        """
+        Registra un suscriptor en el event loop actual.
+        Debe llamarse desde código async.
+
+        Args:
+            user_id: Recibir solo los eventos de este usuario (None = todos)
+        """
+        loop = asyncio.get_running_loop()
+        subscriber = Subscriber(loop, self.queue_size, user_id)
+        with self._lock:
+            self._subscribers.setdefault(loop, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        """
+        Elimina un suscriptor del hub.
+        """
+        with self._lock:
+            subscribers = self._subscribers.get(subscriber.loop)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[subscriber.loop]
+        subscriber.close()
+
+    def add_listener(self, listener: Callable[[TaskEvent], None]) -> None:
+        """
+        Registra un listener síncrono que recibe cada evento publicado.
+        """
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[TaskEvent], None]) -> None:
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def publish(
+        self,
+        event_type: str,
+        task_id: int,
+        task: Any = None,
+        user_id: Optional[int] = None
+    ) -> TaskEvent:
+        """
+        Publica un evento de tarea. Seguro para llamarse desde cualquier hilo.
+
+        Args:
+            event_type: "created", "updated", "deleted" o "archived"
+            task_id: ID de la tarea afectada
+            task: Objeto Task (o compatible) con el estado actual, si existe
+            user_id: Dueño de la tarea (por defecto el de `task`)
+
+        Returns:
+            El evento publicado. Si nadie lo recibe (adaptador local sin
+            suscriptores ni listeners) la tarea no se serializa y `task`
+            queda en None.
+        """
+        task_data = None
+        if task is not None:
+            if user_id is None:
+                user_id = getattr(task, "user_id", None)
+            if self._has_consumers():
+                task_data = schemas.TaskResponse.model_validate(task).model_dump(mode="json")
+        shard = None
+        if database.shards is not None and user_id is not None:
+            shard = database.shards.shard_for(user_id)
+        event = TaskEvent(
+            id=next(self._sequence), type=event_type, task_id=task_id, task=task_data,
+            user_id=user_id, shard=shard,
+        )
+        self.published += 1
+        self.adapter.publish(event)
+        return event
+
+    def _has_consumers(self) -> bool:
+        return not self.adapter.local or bool(self._listeners or self._subscribers)
+
+    def _deliver(self, event: TaskEvent) -> None:
+        with self._lock:
+            listeners = list(self._listeners)
+            loops = list(self._subscribers)
+        for listener in listeners:
+            try:
+                listener(event)
+            except Exception:
+                logger.exception("Error en listener de eventos")
+        for loop in loops:
+            try:
+                loop.call_soon_threadsafe(self._fanout, loop, event)
+            except RuntimeError:
+                # El loop ya se cerró: descartar sus suscriptores
+                with self._lock:
+                    self._subscribers.pop(loop, None)
+
+    def _fanout(self, loop: asyncio.AbstractEventLoop, event: TaskEvent) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.get(loop, ()))
+        for subscriber in subscribers:
+            if subscriber.user_id is not None and subscriber.user_id != event.user_id:
+                continue
+            subscriber.push(event)
+            if subscriber.dropped:
+                self.dropped_subscribers += 1
+                self.unsubscribe(subscriber)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def stats(self) -> dict:
+        """
+        Estadísticas del hub para monitoreo.
+        """
+        return {
+            "subscribers": self.subscriber_count(),
+            "published": self.published,
+            "dropped_subscribers": self.dropped_subscribers,
+        }
+
+
+def format_sse(event: TaskEvent) -> str:
+    """
+    Formatea un evento según el protocolo Server-Sent Events.
+    """
+    return f"id: {event.id}\nevent: {event.type}\ndata: {event.data}\n\n"
+
+
+async def sse_stream(hub: "EventHub", subscriber: Subscriber, heartbeat: float) -> AsyncIterator[str]:
+    """
+    Generador del cuerpo SSE: eventos, comentarios de heartbeat y
+    un evento final "overflow" si el cliente no consume a tiempo.
+    """
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                event = await subscriber.next_event(heartbeat)
+            except SubscriptionClosed:
+                yield "event: overflow\ndata: {}\n\n"
+                return
+            if event is None:
+                yield ": heartbeat\n\n"
+            else:
+                yield format_sse(event)
+    finally:
+        hub.unsubscribe(subscriber)
+
+
+# Hub global del proceso
+hub = EventHub(queue_size=config.EVENTS_QUEUE_SIZE)
@@ -0,0 +1,39 @@
+"""
+Perfil de producción con varios procesos:
+
+    gunicorn -c gunicorn_conf.py main:app
+
+- Un UvicornWorker por CPU de la cuota del contenedor (ver workers.py);
+  QUICKTASK_WEB_CONCURRENCY lo fija a mano.
+- preload_app: el maestro importa la app una vez (tablas, migraciones,
+  memoria compartida de la generación de escrituras) y los workers la
+  heredan por fork con copy-on-write.
+- post_fork descarta las conexiones SQLite heredadas; cada worker abre
+  las suyas.
+- max_requests (con jitter, para que no se reinicien todos juntos) y
+  QUICKTASK_WORKER_MAX_RSS_MB reciclan workers para acotar la memoria.
+"""
+import os
+
+import workers as quicktask_workers
+
+bind = os.getenv("QUICKTASK_BIND", "0.0.0.0:8000")
+workers = quicktask_workers.worker_count()
+# config lee este valor al importarse (con preload, en el maestro)
+os.environ["QUICKTASK_WORKERS"] = str(workers)
+
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+
+max_requests = int(os.getenv("QUICKTASK_MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.getenv("QUICKTASK_MAX_REQUESTS_JITTER", "1000"))
+graceful_timeout = int(os.getenv("QUICKTASK_GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.getenv("QUICKTASK_WORKER_TIMEOUT", "60"))
+keepalive = 5
+
+accesslog = None
+errorlog = "-"
+
+
+def post_fork(server, worker):
+    quicktask_workers.after_fork()
@@ -0,0 +1,308 @@
+"""
+Escrituras idempotentes con el header `Idempotency-Key`.
+
+La primera petición con una clave ejecuta la escritura y guarda la
+respuesta serializada en la tabla 'idempotency_keys' y en una LRU en
+memoria con expiración. Los reintentos con la misma clave reciben la
+respuesta guardada sin volver a escribir.
+
+- Duplicados concurrentes en el mismo proceso esperan a la primera
+  ejecución (single-flight). Entre workers, la fila con status_code
+  NULL marca la clave como "en curso" y los demás consultan la tabla
+  hasta que tenga respuesta (o responden 409 tras `wait_seconds`). La
+  fila se da por abandonada (proceso muerto) recién tras
+  `lease_seconds`, mucho más que la espera: una primera petición lenta
+  (p. ej. esperando el lock de escritura de SQLite) no se repite.
+- La misma clave con otro cuerpo es un error del cliente (422).
+- Los errores (excepciones) no se guardan: la fila se borra y el
+  cliente puede reintentar.
+- La respuesta se guarda en una transacción aparte de la escritura: si
+  el proceso muere entre ambas, un reintento vuelve a escribir.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import config
+import singleflight
+from database import SessionLocal
+from models import IdempotencyRecord
+
+logger = logging.getLogger(__name__)
+
+
+class KeyReused(Exception):
+    """La clave ya se usó con un cuerpo distinto"""
+
+
+class KeyInProgress(Exception):
+    """Otro proceso sigue ejecutando la petición con esta clave"""
+
+
+@dataclass(frozen=True)
+class StoredResponse:
+    """
+    Respuesta guardada de una escritura.
+
+    Atributos:
+        fingerprint: SHA-256 del cuerpo del request original
+        status_code: Código HTTP
+        body: Cuerpo JSON serializado
+        etag: Header ETag, si la respuesta tenía
+    """
+    fingerprint: str
+    status_code: int
+    body: bytes
+    etag: Optional[str] = None
+
+
+# Escritura a proteger: retorna (status_code, cuerpo JSON, ETag o None)
+WriteFn = Callable[[], tuple[int, bytes, Optional[str]]]
+
+
+def fingerprint(payload: bytes) -> str:
+    """Huella del cuerpo del request (JSON normalizado por Pydantic)"""
+    return hashlib.sha256(payload).hexdigest()
+
+
+class IdempotencyStore:
+    """
+    LRU acotada con TTL delante de la tabla 'idempotency_keys'.
+    Sin `session_factory` (backend en memoria) solo usa la LRU.
+    """
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]],
+        ttl_seconds: float = 86400.0,
+        max_entries: int = 10000,
+        wait_seconds: float = 10.0,
+        lease_seconds: float = 600.0,
+        poll_seconds: float = 0.05,
+        cleanup_every: int = 1000,
+        clock=time.time,
+    ):
+        self.session_factory = session_factory
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.wait_seconds = wait_seconds
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.cleanup_every = cleanup_every
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[float, StoredResponse]] = OrderedDict()
+        self._flight = singleflight.SingleFlight()
+        self._stored_since_cleanup = 0
+        self.executions = 0
+        self.replays = 0
+        self.conflicts = 0
+
+    # ------------------------------------------------------------------
+    # LRU en memoria
+    # ------------------------------------------------------------------
+
+    def _cache_get(self, key: str) -> Optional[StoredResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, stored = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return stored
+
+    def _cache_put(self, key: str, stored: StoredResponse, created: float) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (created + self.ttl_seconds, stored)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    # ------------------------------------------------------------------
+    # Tabla
+    # ------------------------------------------------------------------
+
+    def _expired(self, created_at: datetime) -> bool:
+        return created_at <= datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+
+    def _abandoned(self, record: IdempotencyRecord) -> bool:
+        """Fila "en curso" de un proceso que murió antes de completarla"""
+        return record.status_code is None and record.created_at <= datetime.utcnow() - timedelta(
+            seconds=self.lease_seconds
+        )
+
+    def _claim(self, key: str, print_: str) -> Optional[StoredResponse]:
+        """
+        Inserta la fila "en curso". Si la clave ya existe retorna su
+        respuesta guardada, esperando a que otro proceso la complete.
+        Retorna None si esta petición quedó a cargo de la escritura.
+        """
+        deadline = time.monotonic() + self.wait_seconds
+        while True:
+            with self.session_factory() as db:
+                db.add(IdempotencyRecord(key=key, fingerprint=print_))
+                try:
+                    db.commit()
+                    return None
+                except IntegrityError:
+                    db.rollback()
+                record = db.get(IdempotencyRecord, key)
+                if record is not None and (
+                    self._expired(record.created_at) or self._abandoned(record)
+                ):
+                    db.delete(record)
+                    db.commit()
+                    continue
+                if record is not None and record.status_code is not None:
+                    stored = StoredResponse(
+                        record.fingerprint, record.status_code, record.body, record.etag
+                    )
+                    created = record.created_at.replace(tzinfo=timezone.utc).timestamp()
+                    self._cache_put(key, stored, created)
+                    return stored
+            # En curso en otro worker (o recién borrada): esperar y reintentar
+            if time.monotonic() >= deadline:
+                raise KeyInProgress(key)
+            time.sleep(self.poll_seconds)
+
+    def _save(self, key: str, stored: StoredResponse) -> None:
+        with self.session_factory() as db:
+            record = db.get(IdempotencyRecord, key)
+            if record is None:
+                # Otro worker la borró (toma de control o purge_expired): la
+                # escritura ya se confirmó, así que se vuelve a insertar
+                record = IdempotencyRecord(key=key, fingerprint=stored.fingerprint)
+                db.add(record)
+            record.status_code = stored.status_code
+            record.body = stored.body
+            record.etag = stored.etag
+            try:
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+                logger.warning("Clave de idempotencia %s reclamada por otro worker; no se guarda", key)
+        self._stored_since_cleanup += 1
+        if self._stored_since_cleanup >= self.cleanup_every:
+            self._stored_since_cleanup = 0
+            self.purge_expired()
+
+    def _release(self, key: str) -> None:
+        with self.session_factory() as db:
+            db.execute(delete(IdempotencyRecord).where(IdempotencyRecord.key == key))
+            db.commit()
+
+    def purge_expired(self) -> int:
+        """
+        Borra de la tabla las claves vencidas (usa el índice de created_at).
+        """
+        if self.session_factory is None:
+            return 0
+        cutoff = datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+        with self.session_factory() as db:
+            result = db.execute(
+                delete(IdempotencyRecord).where(IdempotencyRecord.created_at < cutoff)
+            )
+            db.commit()
+            return result.rowcount
+
+    # ------------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------------
+
+    def _execute(self, key: str, print_: str, write: WriteFn) -> tuple[StoredResponse, bool]:
+        """Retorna (respuesta, si se ejecutó la escritura en esta llamada)"""
+        stored = self._cache_get(key)
+        if stored is not None:
+            return stored, False
+        if self.session_factory is not None:
+            stored = self._claim(key, print_)
+            if stored is not None:
+                return stored, False
+        created = self._clock()
+        try:
+            status_code, body, etag = write()
+        except BaseException:
+            if self.session_factory is not None:
+                self._release(key)
+            raise
+        stored = StoredResponse(print_, status_code, body, etag)
+        if self.session_factory is not None:
+            self._save(key, stored)
+        self._cache_put(key, stored, created)
+        with self._lock:
+            self.executions += 1
+        return stored, True
+
+    def run(self, key: str, payload: bytes, write: WriteFn) -> tuple[StoredResponse, bool]:
+        """
+        Ejecuta `write` una sola vez por clave.
+
+        Args:
+            key: Usuario, endpoint y clave del cliente
+            payload: Cuerpo del request (para detectar reutilización)
+            write: Hace la escritura y retorna (status_code, cuerpo, ETag);
+                si lanza una excepción no se guarda nada
+
+        Returns:
+            Tupla (respuesta, si es una repetición)
+
+        Raises:
+            KeyReused: La clave se usó con otro cuerpo
+            KeyInProgress: Otro worker no terminó dentro de `wait_seconds`
+        """
+        print_ = fingerprint(payload)
+        stored = self._cache_get(key)
+        replayed = True
+        if stored is None:
+            (stored, executed), shared = self._flight.do(
+                key, lambda: self._execute(key, print_, write)
+            )
+            replayed = shared or not executed
+        if stored.fingerprint != print_:
+            with self._lock:
+                self.conflicts += 1
+            raise KeyReused(key)
+        if replayed:
+            with self._lock:
+                self.replays += 1
+        return stored, replayed
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = len(self._entries)
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "executions": self.executions,
+            "replays": self.replays,
+            "conflicts": self.conflicts,
+        }
+
+
+# Almacén global (la tabla vive en el archivo principal, también con shards)
+store = IdempotencyStore(
+    SessionLocal if config.STORAGE_BACKEND == "sql" else None,
+    ttl_seconds=config.IDEMPOTENCY_TTL_SECONDS,
+    max_entries=config.IDEMPOTENCY_CACHE_ENTRIES,
+    wait_seconds=config.IDEMPOTENCY_WAIT_SECONDS,
+    lease_seconds=config.IDEMPOTENCY_LEASE_SECONDS,
+)
@@ -2,25 +2,314 @@
 API REST de QuickTask - Gestión de Tareas
 FastAPI application con endpoints CRUD completos.
 """
-from fastapi import FastAPI, Depends, HTTPException, Query
+import asyncio
+import os
+import threading
+from contextlib import asynccontextmanager
+
+import secrets
+
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.openapi.docs import get_redoc_html, get_swagger_ui_html, get_swagger_ui_oauth2_redirect_html
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.orm import Session
-from typing import Optional
+from typing import Literal, Optional, Union
 
+import admission
+import archive
+import backup
+import cache
+import config
+import events
+import export
+import idempotency
+import memory
 import models
+import openapi_doc
+import profiling
+import purge
+import repository
 import schemas
 import crud
-from database import engine, get_db
+import database
+import reminders
+import singleflight
+import suggest
+import workers
+import writebehind
+from database import SessionLocal, engine, get_db, pool_monitor
+from migrations import run_migrations
 
-# Crear las tablas en la base de datos
-models.Base.metadata.create_all(bind=engine)
+# Crear las tablas en la base de datos (y en cada shard si hay particionado)
+for _engine in [engine] + (database.shards.engines if database.shards else []):
+    models.Base.metadata.create_all(bind=_engine)
+    run_migrations(_engine)
 
-# Inicializar la aplicación FastAPI
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Arranca y detiene los procesos en segundo plano de la aplicación.
+    
+    Con varios workers solo el que obtiene el lock de archivo corre los
+    trabajos periódicos (recordatorios, archivado, purga y backups). Con
+    particionado cada trabajo corre una vez por shard.
+    """
+    jobs_lock = None
+    run_jobs = True
+    if config.WORKERS > 1:
+        jobs_lock = workers.acquire_jobs_lock(config.WORKER_JOBS_LOCK_FILE)
+        run_jobs = jobs_lock is not None
+    app.state.runs_jobs = run_jobs
+    
+    # Cargar (o generar) el esquema OpenAPI sin bloquear el arranque
+    threading.Thread(target=lambda: openapi_document.body, name="openapi", daemon=True).start()
+    
+    watchdog = None
+    if config.WORKERS > 1 and config.WORKER_MAX_RSS_MB > 0:
+        watchdog = workers.MemoryWatchdog(
+            config.WORKER_MAX_RSS_MB * 1024 * 1024,
+            interval_seconds=config.WORKER_RSS_CHECK_SECONDS,
+        )
+        watchdog.start()
+    
+    # Una base por shard (None = el archivo único, sin filtrar eventos)
+    if database.shards is not None:
+        targets = list(enumerate(zip(database.shards.engines, database.shards.sessionmakers)))
+    else:
+        targets = [(None, (engine, SessionLocal))]
+    
+    # Los recordatorios leen la ventana de SQLite: con el backend en
+    # memoria las tareas no están en la base y no hay nada que programar
+    schedulers = []
+    if config.REMINDERS_ENABLED and run_jobs and config.STORAGE_BACKEND == "sql":
+        for shard, (_, session_factory) in targets:
+            scheduler = reminders.ReminderScheduler(
+                session_factory,
+                reminders.build_sink(config.REMINDER_SINK),
+                window_seconds=config.REMINDER_WINDOW_SECONDS,
+                # El hub es de este proceso: las escrituras de otros workers se leen de la base
+                refresh_seconds=config.REMINDER_REFRESH_SECONDS if config.WORKERS > 1 else 0,
+                shard=shard,
+            )
+            events.hub.add_listener(scheduler.on_event)
+            scheduler.start()
+            schedulers.append(scheduler)
+    app.state.reminders = schedulers
+    
+    # El índice de autocompletado se construye en el primer uso
+    events.hub.add_listener(suggest.index.on_event)
+    
+    archivers = []
+    if config.ARCHIVE_AFTER_DAYS > 0 and run_jobs:
+        for _, (_, session_factory) in targets:
+            archiver = archive.Archiver(
+                session_factory,
+                older_than_days=config.ARCHIVE_AFTER_DAYS,
+                batch_size=config.ARCHIVE_BATCH_SIZE,
+                interval_seconds=config.ARCHIVE_INTERVAL_SECONDS,
+                pause_seconds=config.ARCHIVE_PAUSE_SECONDS,
+            )
+            archiver.start()
+            archivers.append(archiver)
+    app.state.archiver = archivers
+    
+    purgers = []
+    if config.PURGE_ENABLED and run_jobs:
+        for _, (_, session_factory) in targets:
+            purger = purge.Purger(
+                session_factory,
+                grace_seconds=config.PURGE_GRACE_SECONDS,
+                batch_size=config.PURGE_BATCH_SIZE,
+                interval_seconds=config.PURGE_INTERVAL_SECONDS,
+                duty_cycle=config.PURGE_DUTY_CYCLE,
+                vacuum_pages=config.VACUUM_PAGES_PER_STEP,
+            )
+            purger.start()
+            purgers.append(purger)
+    app.state.purger = purgers
+    
+    managers = [
+        backup.BackupManager(
+            target_engine,
+            config.BACKUP_DIR if shard is None else os.path.join(config.BACKUP_DIR, f"shard{shard}"),
+            pages_per_step=config.BACKUP_PAGES_PER_STEP,
+            sleep_seconds=config.BACKUP_STEP_SLEEP_SECONDS,
+            compress=config.BACKUP_COMPRESS,
+            verify=config.BACKUP_VERIFY,
+            keep=config.BACKUP_KEEP,
+            interval_seconds=config.BACKUP_INTERVAL_SECONDS,
+            max_restarts=config.BACKUP_MAX_RESTARTS,
+        )
+        for shard, (target_engine, _) in targets
+    ]
+    backups = managers[0] if database.shards is None else backup.ShardedBackupManager(managers)
+    if run_jobs:
+        backups.start_schedule()
+    app.state.backups = backups
+    
+    if writebehind.buffer.enabled:
+        writebehind.buffer.start()
+    
+    yield
+    
+    # Volcar los cambios pendientes antes de detener lo demás
+    if writebehind.buffer.enabled:
+        writebehind.buffer.stop()
+    backups.stop_schedule()
+    events.hub.remove_listener(suggest.index.on_event)
+    for purger in purgers:
+        purger.stop()
+    for archiver in archivers:
+        archiver.stop()
+    for scheduler in schedulers:
+        events.hub.remove_listener(scheduler.on_event)
+        scheduler.stop()
+    if watchdog is not None:
+        watchdog.stop()
+    if jobs_lock is not None:
+        jobs_lock.close()
+
+
+# Inicializar la aplicación FastAPI (/openapi.json y /docs se sirven
+# más abajo desde el documento precalculado)
 app = FastAPI(
     title="QuickTask API",
     description="API REST para gestión de tareas personales",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    openapi_url=None,
+    docs_url=None,
+    redoc_url=None,
 )
 
+# Esquema OpenAPI: artefacto del build o, si falta, generado una vez
+openapi_document = openapi_doc.OpenApiDocument(app.openapi, config.OPENAPI_ARTIFACT)
+
+# Las rutas declaradas a continuación admiten perfilado (?__profile=1)
+app.router.route_class = profiling.ProfiledRoute
+
+# Control de admisión: descarta carga con 429/503 antes de encolarla
+admission_controller = admission.build_controller(config, pool_monitor)
+app.add_middleware(
+    admission.AdmissionMiddleware,
+    controller=admission_controller,
+    enabled=config.ADMISSION_ENABLED,
+)
+
+
+@app.exception_handler(PoolTimeoutError)
+def pool_timeout_handler(request: Request, exc: PoolTimeoutError):
+    """
+    No hubo conexión libre dentro de QUICKTASK_DB_POOL_TIMEOUT_SECONDS.
+    """
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Base de datos saturada"},
+        headers={"Retry-After": str(config.ADMISSION_RETRY_AFTER_SECONDS)},
+    )
+
+
+# Grupo single-flight de los listados de tareas
+list_flight = singleflight.SingleFlight()
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """
+    Dependencia que restringe un endpoint a administradores.
+    Requiere el header `X-Admin-Token` igual a QUICKTASK_ADMIN_TOKEN;
+    si la variable no está definida los endpoints de admin quedan deshabilitados.
+    """
+    if not config.ADMIN_TOKEN or not x_admin_token or not secrets.compare_digest(
+        x_admin_token, config.ADMIN_TOKEN
+    ):
+        raise HTTPException(status_code=403, detail="Acceso de administrador requerido")
+
+
+def get_user_id(x_user_id: Optional[int] = Header(None, ge=1)) -> Optional[int]:
+    """
+    Usuario dueño de las tareas, del header `X-User-Id`.
+    Sin header las operaciones no se limitan a un usuario.
+    """
+    return x_user_id
+
+
+def get_sql_repository(
+    db: Session = Depends(get_db),
+    user_id: Optional[int] = Depends(get_user_id)
+) -> repository.TaskRepository:
+    """
+    Repositorio de tareas sobre la sesión de SQLAlchemy del request.
+    """
+    return repository.SqlTaskRepository(db, user_id)
+
+
+def get_sharded_repository(user_id: Optional[int] = Depends(get_user_id)):
+    """
+    Repositorio sobre el shard SQLite del usuario (QUICKTASK_SHARD_COUNT > 1).
+    El header `X-User-Id` es obligatorio: decide el archivo.
+    """
+    if user_id is None:
+        raise HTTPException(status_code=400, detail="El header X-User-Id es obligatorio")
+    with database.session_scope(database.shards.sessionmaker_for(user_id)) as db:
+        yield repository.SqlTaskRepository(db, user_id)
+
+
+def get_memory_repository(user_id: Optional[int] = Depends(get_user_id)) -> repository.TaskRepository:
+    """
+    Repositorio de tareas en memoria del proceso (sin base de datos).
+    """
+    return repository.MemoryTaskRepository(repository.memory_store, user_id)
+
+
+# Backend de almacenamiento elegido por QUICKTASK_STORAGE_BACKEND / QUICKTASK_SHARD_COUNT
+if config.STORAGE_BACKEND == "memory":
+    get_repository = get_memory_repository
+elif database.shards is not None:
+    get_repository = get_sharded_repository
+else:
+    get_repository = get_sql_repository
+
+
+DOCS_CACHE_CONTROL = "public, max-age=0, must-revalidate"
+
+
+@app.get("/openapi.json", include_in_schema=False)
+def openapi_json(if_none_match: Optional[str] = Header(None)):
+    """
+    Esquema OpenAPI ya serializado, con ETag (304 si no cambió).
+    """
+    body = openapi_document.body
+    headers = {"ETag": openapi_document.etag, "Cache-Control": DOCS_CACHE_CONTROL}
+    if if_none_match == openapi_document.etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+SWAGGER_HTML = get_swagger_ui_html(
+    openapi_url="/openapi.json",
+    title=f"{app.title} - Swagger UI",
+    oauth2_redirect_url="/docs/oauth2-redirect",
+).body
+REDOC_HTML = get_redoc_html(openapi_url="/openapi.json", title=f"{app.title} - ReDoc").body
+
+
+@app.get("/docs", include_in_schema=False)
+def swagger_ui():
+    return Response(content=SWAGGER_HTML, media_type="text/html", headers={"Cache-Control": DOCS_CACHE_CONTROL})
+
+
+@app.get("/docs/oauth2-redirect", include_in_schema=False)
+def swagger_ui_redirect():
+    return get_swagger_ui_oauth2_redirect_html()
+
+
+@app.get("/redoc", include_in_schema=False)
+def redoc():
+    return Response(content=REDOC_HTML, media_type="text/html", headers={"Cache-Control": DOCS_CACHE_CONTROL})
+
 
 @app.get("/", tags=["Root"])
 def read_root():
@@ -35,13 +324,137 @@ def read_root():
     }
 
 
-@app.get("/tasks", response_model=schemas.TaskListResponse, tags=["Tasks"])
+def parse_ids(ids: str) -> list[int]:
+    """
+    Convierte una lista de IDs separada por comas ("1,2,3") en enteros.
+    """
+    try:
+        task_ids = [int(value) for value in ids.split(",") if value.strip()]
+    except ValueError:
+        raise HTTPException(status_code=422, detail="ids debe ser una lista de enteros separados por comas")
+    if not task_ids or len(task_ids) > schemas.MAX_BATCH_IDS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"ids debe contener entre 1 y {schemas.MAX_BATCH_IDS} IDs"
+        )
+    return task_ids
+
+
+def parse_tags(tags: str) -> list[str]:
+    """
+    Convierte una lista de etiquetas separada por comas en etiquetas normalizadas.
+    """
+    try:
+        tag_list = schemas.normalize_tags([value for value in tags.split(",") if value.strip()])
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    if not tag_list or len(tag_list) > schemas.MAX_TAGS_PER_TASK:
+        raise HTTPException(
+            status_code=422,
+            detail=f"tags debe contener entre 1 y {schemas.MAX_TAGS_PER_TASK} etiquetas"
+        )
+    return tag_list
+
+
+def etag(task) -> str:
+    """
+    ETag fuerte de una tarea: su versión entre comillas.
+    """
+    return f'"{task.version}"'
+
+
+def idempotent_response(
+    idempotency_key: str,
+    route: str,
+    user_id: Optional[int],
+    payload: BaseModel,
+    write: idempotency.WriteFn,
+) -> Response:
+    """
+    Ejecuta una escritura con `Idempotency-Key` y retorna la respuesta
+    guardada. La clave se aplica por usuario y endpoint; usarla con otro
+    cuerpo da 422, y si otro worker sigue procesándola, 409.
+    """
+    key = f"{user_id or ''}:{route}:{idempotency_key}"
+    try:
+        stored, replayed = idempotency.store.run(key, payload.model_dump_json().encode(), write)
+    except idempotency.KeyReused:
+        raise HTTPException(
+            status_code=422, detail="Idempotency-Key ya usada con otro cuerpo"
+        )
+    except idempotency.KeyInProgress:
+        raise HTTPException(
+            status_code=409,
+            detail="Petición con la misma Idempotency-Key en curso",
+            headers={"Retry-After": str(config.ADMISSION_RETRY_AFTER_SECONDS)},
+        )
+    headers = {"ETag": stored.etag} if stored.etag else {}
+    if replayed:
+        headers["Idempotent-Replayed"] = "true"
+    return Response(
+        content=stored.body,
+        status_code=stored.status_code,
+        media_type="application/json",
+        headers=headers,
+    )
+
+
+def parse_if_match(if_match: Optional[str]) -> Optional[list[int]]:
+    """
+    Convierte el header If-Match en las versiones aceptadas.
+    
+    Returns:
+        None si no hay precondición (o es `*`); si no, la lista de
+        versiones (vacía si ningún ETag es válido: nada coincidirá)
+    """
+    if if_match is None or if_match.strip() == "*":
+        return None
+    versions = []
+    for value in if_match.split(","):
+        value = value.strip()
+        # If-Match usa comparación fuerte: los ETag débiles nunca coinciden
+        if value.startswith('"') and value.endswith('"') and value[1:-1].isdigit():
+            versions.append(int(value[1:-1]))
+    return versions
+
+
+def precondition_failed(conflict: crud.VersionConflict) -> HTTPException:
+    return HTTPException(
+        status_code=412,
+        detail="La tarea fue modificada por otro cliente",
+        headers={"ETag": f'"{conflict.current_version}"'},
+    )
+
+
+def buffered_response(db_task: models.Task, completed: bool) -> schemas.TaskResponse:
+    """
+    Respuesta de una tarea con el estado pendiente del buffer write-behind.
+    
+    El volcado incrementa la versión solo si el estado cambia respecto de
+    la base, y cualquier otra escritura vacía el buffer antes: la versión
+    (y su ETag) es la que tendrá la tarea tras el volcado.
+    """
+    changes: dict = {"completed": completed}
+    if completed != db_task.completed:
+        changes["version"] = db_task.version + 1
+    return schemas.TaskResponse.model_validate(db_task).model_copy(update=changes)
+
+
+@app.get(
+    "/tasks",
+    response_model=Union[schemas.TaskBatchResponse, schemas.TaskListResponse],
+    tags=["Tasks"]
+)
 def list_tasks(
     skip: int = Query(0, ge=0, description="Número de registros a omitir"),
     limit: int = Query(100, ge=1, le=500, description="Número máximo de tareas"),
     completed: Optional[bool] = Query(None, description="Filtrar por estado completado"),
     search: Optional[str] = Query(None, description="Buscar en título o descripción"),
-    db: Session = Depends(get_db)
+    ids: Optional[str] = Query(None, description="IDs separados por comas (lectura por lotes)"),
+    include_archived: bool = Query(False, description="Incluir tareas archivadas"),
+    tags: Optional[str] = Query(None, description="Etiquetas separadas por comas"),
+    match: Literal["all", "any"] = Query("all", description="Combinar etiquetas: todas o alguna"),
+    repo: repository.TaskRepository = Depends(get_repository)
 ):
     """
     **Listar todas las tareas** con opciones de filtrado y paginación.
@@ -50,28 +463,308 @@ def list_tasks(
     - **limit**: Máximo de tareas a retornar
     - **completed**: Filtrar por estado (true/false/null)
     - **search**: Buscar texto en título o descripción
+    - **ids**: Leer estas tareas por ID (ignora los demás filtros y
+      retorna `tasks` en el orden pedido junto con `missing`)
+    - **include_archived**: Incluir las tareas completadas archivadas
+      (por defecto solo se consulta la tabla activa)
+    - **tags**: Filtrar por etiquetas (`tags=casa,urgente`)
+    - **match**: `all` exige todas las etiquetas, `any` al menos una
     """
-    tasks = crud.get_tasks(db, skip=skip, limit=limit, completed=completed, search=search)
-    total = crud.count_tasks(db, completed=completed, search=search)
+    writebehind.buffer.flush()
+    if ids is not None:
+        task_ids = parse_ids(ids)
+        key = ("ids", repo.user_id, tuple(task_ids))
+        
+        def render():
+            tasks, missing = repo.get_tasks_by_ids(task_ids)
+            return schemas.TaskBatchResponse(tasks=tasks, missing=missing).model_dump_json().encode()
+    else:
+        tag_list = parse_tags(tags) if tags else None
+        key = (
+            "list", repo.user_id, skip, limit, completed, search, include_archived,
+            tuple(tag_list or ()), match
+        )
+        
+        def render():
+            if config.LIST_SQL_JSON and not include_archived:
+                # SQLite arma el cuerpo completo: sin objetos ORM ni Pydantic por fila
+                body = repo.get_tasks_json(
+                    skip=skip, limit=limit, completed=completed, search=search,
+                    tags=tag_list, match=match
+                )
+                if body is not None:
+                    return body.encode()
+            tasks = repo.get_tasks(
+                skip=skip, limit=limit, completed=completed, search=search,
+                include_archived=include_archived, tags=tag_list, match=match
+            )
+            total = repo.count_tasks(
+                completed=completed, search=search, include_archived=include_archived,
+                tags=tag_list, match=match
+            )
+            return schemas.TaskListResponse(total=total, tasks=tasks).model_dump_json().encode()
     
-    return schemas.TaskListResponse(total=total, tasks=tasks)
+    with memory.request_peaks.track("list_tasks"):
+        body = cache.response_cache.get(key)
+        if body is None:
+            # La generación se lee antes de consultar: si hay una escritura
+            # mientras tanto, la entrada guardada nace obsoleta y se descarta
+            generation = cache.write_generation.value
+            
+            def render_and_store():
+                rendered = render()
+                cache.response_cache.put(key, generation, rendered)
+                return rendered
+            
+            # Peticiones idénticas concurrentes comparten una consulta y un payload
+            body, _ = list_flight.do((key, generation), render_and_store)
+    return Response(content=body, media_type="application/json")
+
+
+@app.post("/tasks:batchGet", response_model=schemas.TaskBatchResponse, tags=["Tasks"])
+def batch_get_tasks(request: schemas.TaskBatchGetRequest, repo: repository.TaskRepository = Depends(get_repository)):
+    """
+    **Obtener varias tareas por ID** en una sola consulta.
+    
+    - **ids**: Lista de IDs (máximo 500)
+    - Retorna las tareas encontradas en el orden pedido y los IDs inexistentes
+    """
+    writebehind.buffer.flush()
+    tasks, missing = repo.get_tasks_by_ids(request.ids)
+    return schemas.TaskBatchResponse(tasks=tasks, missing=missing)
+
+
+@app.post("/batch", response_model=schemas.BatchResponse, tags=["Tasks"])
+def batch_write(
+    request: schemas.BatchRequest,
+    idempotency_key: Optional[str] = Header(None, min_length=1, max_length=255),
+    repo: repository.TaskRepository = Depends(get_repository)
+):
+    """
+    **Ejecutar varias escrituras** (create/update/delete) en una sola transacción.
+    
+    - **operations**: Lista ordenada de operaciones (máximo 100)
+    - **mode**: `atomic` (todo-o-nada) o `best_effort`
+    - **Idempotency-Key**: Los reintentos con la misma clave retornan la
+      respuesta original sin volver a aplicar el lote
+    
+    Cada resultado incluye un `status` con semántica HTTP (201, 200, 204,
+    404, ...). Las operaciones revertidas por un fallo del lote reportan 424.
+    """
+    def write():
+        writebehind.buffer.flush()
+        results, committed = repo.apply_batch(request.operations, atomic=request.mode == "atomic")
+        return schemas.BatchResponse(committed=committed, results=results)
+
+    if idempotency_key is None:
+        return write()
+    return idempotent_response(
+        idempotency_key, "POST /batch", repo.user_id, request,
+        lambda: (200, write().model_dump_json().encode(), None),
+    )
 
 
-@app.get("/tasks/{task_id}", response_model=schemas.TaskResponse, tags=["Tasks"])
-def get_task(task_id: int, db: Session = Depends(get_db)):
+@app.get("/tags", response_model=schemas.TagListResponse, tags=["Tasks"])
+def list_tags(repo: repository.TaskRepository = Depends(get_repository)):
+    """
+    **Listar etiquetas** con su número de tareas activas (facetas),
+    de la más usada a la menos usada.
+    """
+    return schemas.TagListResponse(tags=repo.get_tag_counts())
+
+
+@app.get("/tasks/suggest", response_model=schemas.TaskSuggestResponse, tags=["Tasks"])
+def suggest_tasks(
+    prefix: str = Query(..., min_length=1, max_length=100, description="Texto escrito hasta ahora"),
+    limit: int = Query(10, ge=1, le=50, description="Máximo de sugerencias"),
+    repo: repository.TaskRepository = Depends(get_repository)
+):
+    """
+    **Autocompletar títulos** de tareas por prefijo.
+    
+    Ignora mayúsculas y acentos, y coincide con el inicio del título o de
+    cualquiera de sus palabras. Se sirve desde un índice en memoria; si el
+    índice excede su presupuesto se consulta la base de datos. Con varios
+    workers el índice de cada uno se reconstruye cada
+    `QUICKTASK_SUGGEST_MAX_AGE_SECONDS`: las tareas escritas en otro
+    worker pueden tardar ese intervalo en aparecer.
+    """
+    # El índice es global: las consultas de un usuario van al repositorio
+    if repo.user_id is None and suggest.index.ensure_built(repo):
+        matches = suggest.index.search(prefix, limit)
+    else:
+        suggest.index.record_fallback()
+        matches = repo.search_titles(prefix, limit)
+    return schemas.TaskSuggestResponse(
+        prefix=prefix,
+        suggestions=[schemas.TaskSuggestion(id=task_id, title=title) for task_id, title in matches],
+    )
+
+
+@app.get("/tasks/export", tags=["Tasks"])
+def export_tasks(
+    format: Literal["parquet", "arrow"] = Query("parquet", description="Formato del archivo"),
+    completed: Optional[bool] = Query(None, description="Filtrar por estado completado"),
+    batch_size: int = Query(
+        config.EXPORT_BATCH_SIZE, ge=100, le=100000, description="Filas por lote (row group)"
+    ),
+    repo: repository.TaskRepository = Depends(get_repository)
+):
+    """
+    **Exportar tareas** en formato columnar para analítica.
+    
+    - **format**: `parquet` (comprimido con zstd) o `arrow` (Arrow IPC stream)
+    - **completed**: Filtrar por estado (true/false/null)
+    - **batch_size**: Tareas leídas y escritas por lote; acota la memoria usada
+    
+    Requiere pyarrow instalado y el backend SQL (si no, responde 501).
+    """
+    if not export.available():
+        raise HTTPException(status_code=501, detail="La exportación requiere pyarrow")
+    if not isinstance(repo, repository.SqlTaskRepository):
+        raise HTTPException(status_code=501, detail="La exportación requiere el backend SQL")
+    
+    writebehind.buffer.flush()
+    
+    def body():
+        with memory.request_peaks.track("export_tasks"):
+            yield from export.stream_export(
+                repo.db, format, batch_size=batch_size, completed=completed, user_id=repo.user_id
+            )
+    
+    extension = "parquet" if format == "parquet" else "arrows"
+    return StreamingResponse(
+        body(),
+        media_type=export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="tasks.{extension}"'},
+    )
+
+
+@app.get("/tasks/stream", tags=["Events"])
+async def stream_tasks(user_id: Optional[int] = Depends(get_user_id)):
+    """
+    **Stream de cambios en tareas** (Server-Sent Events).
+    
+    Emite un evento `created`, `updated`, `deleted` o `archived` por cada escritura,
+    con el ID de la tarea, su dueño (`user_id`), su `shard` y su estado
+    actual. Con `X-User-Id` solo llegan los eventos de ese usuario. Envía
+    heartbeats periódicos y un evento `overflow` si el cliente no consume
+    a tiempo (debe reconectar).
+    """
+    subscriber = events.hub.subscribe(user_id)
+    return StreamingResponse(
+        events.sse_stream(events.hub, subscriber, config.EVENTS_HEARTBEAT_SECONDS),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.websocket("/tasks/ws")
+async def tasks_websocket(websocket: WebSocket, user_id: Optional[int] = Depends(get_user_id)):
+    """
+    **Stream de cambios en tareas** por WebSocket.
+    
+    Envía cada evento como un mensaje JSON y `{"type": "heartbeat"}`
+    cuando no hay actividad. Cierra con código 1013 si el cliente es lento.
+    Con `X-User-Id` solo envía los eventos de ese usuario.
+    """
+    await websocket.accept()
+    subscriber = events.hub.subscribe(user_id)
+
+    async def watch_disconnect():
+        # El cliente no envía datos; solo se espera su desconexión
+        try:
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+        finally:
+            subscriber.close()
+
+    watcher = asyncio.create_task(watch_disconnect())
+    try:
+        while True:
+            try:
+                event = await subscriber.next_event(config.EVENTS_HEARTBEAT_SECONDS)
+            except events.SubscriptionClosed:
+                if subscriber.dropped:
+                    await websocket.close(code=1013)
+                return
+            if event is None:
+                await websocket.send_text('{"type":"heartbeat"}')
+            else:
+                await websocket.send_text(event.data)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        watcher.cancel()
+        events.hub.unsubscribe(subscriber)
+
+
+def task_tree_response(tasks: list) -> schemas.TaskTreeResponse:
+    """
+    Arma el árbol anidado a partir de las filas de get_task_tree (la raíz
+    primero y cada padre antes que sus hijos).
+    """
+    root = schemas.TaskTreeResponse.model_validate(tasks[0])
+    nodes = {root.id: root}
+    for task in tasks[1:]:
+        node = schemas.TaskTreeResponse.model_validate(task)
+        nodes[task.id] = node
+        nodes[task.parent_id].subtasks.append(node)
+    return root
+
+
+@app.get(
+    "/tasks/{task_id}",
+    response_model=schemas.TaskResponse,
+    responses={200: {"model": schemas.TaskTreeResponse}},
+    tags=["Tasks"],
+)
+def get_task(
+    task_id: int,
+    response: Response,
+    depth: Optional[int] = Query(None, ge=0, le=20, description="Niveles de subtareas a incluir"),
+    repo: repository.TaskRepository = Depends(get_repository)
+):
     """
     **Obtener una tarea específica** por su ID.
     
     - **task_id**: ID de la tarea a consultar
+    - **depth**: Incluye las subtareas anidadas (`subtasks`) hasta ese
+      nivel, leídas con una sola consulta
+    
+    Si la tarea fue archivada se retorna desde el archivo (solo lectura).
+    El header `ETag` contiene la versión para usar en `If-Match`.
     """
-    db_task = crud.get_task(db, task_id=task_id)
+    if depth is not None:
+        writebehind.buffer.flush()
+        tasks = repo.get_task_tree(task_id, depth)
+        if tasks:
+            # Se serializa aquí: response_model (TaskResponse) no tiene `subtasks`
+            return Response(
+                content=task_tree_response(tasks).model_dump_json(),
+                media_type="application/json",
+                headers={"ETag": etag(tasks[0])},
+            )
+    db_task = repo.get_task_or_archived(task_id)
     if db_task is None:
         raise HTTPException(status_code=404, detail="Tarea no encontrada")
+    buffered = writebehind.buffer.get(task_id)
+    if buffered is not None:
+        # Cambio aún en el buffer write-behind: versión que tendrá al volcarse
+        db_task = buffered_response(db_task, buffered)
+    response.headers["ETag"] = etag(db_task)
     return db_task
 
 
 @app.post("/tasks", response_model=schemas.TaskResponse, status_code=201, tags=["Tasks"])
-def create_task(task: schemas.TaskCreate, db: Session = Depends(get_db)):
+def create_task(
+    task: schemas.TaskCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, min_length=1, max_length=255),
+    repo: repository.TaskRepository = Depends(get_repository)
+):
     """
     **Crear una nueva tarea**.
     
@@ -82,27 +775,57 @@ def create_task(task: schemas.TaskCreate, db: Session = Depends(get_db)):
     - **description**: Descripción detallada
     - **due_date**: Fecha de vencimiento (formato ISO 8601)
     - **completed**: Estado inicial (por defecto false)
+    - **tags**: Etiquetas (se normalizan a minúsculas)
+    
+    - **parent_id**: Tarea padre (la tarea se crea como subtarea)
+    
+    Con **Idempotency-Key**, los reintentos con la misma clave retornan la
+    tarea creada la primera vez (header `Idempotent-Replayed: true`).
     """
-    return crud.create_task(db=db, task=task)
+    try:
+        if idempotency_key is None:
+            db_task = repo.create_task(task)
+            response.headers["ETag"] = etag(db_task)
+            return db_task
+
+        def write():
+            db_task = repo.create_task(task)
+            body = schemas.TaskResponse.model_validate(db_task).model_dump_json().encode()
+            return 201, body, etag(db_task)
+
+        return idempotent_response(idempotency_key, "POST /tasks", repo.user_id, task, write)
+    except crud.ParentNotFound:
+        raise HTTPException(status_code=422, detail="Tarea padre no encontrada")
 
 
 @app.put("/tasks/{task_id}", response_model=schemas.TaskResponse, tags=["Tasks"])
 def update_task_full(
     task_id: int, 
     task: schemas.TaskCreate, 
-    db: Session = Depends(get_db)
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    repo: repository.TaskRepository = Depends(get_repository)
 ):
     """
     **Actualizar completamente una tarea** (todos los campos requeridos).
     
     - **task_id**: ID de la tarea a actualizar
-    - Requiere todos los campos del objeto tarea
+    - Requiere todos los campos del objeto tarea (`parent_id` se ignora:
+      una tarea no cambia de padre)
+    - **If-Match**: ETag esperado; si la tarea cambió se retorna 412
     """
     task_update = schemas.TaskUpdate(**task.model_dump())
-    db_task = crud.update_task(db, task_id=task_id, task_update=task_update)
+    writebehind.buffer.flush()
+    try:
+        db_task = repo.update_task(
+            task_id=task_id, task_update=task_update, expected_versions=parse_if_match(if_match)
+        )
+    except crud.VersionConflict as conflict:
+        raise precondition_failed(conflict)
     
     if db_task is None:
         raise HTTPException(status_code=404, detail="Tarea no encontrada")
+    response.headers["ETag"] = etag(db_task)
     return db_task
 
 
@@ -110,7 +833,9 @@ def update_task_full(
 def update_task_partial(
     task_id: int, 
     task: schemas.TaskUpdate, 
-    db: Session = Depends(get_db)
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    repo: repository.TaskRepository = Depends(get_repository)
 ):
     """
     **Actualizar parcialmente una tarea** (solo campos proporcionados).
@@ -121,23 +846,62 @@ def update_task_partial(
     Útil para operaciones como:
     - Marcar como completada: `{"completed": true}`
     - Cambiar título: `{"title": "Nuevo título"}`
+    
+    Con `If-Match: "<versión>"` la actualización solo se aplica si nadie
+    modificó la tarea desde esa versión (si no, 412).
+    
+    Con el modo write-behind activo (backend SQL), un PATCH que solo cambia
+    `completed` (sin `If-Match`) se guarda en memoria y se escribe por lotes; la
+    respuesta y su `ETag` ya traen la versión que tendrá tras volcarse.
     """
-    db_task = crud.update_task(db, task_id=task_id, task_update=task)
+    if (
+        writebehind.buffer.enabled and repo.write_behind and if_match is None
+        and task.model_fields_set == {"completed"} and task.completed is not None
+    ):
+        db_task = repo.get_task(task_id)
+        if db_task is None:
+            raise HTTPException(status_code=404, detail="Tarea no encontrada")
+        writebehind.buffer.record(task_id, task.completed)
+        buffered = buffered_response(db_task, task.completed)
+        response.headers["ETag"] = etag(buffered)
+        return buffered
+    
+    writebehind.buffer.flush()
+    try:
+        db_task = repo.update_task(
+            task_id=task_id, task_update=task, expected_versions=parse_if_match(if_match)
+        )
+    except crud.VersionConflict as conflict:
+        raise precondition_failed(conflict)
     
     if db_task is None:
         raise HTTPException(status_code=404, detail="Tarea no encontrada")
+    response.headers["ETag"] = etag(db_task)
     return db_task
 
 
 @app.delete("/tasks/{task_id}", status_code=204, tags=["Tasks"])
-def delete_task(task_id: int, db: Session = Depends(get_db)):
+def delete_task(
+    task_id: int,
+    if_match: Optional[str] = Header(None),
+    repo: repository.TaskRepository = Depends(get_repository)
+):
     """
-    **Eliminar una tarea** permanentemente.
+    **Eliminar una tarea**.
+    
+    La tarea y sus subtareas dejan de ser visibles de inmediato (soft
+    delete) y se borran físicamente en segundo plano tras el periodo de
+    gracia.
     
     - **task_id**: ID de la tarea a eliminar
+    - **If-Match**: ETag esperado; si la tarea cambió se retorna 412
     - Retorna 204 No Content si se eliminó exitosamente
     """
-    success = crud.delete_task(db, task_id=task_id)
+    writebehind.buffer.flush()
+    try:
+        success = repo.delete_task(task_id=task_id, expected_versions=parse_if_match(if_match))
+    except crud.VersionConflict as conflict:
+        raise precondition_failed(conflict)
     
     if not success:
         raise HTTPException(status_code=404, detail="Tarea no encontrada")
@@ -146,13 +910,171 @@ def delete_task(task_id: int, db: Session = Depends(get_db)):
 
 
 @app.get("/health", tags=["Health"])
-def health_check():
+async def health_check():
     """
     Endpoint de salud para verificar que la API está funcionando.
+    Es async para responder en el event loop aunque el threadpool
+    esté ocupado, y está exento del control de admisión.
     """
     return {"status": "healthy", "service": "QuickTask API"}
 
 
+def job_stats(jobs: list) -> Union[dict, list, None]:
+    """
+    Métricas de un trabajo periódico: None si no corre en este worker,
+    las del único archivo o una lista por shard.
+    """
+    if not jobs:
+        return None
+    if database.shards is None:
+        return jobs[0].stats()
+    return [job.stats() for job in jobs]
+
+
+@app.get("/metrics", tags=["Health"])
+def metrics(request: Request):
+    """
+    Métricas internas de los subsistemas (eventos, recordatorios, ...).
+    """
+    return {
+        "events": events.hub.stats(),
+        "reminders": job_stats(request.app.state.reminders),
+        "archive": job_stats(request.app.state.archiver),
+        "purge": job_stats(request.app.state.purger),
+        "list_singleflight": list_flight.stats(),
+        "list_cache": cache.response_cache.stats(),
+        "admission": admission_controller.stats(),
+        "profiler": profiling.profiler.stats(),
+        "sessions": memory.session_stats.stats(),
+        "suggest": suggest.index.stats(),
+        "write_behind": writebehind.buffer.stats(),
+        "idempotency": idempotency.store.stats(),
+        "openapi": openapi_document.stats(),
+        "worker": {
+            "pid": os.getpid(),
+            "workers": config.WORKERS,
+            "runs_jobs": request.app.state.runs_jobs,
+        },
+    }
+
+
+@app.post("/admin/backup", status_code=202, tags=["Admin"], dependencies=[Depends(require_admin)])
+def start_backup(
+    request: Request,
+    compress: Optional[bool] = Query(None, description="Comprimir con gzip (por defecto según config)"),
+    verify: Optional[bool] = Query(None, description="Verificar con integrity_check (por defecto según config)")
+):
+    """
+    **Iniciar un backup en línea** de la base de datos.
+    
+    Copia la base por pasos sin detener la API. Retorna 409 si ya hay
+    un backup en curso. El progreso se consulta con `GET /admin/backup`.
+    """
+    try:
+        report = request.app.state.backups.start(compress=compress, verify=verify)
+    except backup.BackupInProgress:
+        raise HTTPException(status_code=409, detail="Ya hay un backup en curso")
+    return report.to_dict()
+
+
+@app.get("/admin/backup", tags=["Admin"], dependencies=[Depends(require_admin)])
+def backup_status(request: Request):
+    """
+    **Estado de los backups**: progreso del actual, resultado del último
+    (duración, páginas, tamaño, integridad) y archivos disponibles.
+    """
+    return request.app.state.backups.status()
+
+
+@app.get("/admin/tasks", tags=["Admin"], dependencies=[Depends(require_admin)])
+def admin_list_tasks(
+    completed: Optional[bool] = Query(None, description="Filtrar por estado completado"),
+    batch_size: int = Query(500, ge=1, le=5000, description="Tareas leídas por página de cada shard")
+):
+    """
+    **Listar las tareas de todos los usuarios** como NDJSON (una tarea por
+    línea, con `user_id` y `shard`).
+    
+    Con particionado mezcla las páginas de todos los shards en orden de
+    (ID, shard) mientras escribe la respuesta. Los shards se leen en
+    secuencia desde este hilo (heapq.merge pide la siguiente página del
+    shard que se agotó), no en paralelo; sin particionado lee el archivo
+    único.
+    """
+    factories = database.shards.sessionmakers if database.shards else [SessionLocal]
+    
+    def body():
+        for shard, task in crud.iter_shards(factories, batch_size=batch_size, completed=completed):
+            row = schemas.AdminTaskResponse.model_validate(task).model_copy(update={"shard": shard})
+            yield row.model_dump_json() + "\n"
+    
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+
+@app.get("/admin/profiles", tags=["Admin"], dependencies=[Depends(require_admin)])
+def list_profiles():
+    """
+    Lista los perfiles de CPU guardados por el muestreo de requests.
+    """
+    return {"profiles": profiling.profiler.list_profiles()}
+
+
+@app.get("/admin/profiles/{name}", tags=["Admin"], dependencies=[Depends(require_admin)])
+def get_profile(name: str):
+    """
+    Retorna las pilas "collapsed" de un perfil guardado (para flamegraph).
+    """
+    content = profiling.profiler.read_collapsed(name)
+    if content is None:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado")
+    return Response(content=content, media_type="text/plain")
+
+
+@app.get("/admin/memory", tags=["Admin"], dependencies=[Depends(require_admin)])
+def memory_status(top: int = Query(25, ge=1, le=200, description="Sitios de asignación a listar")):
+    """
+    **Diagnóstico de memoria**: estado de tracemalloc, sitios con más
+    memoria viva, picos por request de los endpoints pesados y tamaño
+    del identity map de las sesiones.
+    """
+    return {
+        **memory.diagnostics.status(),
+        "top_sites": memory.diagnostics.top_sites(top),
+        "request_peaks": memory.request_peaks.stats(),
+        "sessions": memory.session_stats.stats(),
+        "suggest": suggest.index.stats(),
+    }
+
+
+@app.post("/admin/memory/start", tags=["Admin"], dependencies=[Depends(require_admin)])
+def memory_start(frames: int = Query(1, ge=1, le=64, description="Profundidad del traceback")):
+    """
+    Activa tracemalloc. Tiene costo en CPU y memoria: desactivarlo al terminar.
+    """
+    memory.diagnostics.start(frames)
+    return memory.diagnostics.status()
+
+
+@app.post("/admin/memory/stop", tags=["Admin"], dependencies=[Depends(require_admin)])
+def memory_stop():
+    """
+    Desactiva tracemalloc y descarta los snapshots.
+    """
+    memory.diagnostics.stop()
+    return memory.diagnostics.status()
+
+
+@app.post("/admin/memory/snapshot", tags=["Admin"], dependencies=[Depends(require_admin)])
+def memory_snapshot(top: int = Query(25, ge=1, le=200, description="Diferencias a listar")):
+    """
+    Toma un snapshot y retorna las diferencias respecto al anterior
+    (el primero solo fija la referencia).
+    """
+    if not memory.diagnostics.tracing:
+        raise HTTPException(status_code=409, detail="tracemalloc no está activo")
+    return memory.diagnostics.snapshot_diff(top)
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
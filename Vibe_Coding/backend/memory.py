@@ -0,0 +1,216 @@
+"""
+Diagnóstico de memoria con tracemalloc.
+
+Permite activar tracemalloc en caliente desde los endpoints de admin,
+ver los sitios que más memoria asignan y comparar snapshots, medir el
+pico de memoria de los requests pesados (listados y exportaciones) y el
+tamaño del identity map de cada sesión de SQLAlchemy.
+"""
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator, Optional
+
+
+def _stat_to_dict(stat) -> dict:
+    frame = stat.traceback[0]
+    return {
+        "site": f"{frame.filename}:{frame.lineno}",
+        "size_bytes": stat.size,
+        "count": stat.count,
+    }
+
+
+def _diff_to_dict(stat) -> dict:
+    data = _stat_to_dict(stat)
+    data["size_diff_bytes"] = stat.size_diff
+    data["count_diff"] = stat.count_diff
+    return data
+
+
+class MemoryDiagnostics:
+    """
+    Control de tracemalloc y snapshots de asignaciones.
+    """
+
+    def __init__(self, top: int = 25):
+        self.top = top
+        self._lock = threading.Lock()
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+        self._snapshot_at: Optional[datetime] = None
+        self.started_by_us = False
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 1) -> None:
+        """
+        Activa tracemalloc (ralentiza las asignaciones mientras esté activo).
+
+        Args:
+            frames: Profundidad de traceback guardada por asignación
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+            self.started_by_us = True
+
+    def stop(self) -> None:
+        """
+        Desactiva tracemalloc y libera sus trazas.
+        """
+        with self._lock:
+            self._snapshot = None
+            self._snapshot_at = None
+        tracemalloc.stop()
+        self.started_by_us = False
+
+    def _take(self) -> tracemalloc.Snapshot:
+        # Excluir las propias estructuras de tracemalloc
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+
+    def top_sites(self, limit: Optional[int] = None) -> list[dict]:
+        """
+        Sitios (archivo:línea) con más memoria viva asignada.
+        """
+        if not self.tracing:
+            return []
+        stats = self._take().statistics("lineno")
+        return [_stat_to_dict(stat) for stat in stats[:limit or self.top]]
+
+    def snapshot_diff(self, limit: Optional[int] = None) -> dict:
+        """
+        Toma un snapshot y lo compara con el anterior.
+        El primer snapshot solo queda como referencia.
+
+        Returns:
+            Diccionario con la fecha del snapshot base y las diferencias
+        """
+        if not self.tracing:
+            return {"since": None, "diff": []}
+        snapshot = self._take()
+        now = datetime.utcnow()
+        with self._lock:
+            previous, since = self._snapshot, self._snapshot_at
+            self._snapshot, self._snapshot_at = snapshot, now
+        if previous is None:
+            return {"since": None, "diff": []}
+        stats = snapshot.compare_to(previous, "lineno")
+        return {
+            "since": since.isoformat(),
+            "diff": [_diff_to_dict(stat) for stat in stats[:limit or self.top]],
+        }
+
+    def status(self) -> dict:
+        current, peak = tracemalloc.get_traced_memory() if self.tracing else (0, 0)
+        return {
+            "tracing": self.tracing,
+            "frames": tracemalloc.get_traceback_limit() if self.tracing else 0,
+            "traced_bytes": current,
+            "traced_peak_bytes": peak,
+            "tracemalloc_overhead_bytes": tracemalloc.get_tracemalloc_memory() if self.tracing else 0,
+        }
+
+
+class RequestPeaks:
+    """
+    Pico de memoria por request de los endpoints instrumentados.
+
+    tracemalloc solo tiene un pico global: se mide un request a la vez
+    (los que llegan mientras otro se mide se cuentan como omitidos) y el
+    valor incluye lo que asignen en paralelo otros requests no medidos.
+    Sin tracemalloc activo no se mide nada.
+    """
+
+    def __init__(self):
+        self._measure_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._endpoints: dict[str, dict] = {}
+
+    @contextmanager
+    def track(self, endpoint: str) -> Iterator[None]:
+        """
+        Mide el pico de memoria del bloque para `endpoint`.
+        """
+        if not tracemalloc.is_tracing():
+            yield
+            return
+        if not self._measure_lock.acquire(blocking=False):
+            self._entry(endpoint)["skipped"] += 1
+            yield
+            return
+        try:
+            baseline, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            yield
+            _, peak = tracemalloc.get_traced_memory()
+            self._record(endpoint, max(0, peak - baseline))
+        finally:
+            self._measure_lock.release()
+
+    def _entry(self, endpoint: str) -> dict:
+        with self._lock:
+            return self._endpoints.setdefault(
+                endpoint, {"count": 0, "skipped": 0, "last_bytes": 0, "max_bytes": 0, "total_bytes": 0}
+            )
+
+    def _record(self, endpoint: str, peak: int) -> None:
+        entry = self._entry(endpoint)
+        with self._lock:
+            entry["count"] += 1
+            entry["last_bytes"] = peak
+            entry["max_bytes"] = max(entry["max_bytes"], peak)
+            entry["total_bytes"] += peak
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                endpoint: {
+                    "count": entry["count"],
+                    "skipped": entry["skipped"],
+                    "last_peak_bytes": entry["last_bytes"],
+                    "max_peak_bytes": entry["max_bytes"],
+                    "avg_peak_bytes": entry["total_bytes"] // entry["count"] if entry["count"] else 0,
+                }
+                for endpoint, entry in self._endpoints.items()
+            }
+
+
+class SessionStats:
+    """
+    Tamaño del identity map de cada sesión al cerrarse.
+    Un identity map grande indica objetos ORM retenidos por request.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.sessions = 0
+        self.last = 0
+        self.max = 0
+        self.total = 0
+
+    def record(self, identity_map_size: int) -> None:
+        with self._lock:
+            self.sessions += 1
+            self.last = identity_map_size
+            self.max = max(self.max, identity_map_size)
+            self.total += identity_map_size
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": self.sessions,
+                "last_identity_map": self.last,
+                "max_identity_map": self.max,
+                "avg_identity_map": round(self.total / self.sessions, 2) if self.sessions else 0.0,
+            }
+
+
+# Instancias globales del proceso
+diagnostics = MemoryDiagnostics()
+request_peaks = RequestPeaks()
+session_stats = SessionStats()
@@ -0,0 +1,196 @@
+"""
+Migraciones ligeras e idempotentes para bases de datos existentes.
+create_all solo crea tablas nuevas; estos pasos agregan índices y
+columnas que versiones previas del esquema no tenían, convierten las
+fechas al formato de QUICKTASK_TIMESTAMP_STORAGE y activan el vacuum
+incremental en bases creadas sin él.
+"""
+import logging
+import time
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import CreateTable
+
+import config
+from models import ROLLUP_TRIGGERS, Task
+
+logger = logging.getLogger(__name__)
+
+# Columnas agregadas después de la versión inicial: (tabla, columna, tipo SQL)
+COLUMNS = [
+    ("tasks", "completed_at", "DATETIME"),
+    ("tasks", "deleted_at", "DATETIME"),
+    ("tasks", "version", "INTEGER NOT NULL DEFAULT 1"),
+    ("tasks_archive", "version", "INTEGER NOT NULL DEFAULT 1"),
+    ("tasks", "user_id", "INTEGER"),
+    ("tasks_archive", "user_id", "INTEGER"),
+    ("tasks", "parent_id", "INTEGER"),
+    ("tasks", "subtask_count", "INTEGER NOT NULL DEFAULT 0"),
+    ("tasks", "subtasks_completed", "INTEGER NOT NULL DEFAULT 0"),
+    ("tasks_archive", "parent_id", "INTEGER"),
+    ("tasks_archive", "subtask_count", "INTEGER NOT NULL DEFAULT 0"),
+    ("tasks_archive", "subtasks_completed", "INTEGER NOT NULL DEFAULT 0"),
+]
+
+# Cada paso debe poder ejecutarse varias veces sin error
+MIGRATIONS = [
+    "CREATE INDEX IF NOT EXISTS ix_tasks_pending_due_date ON tasks (due_date) "
+    "WHERE completed = 0 AND due_date IS NOT NULL",
+    "CREATE INDEX IF NOT EXISTS ix_tasks_live_completed ON tasks (completed) WHERE deleted_at IS NULL",
+    "CREATE INDEX IF NOT EXISTS ix_tasks_deleted_at ON tasks (deleted_at) WHERE deleted_at IS NOT NULL",
+    "CREATE INDEX IF NOT EXISTS ix_tasks_user_id ON tasks (user_id, id)",
+    "CREATE INDEX IF NOT EXISTS ix_tasks_archive_user_id ON tasks_archive (user_id)",
+    "CREATE INDEX IF NOT EXISTS ix_tasks_parent_id ON tasks (parent_id)",
+] + ROLLUP_TRIGGERS
+
+
+# Columnas de fecha afectadas por QUICKTASK_TIMESTAMP_STORAGE (ver timestamps.py)
+TIMESTAMP_COLUMNS = [
+    ("tasks", "due_date"),
+    ("tasks", "created_at"),
+    ("tasks", "completed_at"),
+    ("tasks", "deleted_at"),
+    ("tasks_archive", "due_date"),
+    ("tasks_archive", "created_at"),
+    ("tasks_archive", "completed_at"),
+    ("tasks_archive", "archived_at"),
+]
+
+# Texto ISO de SQLAlchemy -> microsegundos desde 1970 (la fracción puede faltar)
+TEXT_TO_EPOCH_US = (
+    "CAST(strftime('%s', {column}) AS INTEGER) * 1000000 + "
+    "CASE WHEN length({column}) > 20 "
+    "THEN CAST(substr({column} || '000000', 21, 6) AS INTEGER) ELSE 0 END"
+)
+
+# Microsegundos desde 1970 -> texto en el formato de DateTime de SQLAlchemy
+EPOCH_US_TO_TEXT = (
+    "strftime('%Y-%m-%d %H:%M:%S', "
+    "({column} - ({column} % 1000000 + 1000000) % 1000000) / 1000000, 'unixepoch') "
+    "|| '.' || printf('%06d', ({column} % 1000000 + 1000000) % 1000000)"
+)
+
+
+def run_migrations(engine: Engine, timestamp_storage: Optional[str] = None) -> None:
+    """
+    Aplica todas las migraciones sobre el motor indicado.
+
+    Args:
+        engine: Motor de base de datos
+        timestamp_storage: "text" o "epoch_us" (por defecto QUICKTASK_TIMESTAMP_STORAGE)
+    """
+    with engine.begin() as connection:
+        for table, column, column_type in COLUMNS:
+            _add_column(connection, table, column, column_type)
+        ensure_autoincrement(connection)
+        for statement in MIGRATIONS:
+            connection.execute(text(statement))
+        convert_timestamps(connection, timestamp_storage or config.TIMESTAMP_STORAGE)
+    enable_incremental_vacuum(engine)
+
+
+def enable_incremental_vacuum(engine: Engine) -> bool:
+    """
+    Pasa a auto_vacuum=INCREMENTAL una base creada sin él.
+
+    El PRAGMA solo tiene efecto antes de crear tablas; en una base existente
+    hace falta un VACUUM completo (una única vez: reescribe el archivo y
+    bloquea la base mientras dura). Sin esto el purgador nunca devuelve
+    páginas al sistema de archivos.
+
+    Returns:
+        True si se ejecutó el VACUUM
+    """
+    if engine.url.database in (None, "", ":memory:"):
+        return False
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        if connection.execute(text("PRAGMA auto_vacuum")).scalar() == 2:
+            return False
+        logger.warning("Base sin auto_vacuum=INCREMENTAL: se ejecuta un VACUUM único")
+        started = time.perf_counter()
+        connection.execute(text("PRAGMA auto_vacuum = INCREMENTAL"))
+        connection.execute(text("VACUUM"))
+        logger.warning("VACUUM completado en %.0f ms", (time.perf_counter() - started) * 1000)
+    return True
+
+
+def convert_timestamps(connection: Connection, storage: str) -> int:
+    """
+    Pasa las fechas guardadas en el otro formato al formato configurado.
+    Cada valor se detecta por su tipo en SQLite (typeof), así que es
+    idempotente y también completa una conversión interrumpida.
+
+    Returns:
+        Número de valores convertidos
+    """
+    if storage == "epoch_us":
+        source_type, expression = "text", TEXT_TO_EPOCH_US
+    else:
+        source_type, expression = "integer", EPOCH_US_TO_TEXT
+    converted = 0
+    for table, column in TIMESTAMP_COLUMNS:
+        existing = {row[1] for row in connection.execute(text(f"PRAGMA table_info({table})"))}
+        if column not in existing:
+            continue
+        converted += connection.execute(text(
+            f"UPDATE {table} SET {column} = {expression.format(column=column)} "
+            f"WHERE typeof({column}) = '{source_type}'"
+        )).rowcount
+    return converted
+
+
+def ensure_autoincrement(connection: Connection) -> bool:
+    """
+    Reconstruye 'tasks' con AUTOINCREMENT si la base es anterior a él.
+
+    Sin AUTOINCREMENT SQLite asigna max(id) + 1, así que una tarea nueva
+    puede recibir el ID de una tarea ya archivada (el archivado choca con
+    la fila del archivo y GET /tasks/{id} la oculta). La tabla se copia a
+    una nueva con el esquema actual y se reemplaza; los índices y triggers
+    se crean después. En todos los casos el contador de IDs queda por
+    encima de los IDs del archivo.
+
+    Returns:
+        True si la tabla se reconstruyó
+    """
+    row = connection.execute(text(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'tasks'"
+    )).first()
+    if row is None:
+        return False
+    rebuilt = "AUTOINCREMENT" not in row[0].upper()
+    if rebuilt:
+        existing = {info[1] for info in connection.execute(text("PRAGMA table_info(tasks)"))}
+        columns = ", ".join(column.name for column in Task.__table__.columns if column.name in existing)
+        create = str(CreateTable(Task.__table__).compile(connection))
+        connection.execute(text(create.replace("CREATE TABLE tasks", "CREATE TABLE tasks_new", 1)))
+        connection.execute(text(f"INSERT INTO tasks_new ({columns}) SELECT {columns} FROM tasks"))
+        # Borrar la tabla borra también sus índices y triggers
+        connection.execute(text("DROP TABLE tasks"))
+        connection.execute(text("ALTER TABLE tasks_new RENAME TO tasks"))
+        for index in Task.__table__.indexes:
+            index.create(connection, checkfirst=True)
+
+    archived = 0
+    if connection.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tasks_archive'"
+    )).first():
+        archived = connection.execute(text("SELECT coalesce(max(id), 0) FROM tasks_archive")).scalar()
+    highest = max(archived, connection.execute(text("SELECT coalesce(max(id), 0) FROM tasks")).scalar())
+    sequence = connection.execute(text("SELECT seq FROM sqlite_sequence WHERE name = 'tasks'")).first()
+    if sequence is None and highest:
+        connection.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES ('tasks', :seq)"), {"seq": highest})
+    elif sequence is not None and sequence[0] < highest:
+        connection.execute(text("UPDATE sqlite_sequence SET seq = :seq WHERE name = 'tasks'"), {"seq": highest})
+    return rebuilt
+
+
+def _add_column(connection: Connection, table: str, column: str, column_type: str) -> None:
+    """
+    Agrega una columna si la tabla existe y aún no la tiene.
+    """
+    existing = {row[1] for row in connection.execute(text(f"PRAGMA table_info({table})"))}
+    if existing and column not in existing:
+        connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}"))
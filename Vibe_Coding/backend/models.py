@@ -2,9 +2,46 @@
 Modelos de base de datos para QuickTask.
 Define la estructura de la tabla 'tasks' en SQLite.
 """
-from sqlalchemy import Column, Integer, String, Boolean, DateTime
+from sqlalchemy import DDL, Column, Integer, String, Boolean, DateTime, Index, LargeBinary, event
+from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
+from timestamps import Timestamp
+
+
+class TaskTag(Base):
+    """
+    Etiqueta asignada a una tarea (tabla 'task_tags').
+    
+    La clave primaria (tag, task_id) es el índice invertido: las tareas
+    de una etiqueta se leen en orden de ID sin tocar la tabla 'tasks'.
+    No declara FOREIGN KEY porque las filas se conservan cuando la tarea
+    pasa a 'tasks_archive' (mismo ID).
+    
+    Atributos:
+        tag: Etiqueta normalizada (minúsculas)
+        task_id: ID de la tarea (activa o archivada)
+    """
+    __tablename__ = "task_tags"
+    
+    tag = Column(String(50), primary_key=True)
+    task_id = Column(Integer, primary_key=True)
+    
+    __table_args__ = (
+        # Etiquetas de una tarea en orden alfabético (para serializarlas)
+        Index("ix_task_tags_task_id", "task_id", "tag"),
+    )
+
+
+class TagCount(Base):
+    """
+    Número de tareas activas por etiqueta (tabla 'tag_counts').
+    Se mantiene de forma incremental en cada escritura (ver crud.py).
+    """
+    __tablename__ = "tag_counts"
+    
+    tag = Column(String(50), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
 
 
 class Task(Base):
@@ -18,15 +55,171 @@ class Task(Base):
         due_date: Fecha de vencimiento (opcional)
         completed: Estado de completado (por defecto False)
         created_at: Fecha de creación (automática)
+        completed_at: Fecha en que se marcó como completada (interna)
+        deleted_at: Fecha de eliminación lógica (None = tarea visible)
+        version: Versión de la fila; cada actualización la incrementa (ETag)
+        user_id: Usuario dueño de la tarea (None = tarea sin dueño)
+        parent_id: Tarea padre (None = tarea de primer nivel)
+        subtask_count: Subtareas visibles en todo el subárbol (mantenido por triggers)
+        subtasks_completed: Cuántas de ellas están completadas
+        tags: Etiquetas de la tarea en orden alfabético
     """
     __tablename__ = "tasks"
     
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(255), nullable=False, index=True)
     description = Column(String, nullable=True)
-    due_date = Column(DateTime, nullable=True)
+    due_date = Column(Timestamp, nullable=True)
     completed = Column(Boolean, default=False, index=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(Timestamp, default=datetime.utcnow)
+    completed_at = Column(Timestamp, nullable=True)
+    deleted_at = Column(Timestamp, nullable=True)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    user_id = Column(Integer, nullable=True)
+    parent_id = Column(Integer, nullable=True)
+    subtask_count = Column(Integer, nullable=False, default=0, server_default="0")
+    subtasks_completed = Column(Integer, nullable=False, default=0, server_default="0")
+    
+    __table_args__ = (
+        # Tareas de un usuario en orden de ID (listados paginados por usuario)
+        Index("ix_tasks_user_id", "user_id", "id"),
+        # Hijos de una tarea (paso recursivo del árbol de subtareas)
+        Index("ix_tasks_parent_id", "parent_id"),
+        # Índice parcial de filas visibles: las eliminadas quedan fuera
+        Index("ix_tasks_live_completed", "completed", sqlite_where=deleted_at == None),  # noqa: E711
+        # Índice parcial para el purgador: solo filas eliminadas
+        Index("ix_tasks_deleted_at", "deleted_at", sqlite_where=deleted_at != None),  # noqa: E711
+        # Índice parcial para los recordatorios: solo tareas pendientes con fecha
+        Index("ix_tasks_pending_due_date", "due_date", sqlite_where=(completed == False) & (due_date != None)),  # noqa: E712,E711
+        # AUTOINCREMENT evita reutilizar IDs de tareas movidas al archivo
+        {"sqlite_autoincrement": True},
+    )
+    
+    # Los flush del ORM también verifican e incrementan la versión
+    __mapper_args__ = {"version_id_col": version}
+    
+    tag_rows = relationship(
+        TaskTag,
+        primaryjoin="Task.id == foreign(TaskTag.task_id)",
+        order_by=TaskTag.tag,
+        cascade="all, delete-orphan",
+        lazy="selectin",
+    )
+    
+    @property
+    def tags(self) -> list[str]:
+        return [row.tag for row in self.tag_rows]
     
     def __repr__(self):
         return f"<Task(id={self.id}, title='{self.title}', completed={self.completed})>"
+
+
+def _rollup(row: str) -> tuple[str, str]:
+    """
+    Aporte de una fila a los contadores de su padre: (subtareas, completadas).
+    Una fila eliminada (soft delete) no aporta nada.
+    """
+    return (
+        f"(CASE WHEN {row}.deleted_at IS NULL THEN 1 + {row}.subtask_count ELSE 0 END)",
+        f"(CASE WHEN {row}.deleted_at IS NULL THEN {row}.completed + {row}.subtasks_completed ELSE 0 END)",
+    )
+
+
+_NEW_COUNT, _NEW_DONE = _rollup("NEW")
+_OLD_COUNT, _OLD_DONE = _rollup("OLD")
+
+# Contadores de subtareas mantenidos por SQLite en la misma transacción:
+# cubren el ORM, los UPDATE masivos (write-behind) y el archivado por igual.
+# Cada trigger ajusta solo al padre; el cambio en sus contadores dispara el
+# trigger de UPDATE en él y así sube hasta la raíz (PRAGMA recursive_triggers,
+# ver database.py). SQLite no admite WITH dentro de un trigger.
+ROLLUP_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS tr_tasks_rollup_insert AFTER INSERT ON tasks "
+    f"WHEN NEW.parent_id IS NOT NULL AND NEW.deleted_at IS NULL BEGIN "
+    f"UPDATE tasks SET subtask_count = subtask_count + {_NEW_COUNT}, "
+    f"subtasks_completed = subtasks_completed + {_NEW_DONE} WHERE id = NEW.parent_id; END",
+
+    "CREATE TRIGGER IF NOT EXISTS tr_tasks_rollup_update "
+    "AFTER UPDATE OF completed, deleted_at, subtask_count, subtasks_completed ON tasks "
+    f"WHEN NEW.parent_id IS NOT NULL AND ({_NEW_COUNT} != {_OLD_COUNT} OR {_NEW_DONE} != {_OLD_DONE}) BEGIN "
+    f"UPDATE tasks SET subtask_count = subtask_count + {_NEW_COUNT} - {_OLD_COUNT}, "
+    f"subtasks_completed = subtasks_completed + {_NEW_DONE} - {_OLD_DONE} WHERE id = NEW.parent_id; END",
+
+    # El archivado borra filas visibles; la purga solo borra eliminadas (no aportan)
+    "CREATE TRIGGER IF NOT EXISTS tr_tasks_rollup_delete AFTER DELETE ON tasks "
+    f"WHEN OLD.parent_id IS NOT NULL AND OLD.deleted_at IS NULL BEGIN "
+    f"UPDATE tasks SET subtask_count = subtask_count - {_OLD_COUNT}, "
+    f"subtasks_completed = subtasks_completed - {_OLD_DONE} WHERE id = OLD.parent_id; END",
+]
+
+for _trigger in ROLLUP_TRIGGERS:
+    event.listen(Task.__table__, "after_create", DDL(_trigger))
+
+
+class ArchivedTask(Base):
+    """
+    Tarea completada movida al almacenamiento frío (tabla 'tasks_archive').
+    
+    Conserva el ID original y los mismos campos que Task, de modo que
+    puede serializarse con los mismos schemas de respuesta.
+    
+    Atributos adicionales:
+        archived_at: Fecha en que se movió al archivo
+    """
+    __tablename__ = "tasks_archive"
+    
+    id = Column(Integer, primary_key=True)
+    title = Column(String(255), nullable=False)
+    description = Column(String, nullable=True)
+    due_date = Column(Timestamp, nullable=True)
+    completed = Column(Boolean, default=True)
+    created_at = Column(Timestamp)
+    completed_at = Column(Timestamp, nullable=True)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    user_id = Column(Integer, nullable=True, index=True)
+    parent_id = Column(Integer, nullable=True)
+    subtask_count = Column(Integer, nullable=False, default=0, server_default="0")
+    subtasks_completed = Column(Integer, nullable=False, default=0, server_default="0")
+    archived_at = Column(Timestamp, default=datetime.utcnow)
+    
+    # Las etiquetas se conservan al archivar (solo lectura)
+    tag_rows = relationship(
+        TaskTag,
+        primaryjoin="ArchivedTask.id == foreign(TaskTag.task_id)",
+        order_by=TaskTag.tag,
+        viewonly=True,
+        lazy="selectin",
+    )
+    
+    @property
+    def tags(self) -> list[str]:
+        return [row.tag for row in self.tag_rows]
+    
+    def __repr__(self):
+        return f"<ArchivedTask(id={self.id}, title='{self.title}')>"
+
+
+class IdempotencyRecord(Base):
+    """
+    Respuesta guardada de una escritura con header `Idempotency-Key`
+    (tabla 'idempotency_keys'). Ver idempotency.py.
+    
+    Atributos:
+        key: Usuario, endpoint y clave del cliente
+        fingerprint: SHA-256 del cuerpo del request
+        status_code: Código de la respuesta (NULL = en curso)
+        body: Cuerpo JSON de la respuesta
+        etag: Header ETag de la respuesta, si tenía
+        created_at: Fecha del primer request (para la expiración)
+    """
+    __tablename__ = "idempotency_keys"
+    
+    key = Column(String(400), primary_key=True)
+    fingerprint = Column(String(64), nullable=False)
+    status_code = Column(Integer, nullable=True)
+    body = Column(LargeBinary, nullable=True)
+    etag = Column(String(64), nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+    
+    def __repr__(self):
+        return f"<IdempotencyRecord(key='{self.key}', status_code={self.status_code})>"
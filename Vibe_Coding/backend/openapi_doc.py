@@ -0,0 +1,142 @@
+"""
+Documento OpenAPI precalculado.
+
+FastAPI arma el esquema OpenAPI recorriendo todas las rutas y modelos de
+Pydantic en el primer request a /docs u /openapi.json, y lo vuelve a
+serializar en cada request. Aquí el esquema se genera al construir la
+imagen:
+
+    python openapi_doc.py --output openapi.json
+
+y la API lo carga ya serializado, con ETag, sin recorrer rutas. Si el
+artefacto falta o no corresponde al código (huella de main.py,
+schemas.py y las versiones de FastAPI/Pydantic), se regenera en tiempo
+de ejecución como antes.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from importlib.metadata import version
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Archivos que definen las rutas y los modelos del esquema
+SOURCE_FILES = ["main.py", "schemas.py"]
+
+
+def source_fingerprint(directory: str = os.path.dirname(os.path.abspath(__file__))) -> str:
+    """
+    Huella del código que determina el esquema.
+    """
+    digest = hashlib.sha256()
+    for package in ("fastapi", "pydantic"):
+        digest.update(f"{package}=={version(package)}\n".encode())
+    for name in SOURCE_FILES:
+        with open(os.path.join(directory, name), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+class OpenApiDocument:
+    """
+    Esquema OpenAPI serializado una sola vez por proceso.
+
+    Args:
+        generate: Arma el esquema en tiempo de ejecución (app.openapi de FastAPI)
+        artifact_path: Artefacto generado al construir la imagen
+        fingerprint: Calcula la huella actual del código
+    """
+
+    def __init__(
+        self,
+        generate: Callable[[], dict],
+        artifact_path: Optional[str],
+        fingerprint: Callable[[], str] = source_fingerprint,
+    ):
+        self.generate = generate
+        self.artifact_path = artifact_path
+        self.fingerprint = fingerprint
+        self._lock = threading.Lock()
+        self._schema: Optional[dict] = None
+        self._body: Optional[bytes] = None
+        self.etag: Optional[str] = None
+        self.source: Optional[str] = None
+
+    def _load_artifact(self) -> Optional[dict]:
+        if not self.artifact_path or not os.path.exists(self.artifact_path):
+            return None
+        try:
+            with open(self.artifact_path, "rb") as f:
+                artifact = json.load(f)
+        except (OSError, ValueError):
+            logger.warning("Artefacto OpenAPI ilegible: %s", self.artifact_path)
+            return None
+        if artifact.get("fingerprint") != self.fingerprint():
+            logger.warning("Artefacto OpenAPI desactualizado, se regenera: %s", self.artifact_path)
+            return None
+        return artifact["openapi"]
+
+    def _ensure(self) -> None:
+        if self._body is not None:
+            return
+        with self._lock:
+            if self._body is not None:
+                return
+            schema = self._load_artifact()
+            self.source = "artifact"
+            if schema is None:
+                schema = self.generate()
+                self.source = "runtime"
+            body = json.dumps(schema, ensure_ascii=False, separators=(",", ":")).encode()
+            self._schema = schema
+            self.etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+            self._body = body
+
+    @property
+    def schema(self) -> dict:
+        self._ensure()
+        return self._schema
+
+    @property
+    def body(self) -> bytes:
+        self._ensure()
+        return self._body
+
+    def stats(self) -> dict:
+        return {"source": self.source, "bytes": len(self._body) if self._body else 0, "etag": self.etag}
+
+
+def write_artifact(schema: dict, output: str, fingerprint: str) -> None:
+    """
+    Escribe el artefacto (esquema + huella del código) de forma atómica.
+    """
+    tmp_path = f"{output}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"fingerprint": fingerprint, "openapi": schema}, f, ensure_ascii=False)
+    os.replace(tmp_path, output)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Genera el artefacto OpenAPI de QuickTask")
+    parser.add_argument("--output", default="openapi.json", help="Archivo de salida")
+    args = parser.parse_args(argv)
+
+    # Importar main crea las tablas: al construir la imagen no debe quedar
+    # un archivo SQLite en ella
+    with tempfile.TemporaryDirectory() as scratch:
+        os.environ["DATABASE_URL"] = f"sqlite:///{scratch}/openapi.db"
+        os.environ["QUICKTASK_SHARD_COUNT"] = "0"
+        import main as api
+
+        write_artifact(api.app.openapi(), args.output, source_fingerprint())
+        api.engine.dispose()
+    print(f"OpenAPI escrito en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+"""
+Perfilado de CPU bajo demanda por request.
+
+Un administrador puede perfilar un request puntual con `?__profile=1`
+(o el header `X-Profile: 1`) y recibir el perfil en lugar de la
+respuesta; con QUICKTASK_PROFILE_SAMPLE_EVERY=N se perfila además uno de
+cada N requests y el perfil se guarda en disco sin alterar la respuesta.
+
+cProfile solo observa el hilo donde se habilita: el event loop
+(resolución de dependencias, validación) se perfila con un perfilador y
+las partes síncronas que FastAPI ejecuta en el threadpool (el endpoint y
+la validación del response_model) con otro en ese hilo; al final se
+combinan. Con el perfilado desactivado el costo es comprobar un flag.
+
+En el event loop el perfilador se habilita solo mientras avanza la
+corrutina del request (ver `profile_coroutine`), así no se mezclan los
+demás requests concurrentes. Se perfila un request a la vez: cProfile
+no admite perfiles superpuestos (desde Python 3.12 falla con
+ValueError). Un request muestreado mientras hay otro perfil en curso se
+atiende sin perfilar; uno pedido con `?__profile` recibe 409. Los
+archivos y el reporte se generan en el threadpool.
+"""
+import asyncio
+import contextvars
+import cProfile
+import functools
+import itertools
+import os
+import pstats
+import secrets
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.routing import APIRoute
+from starlette.requests import Request
+
+import config
+
+# Formatos de salida de `?__profile=`
+FORMATS = {"1": "json", "json": "json", "collapsed": "collapsed"}
+
+
+class ProfileSession:
+    """
+    Perfil de un request: un perfilador por hilo participante.
+    Mide tiempo de CPU del hilo (time.thread_time).
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.duration_ms = 0.0
+        self._lock = threading.Lock()
+        self._profiles: list[cProfile.Profile] = []
+
+    def new_profile(self) -> cProfile.Profile:
+        profile = cProfile.Profile(time.thread_time)
+        with self._lock:
+            self._profiles.append(profile)
+        return profile
+
+    def stats(self) -> pstats.Stats:
+        """
+        Combina los perfiles de todos los hilos.
+        """
+        stats = pstats.Stats(self._profiles[0])
+        for profile in self._profiles[1:]:
+            stats.add(profile)
+        return stats
+
+
+# Sesión de perfilado del request actual (se propaga al threadpool)
+_current: contextvars.ContextVar[Optional[ProfileSession]] = contextvars.ContextVar(
+    "profile_session", default=None
+)
+
+
+# Un solo request perfilado a la vez en el proceso
+_active = threading.Lock()
+
+
+class profile_coroutine:
+    """
+    Awaitable que ejecuta una corrutina con `profile` habilitado solo
+    mientras ella avanza: entre pasos el event loop corre otras tareas
+    que no deben aparecer en el perfil.
+    """
+
+    def __init__(self, coroutine, profile: cProfile.Profile):
+        self.coroutine = coroutine
+        self.profile = profile
+
+    def __await__(self):
+        value, error = None, None
+        while True:
+            self.profile.enable()
+            try:
+                if error is not None:
+                    step = self.coroutine.throw(error)
+                else:
+                    step = self.coroutine.send(value)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                self.profile.disable()
+            try:
+                value, error = (yield step), None
+            except BaseException as exc:
+                value, error = None, exc
+
+
+def profile_in_thread(fn: Callable) -> Callable:
+    """
+    Envuelve una función síncrona para perfilarla en el hilo donde se
+    ejecute si el request actual se está perfilando.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        session = _current.get()
+        if session is None:
+            return fn(*args, **kwargs)
+        profile = session.new_profile()
+        profile.enable()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profile.disable()
+    return wrapper
+
+
+def _label(func: tuple) -> str:
+    filename, line, name = func
+    if filename == "~":
+        return name
+    return f"{os.path.basename(filename)}:{line}:{name}"
+
+
+def top_functions(stats: pstats.Stats, limit: int) -> list[dict]:
+    """
+    Funciones con más tiempo acumulado.
+    """
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)
+    return [
+        {
+            "function": _label(func),
+            "calls": nc,
+            "self_ms": round(tt * 1000, 3),
+            "cumulative_ms": round(ct * 1000, 3),
+        }
+        for func, (cc, nc, tt, ct, callers) in rows[:limit]
+    ]
+
+
+def collapsed_stacks(stats: pstats.Stats, max_depth: int = 64, min_fraction: float = 0.001) -> list[str]:
+    """
+    Reconstruye pilas en formato "collapsed" (flamegraph.pl, speedscope).
+
+    cProfile guarda aristas llamador→llamado, no pilas completas: el tiempo
+    de cada llamado bajo una ruta se reparte según la fracción de su tiempo
+    que aportó ese llamador, como hacen las herramientas de flamegraph
+    basadas en cProfile. Las ramas que aportan menos de `min_fraction`
+    del tiempo total se descartan para acotar la explosión de rutas.
+    """
+    callees: dict[tuple, list[tuple]] = {}
+    for func, (cc, nc, tt, ct, callers) in stats.stats.items():
+        for caller in callers:
+            callees.setdefault(caller, []).append(func)
+    roots = [func for func, row in stats.stats.items() if not row[4]]
+    totals: dict[str, float] = {}
+    threshold = stats.total_tt * min_fraction
+
+    def walk(func: tuple, path: tuple, scale: float) -> None:
+        key = ";".join(_label(item) for item in path)
+        totals[key] = totals.get(key, 0.0) + stats.stats[func][2] * scale
+        if len(path) >= max_depth:
+            return
+        for child in callees.get(func, ()):
+            child_ct = stats.stats[child][3]
+            if child in path or child_ct <= 0:
+                continue
+            edge_ct = stats.stats[child][4][func][3] * scale
+            if edge_ct < threshold:
+                continue
+            walk(child, path + (child,), edge_ct / child_ct)
+
+    for root in roots:
+        walk(root, (root,), 1.0)
+    micros = {stack: round(seconds * 1_000_000) for stack, seconds in totals.items()}
+    return [f"{stack} {value}" for stack, value in sorted(micros.items()) if value > 0]
+
+
+class Profiler:
+    """
+    Decide qué requests se perfilan y entrega o guarda los resultados.
+    """
+
+    def __init__(
+        self,
+        sample_every: int = 0,
+        output_dir: str = "./data/profiles",
+        keep: int = 50,
+        top: int = 30
+    ):
+        self.sample_every = sample_every
+        self.output_dir = output_dir
+        self.keep = keep
+        self.top = top
+        self._counter = itertools.count(1)
+        self.profiled = 0
+        self.stored = 0
+        self.skipped = 0
+
+    def _is_admin(self, request: Request) -> bool:
+        # Mismo criterio que require_admin en main
+        token = request.headers.get("x-admin-token")
+        return bool(config.ADMIN_TOKEN and token and secrets.compare_digest(token, config.ADMIN_TOKEN))
+
+    def mode_for(self, request: Request) -> Optional[str]:
+        """
+        Retorna el formato de salida ("json", "collapsed"), "store" para un
+        request muestreado, o None si no se perfila.
+        """
+        requested = request.query_params.get("__profile") or request.headers.get("x-profile")
+        if requested and requested in FORMATS and self._is_admin(request):
+            return FORMATS[requested]
+        if self.sample_every > 0 and next(self._counter) % self.sample_every == 0:
+            return "store"
+        return None
+
+    def report(self, request: Request, session: ProfileSession, status_code: int) -> dict:
+        stats = session.stats()
+        return {
+            "method": request.method,
+            "path": request.url.path,
+            "status_code": status_code,
+            "wall_ms": round(session.duration_ms, 3),
+            "cpu_ms": round(stats.total_tt * 1000, 3),
+            "threads": len(session._profiles),
+            "top": top_functions(stats, self.top),
+            "collapsed": collapsed_stacks(stats),
+        }
+
+    def store(self, request: Request, session: ProfileSession) -> str:
+        """
+        Guarda el perfil como .prof (pstats) y .collapsed; retorna el nombre base.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        slug = request.url.path.strip("/").replace("/", "_") or "root"
+        name = f"profile-{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}-{request.method}-{slug}"
+        stats = session.stats()
+        stats.dump_stats(os.path.join(self.output_dir, name + ".prof"))
+        with open(os.path.join(self.output_dir, name + ".collapsed"), "w") as target:
+            target.write("\n".join(collapsed_stacks(stats)) + "\n")
+        self.stored += 1
+        self._prune()
+        return name
+
+    def _prune(self) -> None:
+        names = sorted({
+            os.path.splitext(name)[0] for name in os.listdir(self.output_dir)
+            if name.startswith("profile-")
+        })
+        for name in names[:-self.keep] if self.keep > 0 else []:
+            for ext in (".prof", ".collapsed"):
+                try:
+                    os.remove(os.path.join(self.output_dir, name + ext))
+                except FileNotFoundError:
+                    pass
+
+    def read_collapsed(self, name: str) -> Optional[str]:
+        """
+        Contenido .collapsed de un perfil guardado, o None si no existe.
+        """
+        if name not in self.list_profiles():
+            return None
+        with open(os.path.join(self.output_dir, name + ".collapsed")) as source:
+            return source.read()
+
+    def list_profiles(self) -> list[str]:
+        """
+        Nombres base de los perfiles guardados.
+        """
+        if not os.path.isdir(self.output_dir):
+            return []
+        return sorted(
+            name[:-len(".prof")] for name in os.listdir(self.output_dir)
+            if name.startswith("profile-") and name.endswith(".prof")
+        )
+
+    def stats(self) -> dict:
+        return {
+            "sample_every": self.sample_every,
+            "profiled": self.profiled,
+            "stored": self.stored,
+            "skipped": self.skipped,
+        }
+
+
+# Perfilador global del proceso
+profiler = Profiler(
+    sample_every=config.PROFILE_SAMPLE_EVERY,
+    output_dir=config.PROFILE_DIR,
+    keep=config.PROFILE_KEEP,
+    top=config.PROFILE_TOP,
+)
+
+
+class ProfiledRoute(APIRoute):
+    """
+    Ruta de FastAPI que puede perfilar cada request.
+    Se instala con `app.router.route_class = ProfiledRoute`.
+    """
+
+    def get_route_handler(self) -> Callable:
+        # Las partes síncronas corren en el threadpool: perfilarlas allí
+        if not asyncio.iscoroutinefunction(self.dependant.call):
+            self.dependant.call = profile_in_thread(self.dependant.call)
+        if self.secure_cloned_response_field is not None:
+            field = self.secure_cloned_response_field
+            field.validate = profile_in_thread(field.validate)
+        handler = super().get_route_handler()
+
+        async def profiled_handler(request: Request):
+            mode = profiler.mode_for(request)
+            if mode is None:
+                return await handler(request)
+
+            if not _active.acquire(blocking=False):
+                profiler.skipped += 1
+                if mode == "store":
+                    return await handler(request)
+                return JSONResponse({"detail": "Ya hay un perfil en curso"}, status_code=409)
+
+            session = ProfileSession()
+            token = _current.set(session)
+            try:
+                response = await profile_coroutine(handler(request), session.new_profile())
+            finally:
+                session.duration_ms = (time.perf_counter() - session.started) * 1000
+                _current.reset(token)
+                _active.release()
+            profiler.profiled += 1
+
+            if mode == "store":
+                await run_in_threadpool(profiler.store, request, session)
+                return response
+            report = await run_in_threadpool(profiler.report, request, session, response.status_code)
+            if mode == "collapsed":
+                return PlainTextResponse("\n".join(report["collapsed"]) + "\n")
+            return JSONResponse(report)
+
+        return profiled_handler
+
@@ -0,0 +1,162 @@
+"""
+Purga en segundo plano de tareas eliminadas (soft delete).
+
+Borra físicamente las filas con deleted_at anterior al periodo de gracia
+en lotes acotados y luego devuelve las páginas libres con
+PRAGMA incremental_vacuum. Entre pasos duerme en proporción al tiempo
+trabajado (ciclo de trabajo) para no retener el bloqueo de escritura de
+SQLite y no afectar la latencia de la API.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+
+from models import Task
+
+logger = logging.getLogger(__name__)
+
+
+def purge_batch(db: Session, cutoff: datetime, batch_size: int) -> int:
+    """
+    Borra físicamente un lote de tareas eliminadas antes de `cutoff`.
+
+    Args:
+        db: Sesión de base de datos
+        cutoff: Se purgan las tareas con deleted_at anterior a esta fecha
+        batch_size: Máximo de filas a borrar en esta transacción
+
+    Returns:
+        Número de filas borradas
+    """
+    ids = list(db.scalars(
+        select(Task.id)
+        .where(Task.deleted_at.is_not(None), Task.deleted_at < cutoff)
+        .order_by(Task.deleted_at)
+        .limit(batch_size)
+    ))
+    if not ids:
+        return 0
+    db.query(Task).filter(Task.id.in_(ids)).delete(synchronize_session=False)
+    db.commit()
+    return len(ids)
+
+
+def incremental_vacuum(db: Session, pages: int) -> int:
+    """
+    Devuelve hasta `pages` páginas libres al sistema de archivos.
+
+    Returns:
+        Páginas libres restantes (0 si auto_vacuum no es INCREMENTAL)
+    """
+    if db.execute(text("PRAGMA auto_vacuum")).scalar() != 2:
+        return 0
+    # SQLite libera una página por paso del PRAGMA y execute() de sqlite3
+    # da un solo paso (el PRAGMA no retorna filas que leer con fetchall);
+    # executescript lo ejecuta hasta el final
+    db.commit()
+    db.connection().connection.driver_connection.executescript(f"PRAGMA incremental_vacuum({int(pages)})")
+    db.commit()
+    return db.execute(text("PRAGMA freelist_count")).scalar()
+
+
+class Purger:
+    """
+    Hilo que purga filas eliminadas y compacta el archivo con pausas
+    proporcionales al trabajo realizado.
+
+    Con duty_cycle=0.1 el purgador trabaja como máximo ~10% del tiempo:
+    tras un paso de 5 ms duerme 45 ms, dejando el bloqueo libre para la API.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        grace_seconds: float = 86400,
+        batch_size: int = 200,
+        interval_seconds: float = 300,
+        duty_cycle: float = 0.1,
+        vacuum_pages: int = 256,
+        min_pause_seconds: float = 0.01
+    ):
+        self.session_factory = session_factory
+        self.grace = timedelta(seconds=grace_seconds)
+        self.batch_size = batch_size
+        self.interval_seconds = interval_seconds
+        self.duty_cycle = min(max(duty_cycle, 0.01), 1.0)
+        self.vacuum_pages = vacuum_pages
+        self.min_pause_seconds = min_pause_seconds
+        self.purged_total = 0
+        self.vacuum_steps = 0
+        self.freelist_pages: Optional[int] = None
+        self.last_run: Optional[datetime] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _throttle(self, worked_seconds: float) -> bool:
+        """
+        Duerme según el ciclo de trabajo. Retorna False si se pidió detener.
+        """
+        pause = max(self.min_pause_seconds, worked_seconds * (1 / self.duty_cycle - 1))
+        return not self._stop.wait(pause)
+
+    def run_once(self, now: Optional[datetime] = None) -> int:
+        """
+        Purga todas las filas elegibles y luego aplica el vacuum incremental.
+
+        Returns:
+            Número de filas borradas
+        """
+        cutoff = (now or datetime.utcnow()) - self.grace
+        purged = 0
+        db = self.session_factory()
+        try:
+            while True:
+                started = time.perf_counter()
+                deleted = purge_batch(db, cutoff, self.batch_size)
+                purged += deleted
+                if deleted < self.batch_size or not self._throttle(time.perf_counter() - started):
+                    break
+            while not self._stop.is_set():
+                started = time.perf_counter()
+                remaining = incremental_vacuum(db, self.vacuum_pages)
+                self.vacuum_steps += 1
+                self.freelist_pages = remaining
+                if remaining == 0 or not self._throttle(time.perf_counter() - started):
+                    break
+        finally:
+            db.close()
+        self.purged_total += purged
+        self.last_run = datetime.utcnow()
+        return purged
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Error purgando tareas eliminadas")
+            self._stop.wait(self.interval_seconds)
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="task-purger", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "purged_total": self.purged_total,
+            "vacuum_steps": self.vacuum_steps,
+            "freelist_pages": self.freelist_pages,
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+        }
@@ -0,0 +1,364 @@
+"""
+Programador de recordatorios de vencimiento de tareas.
+
+En lugar de recorrer la tabla periódicamente, carga solo la siguiente
+ventana de vencimientos (escaneo por rango sobre el índice parcial
+ix_tasks_pending_due_date) en un min-heap. Los eventos de crud mantienen
+el heap al día de forma incremental y los recordatorios vencidos se
+envían a un destino configurable (log, webhook o cola local).
+
+Con varios workers el hub de eventos es de cada proceso: el worker que
+corre el programador no ve las escrituras de los demás. Con
+`refresh_seconds` la ventana en curso se vuelve a leer de la base
+periódicamente, así un cambio hecho en otro worker se refleja como
+mucho tras ese intervalo.
+"""
+import heapq
+import json
+import logging
+import queue
+import threading
+import urllib.request
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from sqlalchemy import Integer, bindparam, text
+from sqlalchemy.orm import Session
+
+import config
+from events import TaskEvent
+from models import Task
+
+logger = logging.getLogger(__name__)
+
+# Espera antes de reintentar tras un error (p. ej. la base no disponible)
+RETRY_SECONDS = 5.0
+
+# Sin ANALYZE, SQLite prefiere ix_tasks_completed (igualdad) y ordena en
+# memoria; INDEXED BY fuerza el escaneo por rango del índice parcial.
+WINDOW_QUERY = text(
+    "SELECT id, due_date FROM tasks INDEXED BY ix_tasks_pending_due_date "
+    "WHERE completed = 0 AND due_date IS NOT NULL AND deleted_at IS NULL "
+    "AND due_date > :start AND due_date <= :end "
+    "ORDER BY due_date"
+).bindparams(
+    bindparam("start", type_=Task.due_date.type),
+    bindparam("end", type_=Task.due_date.type),
+).columns(id=Integer, due_date=Task.due_date.type)
+
+
+class LogSink:
+    """
+    Destino que escribe cada recordatorio en el log.
+    """
+
+    def send(self, reminder: dict) -> None:
+        logger.info("Recordatorio: tarea %s vence %s", reminder["task_id"], reminder["due_date"])
+
+
+class WebhookSink:
+    """
+    Destino que envía cada recordatorio como POST JSON a una URL.
+    """
+
+    def __init__(self, url: str, timeout: float = 5.0):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, reminder: dict) -> None:
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(reminder).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+class QueueSink:
+    """
+    Destino que deja los recordatorios en una cola local acotada.
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        self.queue: queue.Queue = queue.Queue(maxsize=maxsize)
+
+    def send(self, reminder: dict) -> None:
+        self.queue.put_nowait(reminder)
+
+
+def build_sink(name: str):
+    """
+    Construye el destino configurado por nombre ("log", "webhook", "queue").
+    """
+    if name == "webhook":
+        return WebhookSink(config.REMINDER_WEBHOOK_URL)
+    if name == "queue":
+        return QueueSink()
+    return LogSink()
+
+
+def _parse_due_date(value) -> Optional[datetime]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    # SQLite guarda la fecha sin zona horaria; comparar siempre naive
+    return value.replace(tzinfo=None)
+
+
+class ReminderScheduler:
+    """
+    Min-heap de vencimientos próximos alimentado por ventanas de tiempo.
+
+    Las entradas obsoletas (tarea editada, completada o eliminada) no se
+    sacan del heap: se invalidan en `_due` y se descartan al llegar a la cima.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        sink,
+        window_seconds: int = 3600,
+        clock: Callable[[], datetime] = datetime.utcnow,
+        refresh_seconds: float = 0,
+        shard: Optional[int] = None,
+    ):
+        self.session_factory = session_factory
+        self.sink = sink
+        self.window = timedelta(seconds=window_seconds)
+        self.clock = clock
+        self.refresh = timedelta(seconds=refresh_seconds)
+        # Con particionado hay un programador por shard y cada uno ignora
+        # los eventos de los demás (los IDs de tarea se repiten entre shards)
+        self.shard = shard
+        # Instante hasta el que ya se dispararon los recordatorios
+        self._checked_until: Optional[datetime] = None
+        self._refreshed_at: Optional[datetime] = None
+        self.refreshes = 0
+        self._heap: list[tuple[datetime, int]] = []
+        self._due: dict[int, datetime] = {}
+        self._horizon: Optional[datetime] = None
+        # Eventos recibidos mientras se consulta una ventana (None = sin consulta)
+        self._buffered: Optional[list[TaskEvent]] = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self.fired = 0
+        self.send_errors = 0
+        self.lag_last_ms = 0.0
+        self.lag_max_ms = 0.0
+        self._lag_total_ms = 0.0
+
+    def load_window(self, start: datetime) -> None:
+        """
+        Carga en el heap las tareas pendientes que vencen en (start, start + ventana].
+        
+        El horizonte se amplía antes de consultar y los eventos que llegan
+        durante la consulta se guardan y se aplican después de las filas:
+        una escritura confirmada mientras tanto no se pierde aunque la
+        consulta no la vea.
+
+        Args:
+            start: Inicio exclusivo de la ventana
+        """
+        end = start + self.window
+        with self._lock:
+            self._horizon = end
+            if self._checked_until is None:
+                self._checked_until = start
+            self._buffered = []
+        rows = None
+        try:
+            rows = self._query(start, end)
+        finally:
+            with self._lock:
+                for task_id, due_date in rows or []:
+                    self._due[task_id] = due_date
+                    heapq.heappush(self._heap, (due_date, task_id))
+                self._replay_buffered()
+                # Sin filas la ventana queda pendiente: _run la vuelve a cargar
+                self._refreshed_at = self.clock() if rows is not None else None
+                self._wakeup.notify()
+
+    def reload_window(self) -> None:
+        """
+        Vuelve a leer de la base la ventana en curso y reemplaza el heap
+        (incluye las escrituras hechas en otros workers). Los eventos
+        recibidos durante la consulta se aplican sobre el resultado.
+        """
+        with self._lock:
+            start, end = self._checked_until, self._horizon
+            if end is None:
+                return
+            self._buffered = []
+        rows = None
+        try:
+            rows = self._query(start, end)
+        finally:
+            with self._lock:
+                if rows is not None:
+                    self._due = {task_id: due_date for task_id, due_date in rows}
+                    self._heap = [(due_date, task_id) for task_id, due_date in rows]
+                    heapq.heapify(self._heap)
+                    self._refreshed_at = self.clock()
+                    self.refreshes += 1
+                self._replay_buffered()
+                self._wakeup.notify()
+
+    def _replay_buffered(self) -> None:
+        # Requiere self._lock
+        buffered, self._buffered = self._buffered, None
+        for event in buffered or []:
+            self._apply(event)
+
+    def _query(self, start: datetime, end: datetime) -> list:
+        db = self.session_factory()
+        try:
+            return db.execute(WINDOW_QUERY, {"start": start, "end": end}).all()
+        finally:
+            db.close()
+
+    def _refresh_due(self) -> bool:
+        return bool(self.refresh) and self._refreshed_at is not None and (
+            self.clock() - self._refreshed_at >= self.refresh
+        )
+
+    def on_event(self, event: TaskEvent) -> None:
+        """
+        Listener del hub de eventos: actualiza el heap de forma incremental.
+        """
+        if self.shard is not None and event.shard != self.shard:
+            return
+        with self._lock:
+            if self._buffered is not None:
+                # Hay una consulta de ventana en curso: se aplica al terminar
+                self._buffered.append(event)
+                return
+            self._apply(event)
+
+    def _apply(self, event: TaskEvent) -> None:
+        # Requiere self._lock
+        if self._horizon is None:
+            return
+        task = event.task
+        due_date = _parse_due_date(task["due_date"]) if task else None
+        if event.type == "deleted" or task is None or task["completed"] or due_date is None:
+            self._due.pop(event.task_id, None)
+            return
+        if due_date <= self.clock() or due_date > self._horizon:
+            # Fuera de la ventana: se cargará (o no) con la siguiente
+            self._due.pop(event.task_id, None)
+            return
+        if self._due.get(event.task_id) != due_date:
+            self._due[event.task_id] = due_date
+            heapq.heappush(self._heap, (due_date, event.task_id))
+            self._wakeup.notify()
+
+    def run_pending(self, now: Optional[datetime] = None) -> list[dict]:
+        """
+        Dispara los recordatorios vencidos y recarga la ventana si se agotó.
+
+        Args:
+            now: Instante actual (por defecto el reloj del programador)
+
+        Returns:
+            Lista de recordatorios enviados
+        """
+        now = now or self.clock()
+        reminders = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                due_date, task_id = heapq.heappop(self._heap)
+                if self._due.get(task_id) != due_date:
+                    continue
+                del self._due[task_id]
+                lag_ms = (now - due_date).total_seconds() * 1000
+                self.fired += 1
+                self.lag_last_ms = lag_ms
+                self.lag_max_ms = max(self.lag_max_ms, lag_ms)
+                self._lag_total_ms += lag_ms
+                reminders.append({"task_id": task_id, "due_date": due_date.isoformat()})
+            if self._checked_until is None or now > self._checked_until:
+                self._checked_until = now
+            horizon = self._horizon
+        for reminder in reminders:
+            try:
+                self.sink.send(reminder)
+            except Exception:
+                self.send_errors += 1
+                logger.exception("No se pudo enviar el recordatorio de la tarea %s", reminder["task_id"])
+        if horizon is not None and now >= horizon:
+            self.load_window(horizon)
+        return reminders
+
+    def _seconds_until_next(self) -> float:
+        if self._refreshed_at is None or self._horizon is None:
+            # La ventana no se pudo cargar: reintentar pronto
+            return RETRY_SECONDS
+        now = self.clock()
+        targets = [self._horizon]
+        if self._heap:
+            targets.append(self._heap[0][0])
+        if self.refresh:
+            targets.append(self._refreshed_at + self.refresh)
+        return max(0.0, (min(targets) - now).total_seconds())
+
+    def _run(self) -> None:
+        while True:
+            timeout = None
+            try:
+                if self._refreshed_at is None:
+                    # Primera carga, o reintento de una que falló
+                    self.load_window(self._checked_until or self.clock())
+                elif self._refresh_due():
+                    self.reload_window()
+                if self._refreshed_at is not None:
+                    self.run_pending()
+            except Exception:
+                logger.exception("Error en el programador de recordatorios")
+                timeout = RETRY_SECONDS
+            with self._lock:
+                if self._stopping:
+                    return
+                self._wakeup.wait(timeout=timeout or self._seconds_until_next())
+                if self._stopping:
+                    return
+
+    def start(self) -> None:
+        """
+        Inicia el hilo del programador.
+        """
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="reminder-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Detiene el hilo del programador y espera a que termine.
+        """
+        with self._lock:
+            self._stopping = True
+            self._wakeup.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def stats(self) -> dict:
+        """
+        Métricas del programador: tamaño del heap y retraso de disparo.
+        """
+        with self._lock:
+            return {
+                "heap_size": len(self._heap),
+                "tracked_tasks": len(self._due),
+                "window_end": self._horizon.isoformat() if self._horizon else None,
+                "refreshes": self.refreshes,
+                "fired": self.fired,
+                "send_errors": self.send_errors,
+                "lag_last_ms": round(self.lag_last_ms, 3),
+                "lag_max_ms": round(self.lag_max_ms, 3),
+                "lag_avg_ms": round(self._lag_total_ms / self.fired, 3) if self.fired else 0.0,
+            }
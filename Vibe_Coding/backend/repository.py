@@ -0,0 +1,672 @@
+"""
+Repositorio de tareas: interfaz de almacenamiento de la API.
+
+`SqlTaskRepository` (por defecto) delega en crud.py sobre una sesión de
+SQLAlchemy. `MemoryTaskRepository` guarda las tareas en diccionarios del
+proceso con índices secundarios ordenados; sirve para despliegues
+efímeros (demos, edge) y tests sin base de datos. Se elige con
+QUICKTASK_STORAGE_BACKEND ("sql" o "memory").
+
+El backend en memoria no persiste nada ni tiene archivo: las tareas
+eliminadas desaparecen de inmediato y `include_archived` no agrega filas.
+"""
+import abc
+import bisect
+import dataclasses
+import itertools
+import threading
+from datetime import datetime
+from typing import Any, Callable, Collection, Iterator, Optional
+
+from sqlalchemy import func, literal
+from sqlalchemy.orm import Session
+
+import cache
+import crud
+import events
+import models
+import suggest
+from crud import ParentNotFound, VersionConflict
+from schemas import BatchOperation, BatchOperationResult, TagCount, TaskCreate, TaskUpdate
+
+
+def _escape_like(text: str) -> str:
+    """
+    Escapa los comodines de LIKE (con ESCAPE '\\') para buscar el texto literal.
+    """
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class TaskRepository(abc.ABC):
+    """
+    Operaciones de almacenamiento de tareas usadas por los endpoints.
+    Misma semántica que las funciones homónimas de crud.py.
+    
+    Con `user_id` definido, el repositorio solo ve y modifica las tareas
+    de ese usuario y las que crea le pertenecen.
+    
+    `write_behind` indica si los PATCH de `completed` pueden pasar por el
+    buffer de writebehind.py, que escribe con sesiones SQL propias.
+    """
+    
+    user_id: Optional[int] = None
+    write_behind: bool = False
+
+    @abc.abstractmethod
+    def get_task(self, task_id: int) -> Optional[Any]:
+        ...
+
+    @abc.abstractmethod
+    def get_task_or_archived(self, task_id: int) -> Optional[Any]:
+        ...
+
+    @abc.abstractmethod
+    def get_task_tree(self, task_id: int, depth: int) -> list[Any]:
+        """
+        La tarea y sus subtareas hasta `depth` niveles, por nivel y por ID.
+        """
+        ...
+
+    @abc.abstractmethod
+    def get_tasks_by_ids(self, task_ids: list[int]) -> tuple[list[Any], list[int]]:
+        ...
+
+    @abc.abstractmethod
+    def get_tasks(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        completed: Optional[bool] = None,
+        search: Optional[str] = None,
+        include_archived: bool = False,
+        tags: Optional[list[str]] = None,
+        match: str = "all"
+    ) -> list[Any]:
+        ...
+
+    @abc.abstractmethod
+    def count_tasks(
+        self,
+        completed: Optional[bool] = None,
+        search: Optional[str] = None,
+        include_archived: bool = False,
+        tags: Optional[list[str]] = None,
+        match: str = "all"
+    ) -> int:
+        ...
+
+    def get_tasks_json(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        completed: Optional[bool] = None,
+        search: Optional[str] = None,
+        tags: Optional[list[str]] = None,
+        match: str = "all"
+    ) -> Optional[str]:
+        """
+        Cuerpo JSON de TaskListResponse armado por el backend, o None si
+        el backend no sabe hacerlo (se serializa con Pydantic).
+        """
+        return None
+
+    @abc.abstractmethod
+    def get_tag_counts(self) -> list[Any]:
+        ...
+
+    @abc.abstractmethod
+    def task_titles(self) -> list[tuple[int, str]]:
+        """
+        (id, título) de todas las tareas activas (índice de sugerencias).
+        """
+        ...
+
+    @abc.abstractmethod
+    def search_titles(self, prefix: str, limit: int) -> list[tuple[int, str]]:
+        """
+        (id, título) de las tareas cuyo título o alguna de sus palabras
+        empieza por `prefix`, sin distinguir mayúsculas ni acentos (misma
+        semántica que suggest.TitleIndex.search), en orden alfabético.
+        """
+        ...
+
+    @abc.abstractmethod
+    def create_task(self, task: TaskCreate) -> Any:
+        ...
+
+    @abc.abstractmethod
+    def update_task(
+        self,
+        task_id: int,
+        task_update: TaskUpdate,
+        expected_versions: Optional[Collection[int]] = None
+    ) -> Optional[Any]:
+        ...
+
+    @abc.abstractmethod
+    def delete_task(self, task_id: int, expected_versions: Optional[Collection[int]] = None) -> bool:
+        ...
+
+    @abc.abstractmethod
+    def apply_batch(
+        self,
+        operations: list[BatchOperation],
+        atomic: bool = True
+    ) -> tuple[list[BatchOperationResult], bool]:
+        ...
+
+
+class SqlTaskRepository(TaskRepository):
+    """
+    Repositorio sobre una sesión de SQLAlchemy (delegando en crud.py).
+    """
+
+    write_behind = True
+
+    def __init__(self, db: Session, user_id: Optional[int] = None):
+        self.db = db
+        self.user_id = user_id
+
+    def get_task(self, task_id):
+        return crud.get_task(self.db, task_id, self.user_id)
+
+    def get_task_or_archived(self, task_id):
+        return crud.get_task_or_archived(self.db, task_id, self.user_id)
+
+    def get_task_tree(self, task_id, depth):
+        return crud.get_task_tree(self.db, task_id, depth, user_id=self.user_id)
+
+    def get_tasks_by_ids(self, task_ids):
+        return crud.get_tasks_by_ids(self.db, task_ids, self.user_id)
+
+    def get_tasks(self, skip=0, limit=100, completed=None, search=None, include_archived=False,
+                  tags=None, match="all"):
+        return crud.get_tasks(
+            self.db, skip=skip, limit=limit, completed=completed, search=search,
+            include_archived=include_archived, tags=tags, match=match, user_id=self.user_id
+        )
+
+    def count_tasks(self, completed=None, search=None, include_archived=False, tags=None, match="all"):
+        return crud.count_tasks(
+            self.db, completed=completed, search=search, include_archived=include_archived,
+            tags=tags, match=match, user_id=self.user_id
+        )
+
+    def get_tasks_json(self, skip=0, limit=100, completed=None, search=None, tags=None, match="all"):
+        if not crud.sql_json_supported(self.db):
+            return None
+        return crud.get_tasks_json(
+            self.db, skip=skip, limit=limit, completed=completed, search=search,
+            tags=tags, match=match, user_id=self.user_id
+        )
+
+    def get_tag_counts(self):
+        return crud.get_tag_counts(self.db, self.user_id)
+
+    def _titles(self):
+        query = self.db.query(models.Task.id, models.Task.title).filter(models.Task.deleted_at.is_(None))
+        if self.user_id is not None:
+            query = query.filter(models.Task.user_id == self.user_id)
+        return query
+
+    def task_titles(self):
+        return [(row.id, row.title) for row in self._titles()]
+
+    def search_titles(self, prefix, limit):
+        # Inicio de palabra: " " + título normalizado contiene " " + prefijo
+        pattern = "% " + _escape_like(suggest.normalize(prefix)) + "%"
+        folded = literal(" ") + func.fold(models.Task.title)
+        return [
+            (row.id, row.title) for row in self._titles()
+            .filter(folded.like(pattern, escape="\\"))
+            .order_by(models.Task.title)
+            .limit(limit)
+        ]
+
+    def create_task(self, task):
+        return crud.create_task(self.db, task, self.user_id)
+
+    def update_task(self, task_id, task_update, expected_versions=None):
+        return crud.update_task(
+            self.db, task_id, task_update, expected_versions=expected_versions, user_id=self.user_id
+        )
+
+    def delete_task(self, task_id, expected_versions=None):
+        return crud.delete_task(self.db, task_id, expected_versions=expected_versions, user_id=self.user_id)
+
+    def apply_batch(self, operations, atomic=True):
+        return crud.apply_batch(self.db, operations, atomic=atomic, user_id=self.user_id)
+
+
+@dataclasses.dataclass(frozen=True)
+class MemoryTask:
+    """
+    Tarea del backend en memoria. Inmutable: cada escritura crea una
+    copia nueva, así los lectores nunca ven una tarea a medio cambiar.
+    """
+    id: int
+    title: str
+    description: Optional[str]
+    due_date: Optional[datetime]
+    completed: bool
+    created_at: datetime
+    completed_at: Optional[datetime] = None
+    version: int = 1
+    tags: tuple = ()
+    user_id: Optional[int] = None
+    parent_id: Optional[int] = None
+    subtask_count: int = 0
+    subtasks_completed: int = 0
+
+
+class SortedIndex:
+    """
+    Índice secundario ordenado: lista de (clave, id) mantenida con bisect.
+    Las tareas con la misma clave quedan en orden de ID.
+    """
+
+    def __init__(self, key: Callable[[MemoryTask], Any]):
+        self.key = key
+        self._entries: list[tuple[Any, int]] = []
+
+    def add(self, task: MemoryTask) -> None:
+        bisect.insort(self._entries, (self.key(task), task.id))
+
+    def remove(self, task: MemoryTask) -> None:
+        entry = (self.key(task), task.id)
+        position = bisect.bisect_left(self._entries, entry)
+        if position < len(self._entries) and self._entries[position] == entry:
+            del self._entries[position]
+
+    def range(self, start: Any = None, end: Any = None) -> Iterator[int]:
+        """
+        IDs con clave en [start, end) en orden de clave (None = sin límite).
+        """
+        low = 0 if start is None else bisect.bisect_left(self._entries, (start,))
+        high = len(self._entries) if end is None else bisect.bisect_left(self._entries, (end,))
+        for position in range(low, high):
+            yield self._entries[position][1]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _rollup(task: Optional[MemoryTask]) -> tuple[int, int]:
+    """
+    Aporte de una tarea a los contadores de su padre: (subtareas, completadas).
+    """
+    if task is None:
+        return 0, 0
+    return 1 + task.subtask_count, int(task.completed) + task.subtasks_completed
+
+
+class MemoryStore:
+    """
+    Almacenamiento en memoria del proceso.
+
+    `tasks` conserva el orden de ID (los IDs crecen y se insertan al
+    final), que es también el orden de los listados. El índice por
+    `completed`, el índice invertido de etiquetas y el de hijos
+    (`children`) se actualizan en cada escritura. Los contadores de subtareas los mantiene el store
+    (como los triggers del backend SQL): se ignoran los de la tarea recibida.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.tasks: dict[int, MemoryTask] = {}
+        self.tag_index: dict[str, set[int]] = {}
+        self.children: dict[int, set[int]] = {}
+        self.indexes = {
+            "completed": SortedIndex(lambda task: task.completed),
+        }
+        self._ids = itertools.count(1)
+
+    def next_id(self) -> int:
+        return next(self._ids)
+
+    def put(self, task: MemoryTask) -> MemoryTask:
+        """
+        Inserta o reemplaza una tarea. Llamar con `lock` tomado.
+
+        Returns:
+            La tarea guardada (con sus contadores de subtareas)
+        """
+        previous = self._unindex(task.id)
+        if previous is not None:
+            task = dataclasses.replace(
+                task, subtask_count=previous.subtask_count, subtasks_completed=previous.subtasks_completed
+            )
+        else:
+            task = dataclasses.replace(task, subtask_count=0, subtasks_completed=0)
+        self.tasks[task.id] = task
+        for index in self.indexes.values():
+            index.add(task)
+        for tag in task.tags:
+            self.tag_index.setdefault(tag, set()).add(task.id)
+        if task.parent_id is not None:
+            self.children.setdefault(task.parent_id, set()).add(task.id)
+        self._propagate(task.parent_id, _rollup(previous), _rollup(task))
+        return task
+
+    def remove(self, task_id: int) -> Optional[MemoryTask]:
+        """
+        Quita una tarea y sus entradas de índice. Llamar con `lock` tomado.
+        """
+        task = self._unindex(task_id)
+        if task is not None:
+            self._propagate(task.parent_id, _rollup(task), _rollup(None))
+        return task
+
+    def _unindex(self, task_id: int) -> Optional[MemoryTask]:
+        task = self.tasks.pop(task_id, None)
+        if task is None:
+            return None
+        for index in self.indexes.values():
+            index.remove(task)
+        for tag in task.tags:
+            ids = self.tag_index[tag]
+            ids.discard(task_id)
+            if not ids:
+                del self.tag_index[tag]
+        if task.parent_id is not None:
+            siblings = self.children[task.parent_id]
+            siblings.discard(task_id)
+            if not siblings:
+                del self.children[task.parent_id]
+        return task
+
+    def _propagate(self, parent_id: Optional[int], old: tuple[int, int], new: tuple[int, int]) -> None:
+        """
+        Suma la diferencia de aporte a los contadores de todos los ancestros.
+        """
+        count, done = new[0] - old[0], new[1] - old[1]
+        if not count and not done:
+            return
+        while parent_id is not None and parent_id in self.tasks:
+            parent = self.tasks[parent_id]
+            # Los contadores no forman parte de ningún índice
+            self.tasks[parent_id] = dataclasses.replace(
+                parent,
+                subtask_count=parent.subtask_count + count,
+                subtasks_completed=parent.subtasks_completed + done,
+            )
+            parent_id = parent.parent_id
+
+    def descendants(self, task_id: int, depth: Optional[int] = None) -> list[MemoryTask]:
+        """
+        Subtareas de una tarea hasta `depth` niveles (None = todas), por
+        nivel y por ID. Llamar con `lock` tomado.
+        """
+        found: list[MemoryTask] = []
+        level = [task_id]
+        while level and (depth is None or depth > 0):
+            level = sorted(child for parent in level for child in self.children.get(parent, ()))
+            found += [self.tasks[child] for child in level]
+            depth = None if depth is None else depth - 1
+        return found
+
+
+class MemoryTaskRepository(TaskRepository):
+    """
+    Repositorio sobre un MemoryStore. Publica los mismos eventos y
+    avanza la misma generación de caché que el backend SQL.
+    """
+
+    def __init__(self, store: MemoryStore, user_id: Optional[int] = None):
+        self.store = store
+        self.user_id = user_id
+
+    def _visible(self, task: Optional[MemoryTask]) -> bool:
+        return task is not None and (self.user_id is None or task.user_id == self.user_id)
+
+    def get_task(self, task_id):
+        task = self.store.tasks.get(task_id)
+        return task if self._visible(task) else None
+
+    def get_task_or_archived(self, task_id):
+        return self.get_task(task_id)
+
+    def get_task_tree(self, task_id, depth):
+        with self.store.lock:
+            root = self.get_task(task_id)
+            if root is None:
+                return []
+            return [root] + self.store.descendants(task_id, depth)
+
+    def get_tasks_by_ids(self, task_ids):
+        unique_ids = list(dict.fromkeys(task_ids))
+        tasks = {task_id: self.get_task(task_id) for task_id in unique_ids}
+        found = [task for task in tasks.values() if task is not None]
+        missing = [task_id for task_id, task in tasks.items() if task is None]
+        return found, missing
+
+    def _candidates(self, completed, tags, match) -> list[int]:
+        """
+        IDs que cumplen los filtros indexados, en orden de ID.
+        """
+        if tags:
+            sets = [self.store.tag_index.get(tag, set()) for tag in tags]
+            ids = set.intersection(*sets) if match == "all" else set.union(*sets)
+            if completed is not None:
+                ids = {task_id for task_id in ids if self.store.tasks[task_id].completed == completed}
+            return sorted(ids)
+        if completed is not None:
+            # Rango (completed, *) del índice: ya viene en orden de ID
+            return list(self.store.indexes["completed"].range(completed, None if completed else True))
+        return list(self.store.tasks)
+
+    def _filtered(self, completed, search, tags, match) -> Iterator[MemoryTask]:
+        needle = search.lower() if search else None
+        tasks = self.store.tasks
+        for task_id in self._candidates(completed, tags, match):
+            task = tasks[task_id]
+            if self.user_id is not None and task.user_id != self.user_id:
+                continue
+            if needle and needle not in task.title.lower() and needle not in (task.description or "").lower():
+                continue
+            yield task
+
+    def get_tasks(self, skip=0, limit=100, completed=None, search=None, include_archived=False,
+                  tags=None, match="all"):
+        with self.store.lock:
+            return list(itertools.islice(self._filtered(completed, search, tags, match), skip, skip + limit))
+
+    def count_tasks(self, completed=None, search=None, include_archived=False, tags=None, match="all"):
+        with self.store.lock:
+            if not search and not tags and self.user_id is None:
+                if completed is None:
+                    return len(self.store.tasks)
+                return len(self._candidates(completed, None, match))
+            return sum(1 for _ in self._filtered(completed, search, tags, match))
+
+    def get_tag_counts(self):
+        with self.store.lock:
+            counts = [
+                (tag, sum(1 for task_id in ids if self._visible(self.store.tasks[task_id])))
+                for tag, ids in self.store.tag_index.items()
+            ]
+        counts = [(tag, count) for tag, count in counts if count > 0]
+        counts.sort(key=lambda item: (-item[1], item[0]))
+        return [TagCount(tag=tag, count=count) for tag, count in counts]
+
+    def task_titles(self):
+        with self.store.lock:
+            return [(task.id, task.title) for task in self.store.tasks.values() if self._visible(task)]
+
+    def search_titles(self, prefix, limit):
+        prefix = " " + suggest.normalize(prefix)
+        with self.store.lock:
+            matches = [
+                (task.id, task.title) for task in self.store.tasks.values()
+                if self._visible(task) and prefix in " " + suggest.normalize(task.title)
+            ]
+        return sorted(matches, key=lambda item: item[1])[:limit]
+
+    def _new_task(
+        self,
+        task: TaskCreate,
+        lookup: Optional[Callable[[int], Optional[MemoryTask]]] = None
+    ) -> MemoryTask:
+        lookup = lookup or self.get_task
+        if task.parent_id is not None and lookup(task.parent_id) is None:
+            raise ParentNotFound(task.parent_id)
+        now = datetime.utcnow()
+        data = task.model_dump(exclude={"tags"})
+        return MemoryTask(
+            id=self.store.next_id(),
+            created_at=now,
+            completed_at=now if data["completed"] else None,
+            tags=tuple(task.tags),
+            user_id=self.user_id,
+            **data,
+        )
+
+    def _updated_task(self, current: MemoryTask, task_update: TaskUpdate) -> MemoryTask:
+        changes = task_update.model_dump(exclude_unset=True)
+        tags = changes.pop("tags", None)
+        if tags is not None:
+            changes["tags"] = tuple(tags)
+        if "completed" in changes and changes["completed"] != current.completed:
+            changes["completed_at"] = datetime.utcnow() if changes["completed"] else None
+        return dataclasses.replace(current, version=current.version + 1, **changes)
+
+    def create_task(self, task):
+        with self.store.lock:
+            new_task = self.store.put(self._new_task(task))
+        cache.write_generation.bump()
+        events.hub.publish("created", new_task.id, new_task)
+        return new_task
+
+    def update_task(self, task_id, task_update, expected_versions=None):
+        with self.store.lock:
+            current = self.get_task(task_id)
+            if current is None:
+                return None
+            if expected_versions is not None and current.version not in expected_versions:
+                raise VersionConflict(current.version)
+            updated = self.store.put(self._updated_task(current, task_update))
+        cache.write_generation.bump()
+        events.hub.publish("updated", task_id, updated)
+        return updated
+
+    def delete_task(self, task_id, expected_versions=None):
+        with self.store.lock:
+            current = self.get_task(task_id)
+            if current is None:
+                return False
+            if expected_versions is not None and current.version not in expected_versions:
+                raise VersionConflict(current.version)
+            # Las subtareas se eliminan con la tarea (las hojas primero)
+            descendant_ids = [task.id for task in self.store.descendants(task_id)]
+            for descendant_id in reversed(descendant_ids):
+                self.store.remove(descendant_id)
+            self.store.remove(task_id)
+        cache.write_generation.bump()
+        for deleted_id in [task_id] + descendant_ids:
+            events.hub.publish("deleted", deleted_id, user_id=current.user_id)
+        return True
+
+    def apply_batch(self, operations, atomic=True):
+        """
+        Aplica el lote sobre una vista provisional y solo la publica en el
+        store si se confirma (misma semántica que crud.apply_batch).
+        """
+        results: list[BatchOperationResult] = []
+        staged: dict[int, Optional[MemoryTask]] = {}
+        published: list[tuple[int, str, int]] = []
+        cascaded: list[int] = []
+        # Dueño de cada tarea eliminada (sus eventos no llevan la tarea)
+        owners: dict[int, Optional[int]] = {}
+        failed = False
+        with self.store.lock:
+            def lookup(task_id: int) -> Optional[MemoryTask]:
+                if task_id in staged:
+                    return staged[task_id]
+                return self.get_task(task_id)
+
+            def staged_descendants(task_id: int) -> list[MemoryTask]:
+                # Hijos del store más los creados antes en este lote
+                found: list[MemoryTask] = []
+                level = [task_id]
+                while level:
+                    children = set()
+                    for parent in level:
+                        children.update(self.store.children.get(parent, ()))
+                        children.update(
+                            task.id for task in staged.values() if task is not None and task.parent_id == parent
+                        )
+                    tasks = [lookup(child) for child in sorted(children)]
+                    level = [task.id for task in tasks if task is not None]
+                    found += [task for task in tasks if task is not None]
+                return found
+
+            for index, operation in enumerate(operations):
+                if operation.op == "create":
+                    try:
+                        new_task = self._new_task(operation.data, lookup)
+                    except ParentNotFound:
+                        failed = True
+                        results.append(BatchOperationResult(
+                            index=index, op=operation.op, status=422, error="Tarea padre no encontrada"
+                        ))
+                        if atomic:
+                            break
+                        continue
+                    staged[new_task.id] = new_task
+                    published.append((index, "created", new_task.id))
+                    results.append(BatchOperationResult(index=index, op=operation.op, status=201))
+                    continue
+
+                current = lookup(operation.task_id)
+                if current is None:
+                    failed = True
+                    results.append(BatchOperationResult(
+                        index=index, op=operation.op, status=404, error="Tarea no encontrada"
+                    ))
+                    if atomic:
+                        break
+                    continue
+
+                if operation.op == "update":
+                    staged[current.id] = self._updated_task(current, operation.data)
+                    published.append((index, "updated", current.id))
+                    results.append(BatchOperationResult(index=index, op=operation.op, status=200))
+                else:
+                    for descendant in staged_descendants(current.id):
+                        staged[descendant.id] = None
+                        owners[descendant.id] = descendant.user_id
+                        cascaded.append(descendant.id)
+                    staged[current.id] = None
+                    owners[current.id] = current.user_id
+                    published.append((index, "deleted", current.id))
+                    results.append(BatchOperationResult(index=index, op=operation.op, status=204))
+
+            if failed and atomic:
+                return crud._mark_rolled_back(results, operations), False
+
+            for task_id, task in staged.items():
+                if task is None:
+                    self.store.remove(task_id)
+                else:
+                    self.store.put(task)
+            # Contadores de subtareas ya con todo el lote aplicado
+            staged = {task_id: task and self.store.tasks[task_id] for task_id, task in staged.items()}
+
+        cache.write_generation.bump()
+        for index, event_type, task_id in published:
+            if event_type == "deleted":
+                events.hub.publish("deleted", task_id, user_id=owners[task_id])
+                continue
+            task = staged[task_id]
+            if task is None:
+                # Creada o actualizada y luego eliminada en el mismo lote
+                continue
+            results[index].task = task
+            events.hub.publish(event_type, task_id, task)
+        for task_id in cascaded:
+            events.hub.publish("deleted", task_id, user_id=owners[task_id])
+        return results, True
+
+
+# Store global del proceso para QUICKTASK_STORAGE_BACKEND=memory
+memory_store = MemoryStore()
@@ -2,9 +2,35 @@
 Esquemas Pydantic para validación de datos.
 Define la estructura de entrada/salida de la API.
 """
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field, ConfigDict, field_validator
 from datetime import datetime
-from typing import Optional
+from typing import Annotated, Literal, Optional, Union
+
+from timestamps import to_utc_naive
+
+
+# Límites de las etiquetas
+MAX_TAGS_PER_TASK = 20
+MAX_TAG_LENGTH = 50
+
+
+def normalize_tags(tags: Optional[list[str]]) -> Optional[list[str]]:
+    """
+    Normaliza etiquetas: sin espacios extremos, minúsculas, sin repetidas
+    y en orden alfabético.
+    
+    Raises:
+        ValueError: Si una etiqueta está vacía, es muy larga o contiene comas
+    """
+    if tags is None:
+        return None
+    normalized = set()
+    for tag in tags:
+        tag = tag.strip().lower()
+        if not tag or len(tag) > MAX_TAG_LENGTH or "," in tag:
+            raise ValueError(f"Etiqueta inválida: debe tener entre 1 y {MAX_TAG_LENGTH} caracteres, sin comas")
+        normalized.add(tag)
+    return sorted(normalized)
 
 
 class TaskBase(BaseModel):
@@ -15,6 +41,12 @@ class TaskBase(BaseModel):
     description: Optional[str] = Field(None, description="Descripción opcional de la tarea")
     due_date: Optional[datetime] = Field(None, description="Fecha de vencimiento (formato ISO 8601)")
     completed: bool = Field(default=False, description="Estado de completado")
+    tags: list[str] = Field(default_factory=list, max_length=MAX_TAGS_PER_TASK, description="Etiquetas")
+    parent_id: Optional[int] = Field(None, ge=1, description="Tarea padre (solo al crear)")
+    
+    _normalize_tags = field_validator("tags")(normalize_tags)
+    # Las fechas con zona horaria se guardan y comparan en UTC
+    _due_date_utc = field_validator("due_date")(to_utc_naive)
 
 
 class TaskCreate(TaskBase):
@@ -34,6 +66,10 @@ class TaskUpdate(BaseModel):
     description: Optional[str] = None
     due_date: Optional[datetime] = None
     completed: Optional[bool] = None
+    tags: Optional[list[str]] = Field(None, max_length=MAX_TAGS_PER_TASK, description="Reemplaza las etiquetas")
+    
+    _normalize_tags = field_validator("tags")(normalize_tags)
+    _due_date_utc = field_validator("due_date")(to_utc_naive)
 
 
 class TaskResponse(TaskBase):
@@ -42,14 +78,152 @@ class TaskResponse(TaskBase):
     """
     id: int
     created_at: datetime
+    version: int = Field(1, description="Versión de la tarea (usar en If-Match)")
+    subtask_count: int = Field(0, description="Subtareas en todo el subárbol")
+    subtasks_completed: int = Field(0, description="Subtareas completadas en todo el subárbol")
     
     # Configuración para Pydantic v2
     model_config = ConfigDict(from_attributes=True)
 
 
+class TaskTreeResponse(TaskResponse):
+    """
+    Tarea con sus subtareas anidadas (GET /tasks/{id}?depth=N).
+    """
+    subtasks: list["TaskTreeResponse"] = Field(default_factory=list)
+
+
+class AdminTaskResponse(TaskResponse):
+    """
+    Tarea del listado de administración: incluye dueño y shard.
+    """
+    user_id: Optional[int] = None
+    shard: int = 0
+
+
 class TaskListResponse(BaseModel):
     """
     Schema para la respuesta de listado de tareas.
     """
     total: int
     tasks: list[TaskResponse]
+
+
+class TagCount(BaseModel):
+    """
+    Etiqueta con su número de tareas activas.
+    """
+    tag: str
+    count: int
+    
+    model_config = ConfigDict(from_attributes=True)
+
+
+class TagListResponse(BaseModel):
+    """
+    Schema de respuesta del listado de etiquetas (facetas).
+    """
+    tags: list[TagCount]
+
+
+class TaskSuggestion(BaseModel):
+    """
+    Tarea sugerida por el autocompletado.
+    """
+    id: int
+    title: str
+
+
+class TaskSuggestResponse(BaseModel):
+    """
+    Schema de respuesta del autocompletado por prefijo.
+    """
+    prefix: str
+    suggestions: list[TaskSuggestion]
+
+
+# Máximo de IDs aceptados en una lectura por lotes
+MAX_BATCH_IDS = 500
+
+
+class TaskBatchGetRequest(BaseModel):
+    """
+    Schema para leer varias tareas por ID en una sola petición.
+    """
+    ids: list[int] = Field(..., min_length=1, max_length=MAX_BATCH_IDS, description="IDs de las tareas")
+
+
+class TaskBatchResponse(BaseModel):
+    """
+    Schema de respuesta de la lectura por lotes.
+    Las tareas se retornan en el orden solicitado.
+    """
+    tasks: list[TaskResponse]
+    missing: list[int]
+
+
+# Máximo de operaciones aceptadas en un lote de escritura
+MAX_BATCH_OPERATIONS = 100
+
+
+class CreateOperation(BaseModel):
+    """
+    Operación de lote: crear una tarea.
+    """
+    op: Literal["create"]
+    data: TaskCreate
+
+
+class UpdateOperation(BaseModel):
+    """
+    Operación de lote: actualizar parcialmente una tarea.
+    """
+    op: Literal["update"]
+    task_id: int
+    data: TaskUpdate
+
+
+class DeleteOperation(BaseModel):
+    """
+    Operación de lote: eliminar una tarea.
+    """
+    op: Literal["delete"]
+    task_id: int
+
+
+BatchOperation = Annotated[
+    Union[CreateOperation, UpdateOperation, DeleteOperation],
+    Field(discriminator="op")
+]
+
+
+class BatchRequest(BaseModel):
+    """
+    Schema para ejecutar varias escrituras en una sola transacción.
+    
+    - atomic: todo-o-nada (un fallo revierte el lote completo)
+    - best_effort: se omiten las operaciones fallidas y se confirma el resto
+    """
+    operations: list[BatchOperation] = Field(..., min_length=1, max_length=MAX_BATCH_OPERATIONS)
+    mode: Literal["atomic", "best_effort"] = Field(default="atomic", description="Modo de ejecución")
+
+
+class BatchOperationResult(BaseModel):
+    """
+    Resultado de una operación del lote (status con semántica HTTP).
+    """
+    index: int
+    op: str
+    status: int
+    task: Optional[TaskResponse] = None
+    error: Optional[str] = None
+    
+    model_config = ConfigDict(validate_assignment=True)
+
+
+class BatchResponse(BaseModel):
+    """
+    Schema de respuesta del lote de escrituras.
+    """
+    committed: bool
+    results: list[BatchOperationResult]
@@ -0,0 +1,85 @@
+"""
+Coalescencia de peticiones idénticas concurrentes (single-flight).
+
+Cuando llegan varias lecturas con la misma clave mientras una ya se está
+ejecutando, las demás esperan su resultado en lugar de repetir la
+consulta: una sola ejecución en la base y un solo payload serializado.
+"""
+import threading
+from typing import Any, Callable, Hashable
+
+
+class _Call:
+    """
+    Ejecución en curso compartida por las peticiones de una misma clave.
+    """
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Grupo single-flight seguro entre hilos (endpoints síncronos de FastAPI).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, _Call] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> tuple[Any, bool]:
+        """
+        Ejecuta `fn` una sola vez por clave entre las llamadas concurrentes.
+
+        Args:
+            key: Clave normalizada de la petición
+            fn: Función que produce el resultado
+
+        Returns:
+            Tupla (resultado, si fue compartido con otra ejecución)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def stats(self) -> dict:
+        """
+        Contadores: ejecuciones reales y peticiones que compartieron resultado.
+        """
+        with self._lock:
+            in_flight = len(self._calls)
+        return {
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "in_flight": in_flight,
+        }
@@ -0,0 +1,249 @@
+"""
+Índice en memoria para autocompletar títulos de tareas.
+
+Guarda una lista ordenada de claves normalizadas (minúsculas, sin
+acentos) que empiezan en cada palabra del título; una búsqueda por
+prefijo es una bisección más la lectura de los K siguientes elementos,
+sin tocar la base. Se construye en el primer uso y se mantiene al día
+con los eventos de escritura del hub.
+
+Con varios workers cada proceso tiene su índice y solo recibe los
+eventos de sus propias escrituras: con `max_age_seconds` el índice se
+reconstruye al envejecer, así las sugerencias pueden omitir cambios de
+otros workers durante como mucho ese intervalo.
+"""
+import bisect
+import logging
+import sys
+import threading
+import time
+import unicodedata
+from typing import Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Costo aproximado por entrada además del texto: tupla, int y puntero en la lista
+ENTRY_OVERHEAD_BYTES = 120
+
+
+def normalize(text: str) -> str:
+    """
+    Normaliza un texto para búsqueda: sin acentos, casefold y espacios simples.
+    """
+    decomposed = unicodedata.normalize("NFKD", text)
+    folded = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(folded.casefold().split())
+
+
+def index_keys(title: str, max_words: int) -> list[str]:
+    """
+    Claves indexadas de un título: el título completo normalizado y el
+    resto del título a partir de cada palabra (hasta `max_words`), para
+    que "leche" encuentre "Comprar leche".
+    """
+    words = normalize(title).split(" ")
+    return [" ".join(words[i:]) for i in range(min(len(words), max_words)) if words[i]]
+
+
+class TitleIndex:
+    """
+    Índice ordenado de prefijos de títulos con presupuesto de memoria.
+
+    Si el índice supera `max_bytes` se desactiva y las búsquedas vuelven
+    a la base de datos (ver `stats()["over_budget"]`).
+    """
+
+    def __init__(self, max_bytes: int = 8 * 1024 * 1024, max_words: int = 8, max_age_seconds: float = 0):
+        self.max_bytes = max_bytes
+        self.max_words = max_words
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._entries: list[tuple[str, int]] = []
+        self._titles: dict[int, str] = {}
+        self._bytes = 0
+        self._pending: Optional[list] = None
+        self.ready = False
+        self.over_budget = False
+        self.build_ms = 0.0
+        self.built_at = 0.0
+        self.rebuilds = 0
+        self.lookups = 0
+        self.fallbacks = 0
+        self.empty = 0
+
+    def reset(self) -> None:
+        """
+        Descarta el índice y sus contadores; se reconstruye en el próximo uso.
+        """
+        with self._lock:
+            self._entries = []
+            self._titles = {}
+            self._bytes = 0
+            self._pending = None
+            self.ready = False
+            self.over_budget = False
+            self.lookups = self.fallbacks = self.empty = 0
+
+    def _entry_bytes(self, key: str) -> int:
+        return sys.getsizeof(key) + ENTRY_OVERHEAD_BYTES
+
+    def _add(self, task_id: int, title: str) -> None:
+        self._titles[task_id] = title
+        for key in index_keys(title, self.max_words):
+            bisect.insort(self._entries, (key, task_id))
+            self._bytes += self._entry_bytes(key)
+        if self._bytes > self.max_bytes:
+            self._disable()
+
+    def _remove(self, task_id: int) -> None:
+        title = self._titles.pop(task_id, None)
+        if title is None:
+            return
+        for key in index_keys(title, self.max_words):
+            position = bisect.bisect_left(self._entries, (key, task_id))
+            if position < len(self._entries) and self._entries[position] == (key, task_id):
+                del self._entries[position]
+                self._bytes -= self._entry_bytes(key)
+
+    def _fresh(self) -> bool:
+        """
+        Índice construido y, si tiene edad máxima, aún vigente (un índice
+        sobre el presupuesto no se reintenta).
+        """
+        if not self.ready:
+            return False
+        if self.over_budget or not self.max_age_seconds:
+            return True
+        return time.monotonic() - self.built_at < self.max_age_seconds
+
+    def _disable(self) -> None:
+        logger.warning("Índice de sugerencias sobre el presupuesto (%d bytes): desactivado", self.max_bytes)
+        self._entries = []
+        self._titles = {}
+        self._bytes = 0
+        self.over_budget = True
+
+    def ensure_built(self, repo) -> bool:
+        """
+        Construye el índice si aún no existe, leyendo los títulos del
+        repositorio de tareas (repository.TaskRepository).
+
+        Los eventos que llegan durante la construcción se guardan y se
+        aplican al final, para no perder escrituras concurrentes. Un índice
+        vencido (`max_age_seconds`) se reconstruye igual; mientras tanto
+        las demás consultas siguen usando el anterior.
+
+        Returns:
+            True si el índice está disponible para consultas
+        """
+        if self._fresh():
+            return not self.over_budget
+        with self._build_lock:
+            if self._fresh():
+                return not self.over_budget
+            if self.ready:
+                self.rebuilds += 1
+            started = time.perf_counter()
+            with self._lock:
+                self._pending = []
+            # La lectura se hace sin el lock: las escrituras siguen y sus
+            # eventos quedan en _pending (aplicarlos de nuevo es idempotente)
+            rows = repo.task_titles()
+            entries = []
+            size = 0
+            for task_id, title in rows:
+                for key in index_keys(title, self.max_words):
+                    entries.append((key, task_id))
+                    size += self._entry_bytes(key)
+            entries.sort()
+            with self._lock:
+                self._entries, self._bytes = entries, size
+                self._titles = dict(rows)
+                if size > self.max_bytes:
+                    self._disable()
+                else:
+                    for event_type, task_id, title in self._pending:
+                        self._apply(event_type, task_id, title)
+                self._pending = None
+                self.ready = True
+            self.built_at = time.monotonic()
+            self.build_ms = (time.perf_counter() - started) * 1000
+            return not self.over_budget
+
+    def _apply(self, event_type: str, task_id: int, title: Optional[str]) -> None:
+        self._remove(task_id)
+        if event_type in ("created", "updated") and title is not None:
+            self._add(task_id, title)
+
+    def on_event(self, event) -> None:
+        """
+        Listener del hub de eventos: mantiene el índice al día.
+        """
+        title = event.task["title"] if event.task else None
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((event.type, event.task_id, title))
+            elif self.ready and not self.over_budget:
+                if title is not None and self._titles.get(event.task_id) == title:
+                    return
+                self._apply(event.type, event.task_id, title)
+
+    def search(self, prefix: str, limit: int) -> list[tuple[int, str]]:
+        """
+        Retorna hasta `limit` tareas (id, título) cuyo título o alguna de
+        sus palabras empieza por `prefix`, en orden alfabético.
+        """
+        key = normalize(prefix)
+        results: list[tuple[int, str]] = []
+        seen = set()
+        with self._lock:
+            self.lookups += 1
+            position = bisect.bisect_left(self._entries, (key, -1))
+            while position < len(self._entries) and len(results) < limit:
+                entry_key, task_id = self._entries[position]
+                if not entry_key.startswith(key):
+                    break
+                if task_id not in seen:
+                    seen.add(task_id)
+                    results.append((task_id, self._titles[task_id]))
+                position += 1
+            if not results:
+                self.empty += 1
+        return results
+
+    def record_fallback(self) -> None:
+        with self._lock:
+            self.fallbacks += 1
+
+    def stats(self) -> dict:
+        """
+        Tamaño, memoria estimada y proporción de consultas servidas por el índice.
+        """
+        with self._lock:
+            queries = self.lookups + self.fallbacks
+            return {
+                "ready": self.ready,
+                "over_budget": self.over_budget,
+                "tasks": len(self._titles),
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "build_ms": round(self.build_ms, 3),
+                "rebuilds": self.rebuilds,
+                "lookups": self.lookups,
+                "fallbacks": self.fallbacks,
+                "hit_rate": round(self.lookups / queries, 4) if queries else 0.0,
+                "empty_results": self.empty,
+            }
+
+
+# Índice global del proceso
+index = TitleIndex(
+    max_bytes=config.SUGGEST_MAX_BYTES,
+    max_words=config.SUGGEST_MAX_WORDS,
+    # Con un solo worker los eventos lo mantienen al día
+    max_age_seconds=config.SUGGEST_MAX_AGE_SECONDS if config.WORKERS > 1 else 0,
+)
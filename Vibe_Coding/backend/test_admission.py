@@ -0,0 +1,145 @@
+"""
+Tests para el control de admisión y descarte de carga (admission.py).
+"""
+from types import SimpleNamespace
+
+import admission
+import main
+from database import PoolWaitMonitor
+
+
+class FakeClock:
+    """Reloj controlable para los tests"""
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTokenBucket:
+    """Tests para el limitador de tasa"""
+
+    def test_burst_then_wait(self):
+        """Permite la ráfaga y luego indica cuánto esperar"""
+        clock = FakeClock()
+        bucket = admission.TokenBucket(rate=2, burst=2, clock=clock)
+
+        assert bucket.take() == 0
+        assert bucket.take() == 0
+        assert bucket.take() == 0.5
+
+    def test_refills_over_time(self):
+        """Los tokens se reponen según la tasa"""
+        clock = FakeClock()
+        bucket = admission.TokenBucket(rate=1, burst=1, clock=clock)
+        bucket.take()
+
+        clock.now += 1
+        assert bucket.take() == 0
+
+
+class TestAdmissionController:
+    """Tests para las decisiones de admisión"""
+
+    def test_classify_routes(self):
+        """Escrituras, lecturas y rutas exentas"""
+        controller = admission.AdmissionController()
+
+        assert controller.classify("GET", "/tasks").name == "read"
+        assert controller.classify("POST", "/tasks:batchGet").name == "read"
+        assert controller.classify("PATCH", "/tasks/1").name == "write"
+        assert controller.classify("GET", "/health") is None
+        assert controller.classify("POST", "/admin/backup").name == "heavy"
+        assert controller.classify("GET", "/tasks/export").name == "heavy"
+
+    def test_heavy_routes_do_not_starve_reads(self):
+        """Las exportaciones agotan su propia clase, no la de lectura"""
+        controller = admission.build_controller(SimpleNamespace(
+            ADMISSION_MAX_IN_FLIGHT=0, ADMISSION_POOL_WAIT_MS=0, ADMISSION_RETRY_AFTER_SECONDS=1,
+            ADMISSION_READ_CONCURRENCY=2, ADMISSION_READ_RATE=0, ADMISSION_READ_BURST=1,
+            ADMISSION_WRITE_CONCURRENCY=1, ADMISSION_WRITE_RATE=0, ADMISSION_WRITE_BURST=1,
+            ADMISSION_HEAVY_CONCURRENCY=2, ADMISSION_HEAVY_RATE=0, ADMISSION_HEAVY_BURST=1,
+        ))
+        export = controller.classify("GET", "/tasks/export")
+
+        assert controller.admit(export) is None
+        assert controller.admit(export) is None
+        assert controller.admit(export).status_code == 503
+        assert controller.admit(controller.classify("GET", "/tasks")) is None
+        assert controller.stats()["classes"]["heavy"]["shed"]["concurrency"] == 1
+
+    def test_route_concurrency_limit(self):
+        """Se rechaza con 503 al superar la concurrencia de la clase"""
+        write = admission.RouteClass("write", max_concurrent=1)
+        controller = admission.AdmissionController(classes={"read": admission.RouteClass("read"), "write": write})
+
+        assert controller.admit(write) is None
+        rejection = controller.admit(write)
+        assert rejection.status_code == 503
+        assert write.shed["concurrency"] == 1
+
+        controller.release(write)
+        assert controller.admit(write) is None
+
+    def test_global_limit(self):
+        """El límite global aplica a todas las clases"""
+        controller = admission.AdmissionController(max_in_flight=1)
+
+        assert controller.admit(controller.classes["read"]) is None
+        assert controller.admit(controller.classes["write"]).status_code == 503
+        assert controller.stats()["shed_global"] == 1
+
+    def test_pool_saturation_sheds(self):
+        """Una espera alta del pool descarta y luego se recupera"""
+        clock = FakeClock()
+        monitor = PoolWaitMonitor(alpha=1.0, half_life_seconds=1.0, clock=clock)
+        controller = admission.AdmissionController(pool_monitor=monitor, pool_wait_ms=100)
+        read = controller.classes["read"]
+
+        started = monitor.begin()
+        clock.now += 0.5
+        monitor.end(started)
+        assert controller.admit(read).reason == "Base de datos saturada"
+
+        # Sin nuevas muestras la media decae con el tiempo
+        clock.now += 5
+        assert controller.admit(read) is None
+
+
+class TestAdmissionMiddleware:
+    """Tests del middleware sobre la aplicación"""
+
+    def test_rate_limit_returns_429_with_retry_after(self, client, sample_task_data, monkeypatch):
+        """Las escrituras que exceden la tasa reciben 429 y Retry-After"""
+        write = main.admission_controller.classes["write"]
+        monkeypatch.setattr(write, "bucket", admission.TokenBucket(rate=0.1, burst=1))
+
+        assert client.post("/tasks", json=sample_task_data).status_code == 201
+        response = client.post("/tasks", json=sample_task_data)
+
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) >= 1
+        # Las lecturas y /health no se ven afectadas
+        assert client.get("/tasks").status_code == 200
+        assert client.get("/health").status_code == 200
+
+    def test_concurrency_limit_returns_503(self, client, monkeypatch):
+        """Sin cupo en la clase se responde 503; /health sigue disponible"""
+        read = main.admission_controller.classes["read"]
+        monkeypatch.setattr(read, "max_concurrent", 1)
+        monkeypatch.setattr(read, "in_flight", 1)
+
+        response = client.get("/tasks")
+
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+        assert client.get("/health").status_code == 200
+
+    def test_metrics_include_admission(self, client):
+        """/metrics expone los contadores de admisión"""
+        data = client.get("/metrics").json()["admission"]
+
+        assert set(data["classes"]) == {"read", "write", "heavy"}
+        assert "waiting" in data["pool"]
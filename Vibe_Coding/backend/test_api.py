@@ -362,3 +362,223 @@ class TestCompleteWorkflow:
         # Buscar específica
         search_result = client.get("/tasks?search=día 3").json()
         assert search_result["total"] == 1
+
+
+class TestTaskEventsEndpoint:
+    """Tests para el stream de cambios por WebSocket"""
+    
+    def test_websocket_receives_task_events(self, client: TestClient):
+        """Crear, actualizar y eliminar emiten eventos al WebSocket"""
+        with client.websocket_connect("/tasks/ws") as websocket:
+            task = client.post("/tasks", json={"title": "Con eventos"}).json()
+            client.patch(f"/tasks/{task['id']}", json={"completed": True})
+            client.delete(f"/tasks/{task['id']}")
+            
+            created = websocket.receive_json()
+            updated = websocket.receive_json()
+            deleted = websocket.receive_json()
+        
+        assert created["type"] == "created"
+        assert created["task"]["title"] == "Con eventos"
+        assert updated["type"] == "updated"
+        assert updated["task"]["completed"] is True
+        assert deleted["type"] == "deleted"
+        assert deleted["task_id"] == task["id"]
+
+
+class TestBatchGetEndpoint:
+    """Tests para GET /tasks?ids= y POST /tasks:batchGet"""
+    
+    def test_get_tasks_by_ids_query(self, client: TestClient):
+        """Leer varias tareas con ?ids="""
+        first = client.post("/tasks", json={"title": "Uno"}).json()
+        second = client.post("/tasks", json={"title": "Dos"}).json()
+        
+        response = client.get(f"/tasks?ids={second['id']},9999,{first['id']}")
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert [task["id"] for task in data["tasks"]] == [second["id"], first["id"]]
+        assert data["missing"] == [9999]
+    
+    def test_get_tasks_by_ids_invalid(self, client: TestClient):
+        """IDs no numéricos retornan 422"""
+        response = client.get("/tasks?ids=1,abc")
+        
+        assert response.status_code == 422
+    
+    def test_batch_get_post(self, client: TestClient, create_sample_task):
+        """Leer varias tareas con POST /tasks:batchGet"""
+        response = client.post("/tasks:batchGet", json={"ids": [create_sample_task["id"], 42]})
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["tasks"][0]["title"] == create_sample_task["title"]
+        assert data["missing"] == [42]
+    
+    def test_list_without_ids_keeps_shape(self, client: TestClient, create_sample_task):
+        """Sin ids, el listado conserva la forma total/tasks"""
+        data = client.get("/tasks").json()
+        
+        assert set(data) == {"total", "tasks"}
+
+
+class TestBatchWriteEndpoint:
+    """Tests para POST /batch"""
+    
+    def test_batch_mixed_operations(self, client: TestClient, create_sample_task):
+        """Crear, actualizar y eliminar en un solo lote"""
+        other = client.post("/tasks", json={"title": "Para borrar"}).json()
+        
+        response = client.post("/batch", json={"operations": [
+            {"op": "create", "data": {"title": "Nueva"}},
+            {"op": "update", "task_id": create_sample_task["id"], "data": {"completed": True}},
+            {"op": "delete", "task_id": other["id"]},
+        ]})
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["committed"] is True
+        assert [result["status"] for result in data["results"]] == [201, 200, 204]
+        assert data["results"][0]["task"]["title"] == "Nueva"
+        assert data["results"][1]["task"]["completed"] is True
+        assert client.get(f"/tasks/{other['id']}").status_code == 404
+    
+    def test_batch_atomic_rolls_back(self, client: TestClient):
+        """En modo atómico un fallo revierte todo el lote"""
+        response = client.post("/batch", json={"operations": [
+            {"op": "create", "data": {"title": "No debe quedar"}},
+            {"op": "delete", "task_id": 9999},
+            {"op": "create", "data": {"title": "Tampoco"}},
+        ]})
+        
+        data = response.json()
+        assert data["committed"] is False
+        assert [result["status"] for result in data["results"]] == [424, 404, 424]
+        assert client.get("/tasks").json()["total"] == 0
+    
+    def test_batch_best_effort_skips_failures(self, client: TestClient):
+        """En modo best-effort solo se omite la operación fallida"""
+        response = client.post("/batch", json={"mode": "best_effort", "operations": [
+            {"op": "update", "task_id": 9999, "data": {"title": "No existe"}},
+            {"op": "create", "data": {"title": "Sí queda"}},
+        ]})
+        
+        data = response.json()
+        assert data["committed"] is True
+        assert [result["status"] for result in data["results"]] == [404, 201]
+        assert client.get("/tasks").json()["total"] == 1
+    
+    def test_batch_invalid_operation(self, client: TestClient):
+        """Una operación desconocida falla la validación"""
+        response = client.post("/batch", json={"operations": [{"op": "archive", "task_id": 1}]})
+        
+        assert response.status_code == 422
+
+
+class TestTagsEndpoint:
+    """Tests para las etiquetas: filtros ?tags= y facetas GET /tags"""
+    
+    def test_tags_are_normalized(self, client: TestClient):
+        """Las etiquetas se guardan en minúsculas, sin repetir y ordenadas"""
+        response = client.post("/tasks", json={"title": "Tarea", "tags": ["Urgente", "casa", " urgente "]})
+        
+        assert response.status_code == 201
+        assert response.json()["tags"] == ["casa", "urgente"]
+    
+    def test_filter_all_and_any(self, client: TestClient):
+        """match=all exige todas las etiquetas; match=any al menos una"""
+        client.post("/tasks", json={"title": "Ambas", "tags": ["casa", "urgente"]})
+        client.post("/tasks", json={"title": "Solo casa", "tags": ["casa"]})
+        client.post("/tasks", json={"title": "Sin etiquetas"})
+        
+        both = client.get("/tasks?tags=casa,urgente").json()
+        assert [task["title"] for task in both["tasks"]] == ["Ambas"]
+        assert both["total"] == 1
+        
+        either = client.get("/tasks?tags=urgente,casa&match=any").json()
+        assert [task["title"] for task in either["tasks"]] == ["Ambas", "Solo casa"]
+    
+    def test_facet_counts_follow_writes(self, client: TestClient):
+        """Los conteos por etiqueta se actualizan al crear, editar y eliminar"""
+        first = client.post("/tasks", json={"title": "Uno", "tags": ["casa", "urgente"]}).json()
+        client.post("/tasks", json={"title": "Dos", "tags": ["casa"]})
+        
+        client.patch(f"/tasks/{first['id']}", json={"tags": ["trabajo"]})
+        assert client.get("/tags").json()["tags"] == [
+            {"tag": "casa", "count": 1},
+            {"tag": "trabajo", "count": 1},
+        ]
+        
+        client.delete(f"/tasks/{first['id']}")
+        assert client.get("/tags").json()["tags"] == [{"tag": "casa", "count": 1}]
+    
+    def test_invalid_tag_filter(self, client: TestClient):
+        """Etiquetas con formato inválido retornan 422"""
+        assert client.get("/tasks?tags=,").status_code == 422
+        assert client.post("/tasks", json={"title": "T", "tags": [""]}).status_code == 422
+
+
+class TestOptimisticConcurrency:
+    """Tests para ETag / If-Match en PUT, PATCH y DELETE"""
+    
+    def test_etag_tracks_version(self, client: TestClient):
+        """Cada actualización incrementa la versión y el ETag"""
+        created = client.post("/tasks", json={"title": "Tarea"})
+        assert created.headers["ETag"] == '"1"'
+        assert created.json()["version"] == 1
+        
+        task_id = created.json()["id"]
+        updated = client.patch(f"/tasks/{task_id}", json={"completed": True})
+        assert updated.headers["ETag"] == '"2"'
+        assert client.get(f"/tasks/{task_id}").headers["ETag"] == '"2"'
+    
+    def test_stale_if_match_returns_412(self, client: TestClient):
+        """Un cliente con una versión vieja no pisa los cambios de otro"""
+        task_id = client.post("/tasks", json={"title": "Original"}).json()["id"]
+        client.patch(f"/tasks/{task_id}", json={"title": "Otro dispositivo"}, headers={"If-Match": '"1"'})
+        
+        stale = client.patch(f"/tasks/{task_id}", json={"title": "Mío"}, headers={"If-Match": '"1"'})
+        
+        assert stale.status_code == 412
+        assert stale.headers["ETag"] == '"2"'
+        assert client.get(f"/tasks/{task_id}").json()["title"] == "Otro dispositivo"
+    
+    def test_put_and_delete_with_if_match(self, client: TestClient):
+        """PUT y DELETE respetan If-Match; `*` acepta cualquier versión"""
+        task_id = client.post("/tasks", json={"title": "Tarea"}).json()["id"]
+        
+        put = client.put(f"/tasks/{task_id}", json={"title": "Nueva"}, headers={"If-Match": '"1"'})
+        assert put.status_code == 200
+        assert client.delete(f"/tasks/{task_id}", headers={"If-Match": '"1"'}).status_code == 412
+        assert client.delete(f"/tasks/{task_id}", headers={"If-Match": "*"}).status_code == 204
+    
+    def test_missing_task_with_if_match_returns_404(self, client: TestClient):
+        """Sin tarea no hay conflicto: 404"""
+        response = client.patch("/tasks/9999", json={"title": "X"}, headers={"If-Match": '"1"'})
+        
+        assert response.status_code == 404
+
+
+class TestUserScoping:
+    """Tests de las tareas por usuario (header X-User-Id)"""
+
+    def test_users_only_see_their_tasks(self, client):
+        """Con X-User-Id cada usuario ve y modifica solo sus tareas"""
+        mine = client.post("/tasks", json={"title": "Mía"}, headers={"X-User-Id": "1"}).json()
+        client.post("/tasks", json={"title": "Ajena"}, headers={"X-User-Id": "2"})
+
+        listed = client.get("/tasks", headers={"X-User-Id": "1"}).json()
+        assert [task["title"] for task in listed["tasks"]] == ["Mía"]
+        assert client.get(f"/tasks/{mine['id']}", headers={"X-User-Id": "2"}).status_code == 404
+        assert client.delete(f"/tasks/{mine['id']}", headers={"X-User-Id": "2"}).status_code == 404
+        # Sin header no se filtra por usuario
+        assert client.get("/tasks").json()["total"] == 2
+
+    def test_tag_counts_per_user(self, client):
+        """Las facetas de un usuario cuentan solo sus tareas"""
+        client.post("/tasks", json={"title": "A", "tags": ["casa"]}, headers={"X-User-Id": "1"})
+        client.post("/tasks", json={"title": "B", "tags": ["casa", "auto"]}, headers={"X-User-Id": "2"})
+
+        assert client.get("/tags", headers={"X-User-Id": "1"}).json()["tags"] == [{"tag": "casa", "count": 1}]
+        assert client.get("/tags").json()["tags"][0] == {"tag": "casa", "count": 2}
@@ -0,0 +1,141 @@
+"""
+Tests para el archivado de tareas completadas (archive.py).
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.orm import Session, sessionmaker
+
+import archive
+import crud
+import database
+import models
+from migrations import run_migrations
+from models import ArchivedTask, Task
+from schemas import TaskCreate, TaskUpdate
+
+
+def make_old_completed(db: Session, title: str, days: int) -> int:
+    """Crea una tarea completada hace `days` días y retorna su ID"""
+    task = crud.create_task(db, TaskCreate(title=title, completed=True))
+    task.completed_at = datetime.utcnow() - timedelta(days=days)
+    db.commit()
+    return task.id
+
+
+class TestArchiveCompletedTasks:
+    """Tests para el movimiento de tareas al archivo"""
+
+    def test_moves_only_old_completed_tasks(self, test_db: Session):
+        """Solo se archivan las completadas más antiguas que el umbral"""
+        old_id = make_old_completed(test_db, "Vieja", days=40)
+        make_old_completed(test_db, "Reciente", days=2)
+        crud.create_task(test_db, TaskCreate(title="Pendiente"))
+
+        moved = archive.archive_completed_tasks(test_db, older_than_days=30)
+
+        assert moved == 1
+        assert crud.count_tasks(test_db) == 2
+        assert test_db.query(ArchivedTask).one().id == old_id
+
+    def test_moves_in_batches(self, test_db: Session):
+        """Las tareas se mueven en lotes del tamaño indicado"""
+        for i in range(5):
+            make_old_completed(test_db, f"Vieja {i}", days=40)
+
+        moved = archive.archive_completed_tasks(test_db, older_than_days=30, batch_size=2)
+
+        assert moved == 5
+        assert test_db.query(Task).count() == 0
+        assert test_db.query(ArchivedTask).count() == 5
+
+    def test_completed_at_tracks_status_changes(self, test_db: Session):
+        """completed_at se fija al completar y se limpia al reabrir"""
+        task = crud.create_task(test_db, TaskCreate(title="Tarea"))
+        assert task.completed_at is None
+
+        crud.update_task(test_db, task.id, TaskUpdate(completed=True))
+        assert task.completed_at is not None
+
+        crud.update_task(test_db, task.id, TaskUpdate(completed=False))
+        assert task.completed_at is None
+
+    def test_archived_tasks_keep_tags_but_leave_facets(self, test_db: Session):
+        """Las etiquetas viajan al archivo y dejan de contar como activas"""
+        task = crud.create_task(test_db, TaskCreate(title="Vieja", completed=True, tags=["casa"]))
+        task.completed_at = datetime.utcnow() - timedelta(days=40)
+        test_db.commit()
+        task_id = task.id
+        crud.create_task(test_db, TaskCreate(title="Activa", tags=["casa"]))
+
+        archive.archive_completed_tasks(test_db, older_than_days=30)
+
+        assert [(row.tag, row.count) for row in crud.get_tag_counts(test_db)] == [("casa", 1)]
+        assert crud.get_task_or_archived(test_db, task_id).tags == ["casa"]
+        assert crud.count_tasks(test_db, tags=["casa"], include_archived=True) == 2
+
+
+class TestArchiveEndpoints:
+    """Tests de lectura de tareas archivadas vía API"""
+
+    @pytest.fixture
+    def client(self, sql_client):
+        """La tabla de archivo solo existe en el backend SQL: solo backend SQL"""
+        return sql_client
+
+    def test_list_excludes_archived_by_default(self, client: TestClient, test_db: Session):
+        """GET /tasks solo lee la tabla activa salvo include_archived=true"""
+        make_old_completed(test_db, "Vieja", days=40)
+        client.post("/tasks", json={"title": "Activa"})
+        archive.archive_completed_tasks(test_db, older_than_days=30)
+
+        hot = client.get("/tasks").json()
+        assert hot["total"] == 1
+        assert hot["tasks"][0]["title"] == "Activa"
+
+        everything = client.get("/tasks?include_archived=true").json()
+        assert everything["total"] == 2
+        assert [task["title"] for task in everything["tasks"]] == ["Vieja", "Activa"]
+
+    def test_get_falls_through_to_archive(self, client: TestClient, test_db: Session):
+        """GET /tasks/{id} encuentra la tarea aunque esté archivada"""
+        task_id = make_old_completed(test_db, "Vieja", days=40)
+        archive.archive_completed_tasks(test_db, older_than_days=30)
+
+        response = client.get(f"/tasks/{task_id}")
+
+        assert response.status_code == 200
+        assert response.json()["title"] == "Vieja"
+        assert response.json()["completed"] is True
+
+
+class TestLegacySchema:
+    """Tests de una base creada antes de AUTOINCREMENT"""
+
+    def test_ids_are_not_reused_after_archiving(self, tmp_path):
+        """La migración reconstruye 'tasks' y los IDs siguen creciendo"""
+        engine = database.create_sqlite_engine(f"sqlite:///{tmp_path}/legacy.db")
+        with engine.begin() as connection:
+            connection.execute(text(
+                "CREATE TABLE tasks (id INTEGER NOT NULL PRIMARY KEY, title VARCHAR(255) NOT NULL, "
+                "description VARCHAR(1000), due_date DATETIME, completed BOOLEAN, created_at DATETIME)"
+            ))
+            connection.execute(text(
+                "INSERT INTO tasks VALUES (1, 'Pendiente', NULL, NULL, 0, '2024-01-01 00:00:00.000000'), "
+                "(2, 'Vieja', NULL, NULL, 1, '2024-01-01 00:00:00.000000')"
+            ))
+        models.Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+        run_migrations(engine)
+        db = sessionmaker(bind=engine)()
+
+        assert archive.archive_completed_tasks(db, older_than_days=30) == 1
+        new_task = crud.create_task(db, TaskCreate(title="Nueva", tags=["casa"]))
+
+        assert new_task.id == 3
+        assert crud.get_task(db, 1).title == "Pendiente"
+        assert crud.get_task_or_archived(db, 2).title == "Vieja"
+        db.close()
+        engine.dispose()
@@ -0,0 +1,126 @@
+"""
+Tests para los backups en línea (backup.py) y su endpoint de administración.
+"""
+import gzip
+import sqlite3
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import backup
+import config
+from database import Base
+from models import Task
+
+
+@pytest.fixture
+def file_engine(tmp_path):
+    """Motor SQLite en archivo con algunas tareas"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'source.db'}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add_all(Task(title=f"Tarea {i}", description="x" * 500) for i in range(100))
+    db.commit()
+    db.close()
+    yield engine
+    engine.dispose()
+
+
+class TestRunBackup:
+    """Tests para la copia por pasos"""
+
+    def test_backup_in_steps_and_verify(self, file_engine, tmp_path):
+        """La copia se hace en varios pasos y pasa integrity_check"""
+        report = backup.run_backup(
+            file_engine, str(tmp_path / "backups"), pages_per_step=2, sleep_seconds=0, compress=False
+        )
+
+        assert report.status == "done"
+        assert report.steps > 1
+        assert report.pages_done == report.pages_total
+        assert report.integrity == "ok"
+        copy = sqlite3.connect(report.path)
+        assert copy.execute("SELECT COUNT(*) FROM tasks").fetchone()[0] == 100
+        copy.close()
+
+    def test_backup_finishes_under_concurrent_writes(self, file_engine, tmp_path):
+        """Las escrituras de otra conexión no dejan la copia reiniciándose sin fin"""
+        stop = threading.Event()
+
+        def write():
+            writer = sqlite3.connect(file_engine.url.database)
+            while not stop.is_set():
+                writer.execute("UPDATE tasks SET title = title || '.' WHERE id = 1")
+                writer.commit()
+                time.sleep(0.001)
+            writer.close()
+
+        writer_thread = threading.Thread(target=write)
+        writer_thread.start()
+        try:
+            report = backup.run_backup(
+                file_engine, str(tmp_path / "backups"), pages_per_step=1, sleep_seconds=0.005,
+                compress=False, max_restarts=2
+            )
+        finally:
+            stop.set()
+            writer_thread.join()
+
+        assert report.status == "done"
+        assert report.restarts > 2
+        assert report.single_step is True
+        assert report.integrity == "ok"
+        copy = sqlite3.connect(report.path)
+        assert copy.execute("SELECT COUNT(*) FROM tasks").fetchone()[0] == 100
+        copy.close()
+
+    def test_backup_compressed(self, file_engine, tmp_path):
+        """Con compresión se genera un .gz válido"""
+        report = backup.run_backup(file_engine, str(tmp_path / "backups"), sleep_seconds=0, compress=True)
+
+        assert report.path.endswith(".db.gz")
+        with gzip.open(report.path, "rb") as compressed:
+            assert compressed.read(16) == b"SQLite format 3\x00"
+
+    def test_manager_prunes_old_backups(self, file_engine, tmp_path):
+        """El gestor conserva solo los últimos N backups"""
+        manager = backup.BackupManager(file_engine, str(tmp_path / "backups"), sleep_seconds=0, keep=2)
+
+        for _ in range(3):
+            manager.run()
+
+        assert len(manager.list_backups()) == 2
+        assert manager.status()["last"]["status"] == "done"
+
+
+class TestBackupEndpoint:
+    """Tests para /admin/backup"""
+
+    def test_requires_admin_token(self, client: TestClient, monkeypatch):
+        """Sin token válido retorna 403"""
+        monkeypatch.setattr(config, "ADMIN_TOKEN", "secreto")
+
+        assert client.post("/admin/backup").status_code == 403
+        assert client.get("/admin/backup", headers={"X-Admin-Token": "otro"}).status_code == 403
+
+    def test_start_and_status(self, client: TestClient, file_engine, tmp_path, monkeypatch):
+        """Un admin puede iniciar un backup y consultar su estado"""
+        monkeypatch.setattr(config, "ADMIN_TOKEN", "secreto")
+        manager = backup.BackupManager(file_engine, str(tmp_path / "backups"), sleep_seconds=0)
+        monkeypatch.setattr(client.app.state, "backups", manager)
+        headers = {"X-Admin-Token": "secreto"}
+
+        response = client.post("/admin/backup?compress=false", headers=headers)
+        assert response.status_code == 202
+
+        for _ in range(100):
+            status = client.get("/admin/backup", headers=headers).json()
+            if status["last"] is not None:
+                break
+            time.sleep(0.02)
+        assert status["last"]["status"] == "done"
+        assert len(status["backups"]) == 1
@@ -0,0 +1,70 @@
+"""
+Tests para la caché de listados versionada por generación (cache.py).
+"""
+from fastapi.testclient import TestClient
+
+import cache
+
+
+class TestResponseCache:
+    """Tests unitarios de la caché"""
+
+    def test_entry_is_rejected_after_write(self):
+        """Una entrada de una generación anterior se descarta"""
+        generation = cache.WriteGeneration()
+        response_cache = cache.ResponseCache(1024, generation)
+        response_cache.put("k", generation.value, b"body")
+
+        assert response_cache.get("k") == b"body"
+
+        generation.bump()
+
+        assert response_cache.get("k") is None
+        assert response_cache.stats()["stale"] == 1
+        assert response_cache.stats()["entries"] == 0
+
+    def test_put_with_old_generation_is_ignored(self):
+        """Un cuerpo calculado antes de una escritura no se guarda"""
+        generation = cache.WriteGeneration()
+        response_cache = cache.ResponseCache(1024, generation)
+        started = generation.value
+        generation.bump()
+
+        response_cache.put("k", started, b"body")
+
+        assert response_cache.get("k") is None
+
+    def test_evicts_lru_over_memory_cap(self):
+        """Se expulsan las entradas menos usadas al superar el límite en bytes"""
+        generation = cache.WriteGeneration()
+        response_cache = cache.ResponseCache(10, generation)
+        response_cache.put("a", 0, b"aaaa")
+        response_cache.put("b", 0, b"bbbb")
+        response_cache.get("a")
+
+        response_cache.put("c", 0, b"cccc")
+
+        assert response_cache.get("b") is None
+        assert response_cache.get("a") == b"aaaa"
+        stats = response_cache.stats()
+        assert stats["evictions"] == 1
+        assert stats["bytes"] == 8
+
+
+class TestListCacheEndpoint:
+    """Tests de la caché aplicada a GET /tasks"""
+
+    def test_repeated_list_hits_cache_until_write(self, client: TestClient):
+        """Un listado repetido sale de la caché y una escritura lo invalida"""
+        client.post("/tasks", json={"title": "Uno"})
+        hits = cache.response_cache.hits
+
+        first = client.get("/tasks?limit=10").json()
+        second = client.get("/tasks?limit=10").json()
+
+        assert first == second
+        assert cache.response_cache.hits == hits + 1
+
+        client.post("/tasks", json={"title": "Dos"})
+
+        assert client.get("/tasks?limit=10").json()["total"] == 2
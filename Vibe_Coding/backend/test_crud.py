@@ -7,7 +7,7 @@ from datetime import datetime
 from sqlalchemy.orm import Session
 
 import crud
-from schemas import TaskCreate, TaskUpdate
+from schemas import BatchRequest, TaskCreate, TaskListResponse, TaskUpdate
 from models import Task
 
 
@@ -246,3 +246,133 @@ class TestDeleteTask:
         crud.delete_task(test_db, task1.id)
         
         assert crud.count_tasks(test_db) == 2
+
+
+class TestTaskVersions:
+    """Tests para el control de versiones de las tareas"""
+    
+    def test_update_with_expected_version(self, test_db: Session):
+        """La actualización aplica solo si la versión coincide"""
+        task = crud.create_task(test_db, TaskCreate(title="Tarea"))
+        
+        updated = crud.update_task(test_db, task.id, TaskUpdate(title="Nueva"), expected_versions=[1])
+        assert updated.version == 2
+        
+        with pytest.raises(crud.VersionConflict) as conflict:
+            crud.update_task(test_db, task.id, TaskUpdate(title="Vieja"), expected_versions=[1])
+        assert conflict.value.current_version == 2
+        assert crud.get_task(test_db, task.id).title == "Nueva"
+    
+    def test_update_keeps_completed_at_when_state_unchanged(self, test_db: Session):
+        """Repetir completed=true no cambia completed_at"""
+        task = crud.create_task(test_db, TaskCreate(title="Tarea", completed=True))
+        completed_at = task.completed_at
+        
+        crud.update_task(test_db, task.id, TaskUpdate(completed=True))
+        
+        assert crud.get_task(test_db, task.id).completed_at == completed_at
+    
+    def test_delete_without_expected_version_retries(self, test_db: Session, monkeypatch):
+        """Sin If-Match, una escritura concurrente durante el delete no da conflicto"""
+        task = crud.create_task(test_db, TaskCreate(title="Tarea"))
+        stage = crud._stage_delete_subtree
+        calls = []
+        
+        def stage_with_concurrent_write(db, db_task):
+            calls.append(db_task.version)
+            if len(calls) == 1:
+                # Otra escritura cambia la versión antes del commit
+                db.connection().exec_driver_sql(
+                    "UPDATE tasks SET version = version + 1 WHERE id = ?", (db_task.id,)
+                )
+            return stage(db, db_task)
+        
+        monkeypatch.setattr(crud, "_stage_delete_subtree", stage_with_concurrent_write)
+        
+        assert crud.delete_task(test_db, task.id) is True
+        assert len(calls) == 2
+        assert crud.get_task(test_db, task.id) is None
+
+
+class TestBatchGetTasks:
+    """Tests para la lectura de tareas por lotes"""
+    
+    def test_get_tasks_by_ids_keeps_request_order(self, test_db: Session):
+        """Las tareas se retornan en el orden pedido y se reportan las faltantes"""
+        ids = [crud.create_task(test_db, TaskCreate(title=f"Tarea {i}")).id for i in range(3)]
+        
+        tasks, missing = crud.get_tasks_by_ids(test_db, [ids[2], 9999, ids[0], ids[2]])
+        
+        assert [task.id for task in tasks] == [ids[2], ids[0]]
+        assert missing == [9999]
+    
+    def test_get_tasks_by_ids_chunks_large_requests(self, test_db: Session, monkeypatch):
+        """Listas largas se consultan en bloques"""
+        monkeypatch.setattr(crud, "SQLITE_MAX_VARIABLES", 2)
+        ids = [crud.create_task(test_db, TaskCreate(title=f"Tarea {i}")).id for i in range(5)]
+        
+        tasks, missing = crud.get_tasks_by_ids(test_db, list(reversed(ids)))
+        
+        assert [task.id for task in tasks] == list(reversed(ids))
+        assert missing == []
+
+
+class TestTasksJson:
+    """Tests para el listado armado como JSON en SQLite"""
+    
+    @pytest.mark.parametrize("filters", [
+        {},
+        {"completed": True},
+        {"search": "especial"},
+        {"skip": 1, "limit": 1},
+    ])
+    def test_matches_pydantic_serialization(self, test_db: Session, filters):
+        """El JSON de SQLite es idéntico byte a byte al de TaskListResponse"""
+        crud.create_task(test_db, TaskCreate(
+            title='Especial "comillas" \\ ñ \x01 😀', description=None,
+            due_date=datetime(2025, 1, 1, 8, 30, 0, 120000), completed=True
+        ))
+        crud.create_task(test_db, TaskCreate(title="Normal", description="línea\nnueva", due_date=datetime(2025, 1, 1)))
+        crud.create_task(test_db, TaskCreate(title="Sin fecha"))
+        
+        expected = TaskListResponse(
+            total=crud.count_tasks(test_db, completed=filters.get("completed"), search=filters.get("search")),
+            tasks=crud.get_tasks(test_db, **filters),
+        ).model_dump_json()
+        
+        assert crud.get_tasks_json(test_db, **filters) == expected
+
+
+class TestApplyBatch:
+    """Tests para los lotes de escritura"""
+    
+    def test_best_effort_rolls_back_only_failed_operation(self, test_db: Session, monkeypatch):
+        """Un error de la base de datos en best-effort revierte solo su SAVEPOINT"""
+        keep = crud.create_task(test_db, TaskCreate(title="Se actualiza"))
+        broken = crud.create_task(test_db, TaskCreate(title="Falla"))
+        stage_update = crud._stage_update
+        
+        def stage_update_with_null_title(db_task, task_update):
+            stage_update(db_task, task_update)
+            if db_task.id == broken.id:
+                # Viola NOT NULL en el flush
+                db_task.title = None
+            return db_task
+        
+        monkeypatch.setattr(crud, "_stage_update", stage_update_with_null_title)
+        operations = BatchRequest.model_validate({"mode": "best_effort", "operations": [
+            {"op": "create", "data": {"title": "Nueva"}},
+            {"op": "update", "task_id": broken.id, "data": {"completed": True}},
+            {"op": "update", "task_id": keep.id, "data": {"completed": True}},
+        ]}).operations
+        
+        results, committed = crud.apply_batch(test_db, operations, atomic=False)
+        
+        assert committed is True
+        assert [(result.status, result.error) for result in results] == [
+            (201, None), (500, "IntegrityError"), (200, None)
+        ]
+        test_db.expire_all()
+        assert crud.get_task(test_db, keep.id).completed is True
+        assert crud.get_task(test_db, broken.id).completed is False
+        assert crud.count_tasks(test_db) == 3
@@ -0,0 +1,105 @@
+"""
+Tests unitarios para el hub de eventos en tiempo real (events.py).
+"""
+import asyncio
+import json
+
+import events
+
+
+def run(coro):
+    """Ejecuta una corrutina en un event loop nuevo"""
+    return asyncio.run(coro)
+
+
+class TestEventHub:
+    """Tests para la publicación y suscripción de eventos"""
+
+    def test_publish_reaches_subscriber(self):
+        """Un evento publicado llega al suscriptor con su JSON"""
+        hub = events.EventHub(queue_size=4)
+
+        async def scenario():
+            subscriber = hub.subscribe()
+            hub.publish("deleted", 7)
+            return await subscriber.next_event(1)
+
+        event = run(scenario())
+
+        assert event.type == "deleted"
+        assert event.task_id == 7
+        assert json.loads(event.data)["task"] is None
+
+    def test_heartbeat_timeout_returns_none(self):
+        """Sin eventos, next_event retorna None al vencer el timeout"""
+        hub = events.EventHub()
+
+        async def scenario():
+            subscriber = hub.subscribe()
+            return await subscriber.next_event(0.01)
+
+        assert run(scenario()) is None
+
+    def test_slow_consumer_is_dropped(self):
+        """Un suscriptor con la cola llena se descarta"""
+        hub = events.EventHub(queue_size=2)
+
+        async def scenario():
+            subscriber = hub.subscribe()
+            for task_id in range(3):
+                hub.publish("deleted", task_id)
+            await asyncio.sleep(0)
+            try:
+                await subscriber.next_event(0.01)
+            except events.SubscriptionClosed:
+                return True
+            return False
+
+        assert run(scenario()) is True
+        assert hub.subscriber_count() == 0
+        assert hub.dropped_subscribers == 1
+
+    def test_listener_receives_events(self):
+        """Los listeners síncronos reciben cada evento"""
+        hub = events.EventHub()
+        received = []
+        hub.add_listener(received.append)
+
+        hub.publish("deleted", 1)
+
+        assert [event.task_id for event in received] == [1]
+
+    def test_format_sse(self):
+        """Formato SSE con id, tipo y datos"""
+        hub = events.EventHub()
+        event = hub.publish("deleted", 3)
+
+        text = events.format_sse(event)
+
+        assert text.startswith(f"id: {event.id}\nevent: deleted\ndata: ")
+        assert text.endswith("\n\n")
+
+    def test_publish_without_consumers_skips_serialization(self, monkeypatch):
+        """Sin suscriptores ni listeners la tarea no se serializa"""
+        hub = events.EventHub()
+        validated = []
+        model_validate = events.schemas.TaskResponse.model_validate
+        monkeypatch.setattr(
+            events.schemas.TaskResponse, "model_validate",
+            lambda task: validated.append(task) or model_validate(task),
+        )
+        task = events.schemas.TaskResponse(
+            id=5, title="Tarea", description=None, due_date=None, completed=False,
+            created_at="2025-01-01T00:00:00", version=1,
+        )
+
+        event = hub.publish("updated", 5, task)
+        assert validated == []
+        assert event.task is None
+        assert json.loads(event.data)["id"] == event.id
+
+        received = []
+        hub.add_listener(received.append)
+        hub.publish("updated", 5, task)
+        assert validated == [task]
+        assert received[0].task["title"] == "Tarea"
@@ -0,0 +1,90 @@
+"""
+Tests para la exportación columnar (export.py).
+Requieren pyarrow; se omiten si no está instalado.
+"""
+import io
+import json
+from datetime import datetime
+
+import pytest
+
+import crud
+import export
+from schemas import TaskCreate
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+def create_tasks(db, count):
+    for i in range(count):
+        crud.create_task(db, TaskCreate(
+            title=f"Tarea {i % 10}",
+            description="Descripción repetida de la tarea",
+            due_date=datetime(2025, 1, 1 + i % 5),
+            completed=i % 2 == 0,
+        ))
+
+
+class TestRecordBatches:
+    """Tests para la lectura por lotes"""
+
+    def test_batches_are_bounded(self, test_db):
+        """Cada lote tiene a lo sumo batch_size filas y se recorren todas"""
+        create_tasks(test_db, 25)
+        crud.delete_task(test_db, 1)
+
+        batches = list(export.iter_record_batches(test_db, batch_size=10))
+
+        assert [batch.num_rows for batch in batches] == [10, 10, 4]
+        ids = [value for batch in batches for value in batch.column("id").to_pylist()]
+        assert ids == list(range(2, 26))
+
+    def test_dictionary_columns(self, test_db):
+        """completed y due_date se codifican como diccionario"""
+        create_tasks(test_db, 10)
+
+        batch = next(export.iter_record_batches(test_db))
+
+        assert pa.types.is_dictionary(batch.schema.field("completed").type)
+        assert pa.types.is_dictionary(batch.schema.field("due_date").type)
+        assert len(batch.column("due_date").dictionary) == 5
+
+
+class TestExportEndpoint:
+    """Tests del endpoint GET /tasks/export"""
+
+    @pytest.fixture
+    def client(self, sql_client):
+        """Las tareas se cargan directamente en la BD de test: solo backend SQL"""
+        return sql_client
+
+    def test_export_parquet(self, client, test_db):
+        """El Parquet se lee de vuelta y es mucho menor que el NDJSON equivalente"""
+        create_tasks(test_db, 2000)
+
+        response = client.get("/tasks/export?format=parquet&batch_size=500")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/vnd.apache.parquet"
+        table = pq.read_table(io.BytesIO(response.content))
+        assert table.num_rows == 2000
+        assert pq.ParquetFile(io.BytesIO(response.content)).metadata.num_row_groups == 4
+        ndjson = "\n".join(json.dumps(row, default=str) for row in table.to_pylist())
+        assert len(response.content) * 10 < len(ndjson.encode())
+
+    def test_export_arrow_stream(self, client, test_db):
+        """El formato arrow es un stream IPC legible"""
+        create_tasks(test_db, 30)
+
+        response = client.get("/tasks/export?format=arrow&completed=true")
+
+        table = pa.ipc.open_stream(response.content).read_all()
+        assert table.num_rows == 15
+        assert set(table.column("completed").to_pylist()) == {True}
+
+    def test_export_without_pyarrow(self, client, monkeypatch):
+        """Sin pyarrow se responde 501"""
+        monkeypatch.setattr(export, "pa", None)
+
+        assert client.get("/tasks/export").status_code == 501
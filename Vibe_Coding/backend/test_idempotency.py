@@ -0,0 +1,189 @@
+"""
+Tests para las escrituras con Idempotency-Key (idempotency.py).
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+import idempotency
+from models import IdempotencyRecord
+
+
+@pytest.fixture
+def factory(test_db):
+    return sessionmaker(autocommit=False, autoflush=False, bind=test_db.get_bind())
+
+
+def counting_write(calls, body=b"{}", delay=0.0):
+    def write():
+        calls.append(1)
+        time.sleep(delay)
+        return 201, body, '"1"'
+    return write
+
+
+class TestIdempotencyStore:
+    """Tests del almacén de respuestas"""
+
+    def test_replay_skips_write(self, factory):
+        """El segundo request con la misma clave no vuelve a escribir"""
+        store = idempotency.IdempotencyStore(factory)
+        calls = []
+        first, replayed = store.run("k", b"a", counting_write(calls, b'{"id": 1}'))
+        again, replayed_again = store.run("k", b"a", counting_write(calls))
+
+        assert (replayed, replayed_again) == (False, True)
+        assert again == first
+        assert len(calls) == 1
+
+    def test_concurrent_duplicates_wait_for_first(self, factory):
+        """Los duplicados concurrentes esperan a la primera ejecución"""
+        store = idempotency.IdempotencyStore(factory)
+        calls, results = [], []
+
+        def request():
+            results.append(store.run("k", b"a", counting_write(calls, delay=0.1)))
+
+        threads = [threading.Thread(target=request) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert sorted(replayed for _, replayed in results) == [False, True, True, True]
+
+    def test_table_serves_other_processes(self, factory):
+        """Sin la LRU (otro worker) la respuesta sale de la tabla"""
+        store = idempotency.IdempotencyStore(factory)
+        calls = []
+        store.run("k", b"a", counting_write(calls, b'{"id": 7}'))
+        store.clear()
+
+        stored, replayed = store.run("k", b"a", counting_write(calls))
+        assert replayed is True
+        assert stored.body == b'{"id": 7}'
+        assert len(calls) == 1
+
+    def test_other_body_is_rejected(self, factory):
+        """La misma clave con otro cuerpo es un error"""
+        store = idempotency.IdempotencyStore(factory)
+        store.run("k", b"a", counting_write([]))
+
+        with pytest.raises(idempotency.KeyReused):
+            store.run("k", b"b", counting_write([]))
+
+    def test_failed_write_releases_key(self, factory):
+        """Si la escritura falla la clave queda libre para reintentar"""
+        store = idempotency.IdempotencyStore(factory)
+
+        def fail():
+            raise RuntimeError("falló")
+
+        with pytest.raises(RuntimeError):
+            store.run("k", b"a", fail)
+        calls = []
+        assert store.run("k", b"a", counting_write(calls))[1] is False
+        assert len(calls) == 1
+
+    def test_abandoned_claim_is_taken_over(self, factory):
+        """Una fila en curso de un proceso muerto no bloquea para siempre"""
+        store = idempotency.IdempotencyStore(factory, wait_seconds=1.0, lease_seconds=2.0)
+        with factory() as db:
+            db.add(IdempotencyRecord(
+                key="k", fingerprint=idempotency.fingerprint(b"a"),
+                created_at=datetime.utcnow() - timedelta(seconds=5),
+            ))
+            db.commit()
+
+        calls = []
+        assert store.run("k", b"a", counting_write(calls))[1] is False
+        assert len(calls) == 1
+
+    def test_slow_first_request_is_not_taken_over(self, factory):
+        """Pasada la espera pero no la concesión, el duplicado recibe 409 y no escribe"""
+        store = idempotency.IdempotencyStore(factory, wait_seconds=0.05, lease_seconds=60.0)
+        with factory() as db:
+            db.add(IdempotencyRecord(
+                key="k", fingerprint=idempotency.fingerprint(b"a"),
+                created_at=datetime.utcnow() - timedelta(seconds=5),
+            ))
+            db.commit()
+
+        calls = []
+        with pytest.raises(idempotency.KeyInProgress):
+            store.run("k", b"a", counting_write(calls))
+        assert calls == []
+
+    def test_save_after_row_was_deleted(self, factory):
+        """Si otro worker borró la fila mientras se escribía, la respuesta se vuelve a insertar"""
+        store = idempotency.IdempotencyStore(factory)
+
+        def write():
+            store._release("k")
+            return 201, b"{}", None
+
+        stored, replayed = store.run("k", b"a", write)
+
+        assert (stored.status_code, replayed) == (201, False)
+        with factory() as db:
+            assert db.get(IdempotencyRecord, "k").status_code == 201
+
+    def test_ttl_and_bound(self):
+        """La LRU expira por TTL y descarta la entrada menos usada"""
+        now = [0.0]
+        store = idempotency.IdempotencyStore(None, ttl_seconds=10, max_entries=2, clock=lambda: now[0])
+        calls = []
+        for key in ["a", "b", "c"]:
+            store.run(key, b"x", counting_write(calls))
+        assert store.stats()["entries"] == 2
+
+        store.run("c", b"x", counting_write(calls))
+        assert len(calls) == 3
+        now[0] = 11.0
+        store.run("c", b"x", counting_write(calls))
+        assert len(calls) == 4
+
+
+class TestIdempotencyApi:
+    """Tests del header Idempotency-Key en la API"""
+
+    def test_post_retry_returns_same_task(self, client):
+        """Un reintento de POST /tasks no crea otra tarea"""
+        headers = {"Idempotency-Key": "abc"}
+        first = client.post("/tasks", json={"title": "Tarea"}, headers=headers)
+        retry = client.post("/tasks", json={"title": "Tarea"}, headers=headers)
+
+        assert first.status_code == retry.status_code == 201
+        assert retry.json() == first.json()
+        assert retry.headers["etag"] == first.headers["etag"] == '"1"'
+        assert retry.headers["idempotent-replayed"] == "true"
+        assert "idempotent-replayed" not in first.headers
+        assert client.get("/tasks").json()["total"] == 1
+
+    def test_key_reuse_with_other_body(self, client):
+        """La misma clave con otro cuerpo retorna 422"""
+        client.post("/tasks", json={"title": "Una"}, headers={"Idempotency-Key": "abc"})
+        response = client.post("/tasks", json={"title": "Otra"}, headers={"Idempotency-Key": "abc"})
+        assert response.status_code == 422
+
+    def test_keys_are_scoped_per_user(self, client):
+        """Dos usuarios pueden usar la misma clave"""
+        for user_id in ("1", "2"):
+            client.post(
+                "/tasks", json={"title": "Tarea"},
+                headers={"Idempotency-Key": "abc", "X-User-Id": user_id},
+            )
+        assert client.get("/tasks").json()["total"] == 2
+
+    def test_batch_replay(self, client):
+        """Un lote repetido no se vuelve a aplicar"""
+        body = {"operations": [{"op": "create", "data": {"title": "Tarea"}}]}
+        first = client.post("/batch", json=body, headers={"Idempotency-Key": "lote"})
+        retry = client.post("/batch", json=body, headers={"Idempotency-Key": "lote"})
+
+        assert retry.json() == first.json()
+        assert client.get("/tasks").json()["total"] == 1
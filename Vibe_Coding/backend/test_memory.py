@@ -0,0 +1,93 @@
+"""
+Tests para el diagnóstico de memoria (memory.py).
+"""
+import tracemalloc
+
+import pytest
+
+import config
+import crud
+import memory
+import schemas
+
+ADMIN = {"X-Admin-Token": "secreto"}
+
+
+@pytest.fixture
+def admin(monkeypatch):
+    """Habilita los endpoints de admin y apaga tracemalloc al terminar"""
+    monkeypatch.setattr(config, "ADMIN_TOKEN", "secreto")
+    yield ADMIN
+    memory.diagnostics.stop()
+
+
+class TestRequestPeaks:
+    """Tests para la medición de picos por request"""
+
+    def test_no_measure_without_tracing(self):
+        """Sin tracemalloc activo no se registra nada"""
+        peaks = memory.RequestPeaks()
+
+        with peaks.track("list"):
+            pass
+
+        assert peaks.stats() == {}
+
+    def test_measures_peak(self):
+        """Registra el pico de las asignaciones del bloque"""
+        peaks = memory.RequestPeaks()
+        tracemalloc.start()
+        try:
+            with peaks.track("list"):
+                data = bytearray(1024 * 1024)
+                del data
+        finally:
+            tracemalloc.stop()
+
+        stats = peaks.stats()["list"]
+        assert stats["count"] == 1
+        assert stats["max_peak_bytes"] >= 1024 * 1024
+
+
+class TestSessionStats:
+    """Tests para el tamaño del identity map"""
+
+    def test_records_identity_map(self, test_db, sample_task_data):
+        """Registra los objetos retenidos por la sesión"""
+        stats = memory.SessionStats()
+        # El identity map guarda referencias débiles: mantener las tareas vivas
+        tasks = [crud.create_task(test_db, schemas.TaskCreate(**sample_task_data)) for _ in range(3)]
+
+        stats.record(len(test_db.identity_map))
+
+        assert len(tasks) == stats.stats()["max_identity_map"] == 3
+
+
+class TestMemoryEndpoints:
+    """Tests de los endpoints de administración de memoria"""
+
+    def test_requires_admin(self, client, monkeypatch):
+        """Sin token se rechaza"""
+        monkeypatch.setattr(config, "ADMIN_TOKEN", "secreto")
+
+        assert client.get("/admin/memory").status_code == 403
+
+    def test_start_snapshot_and_peaks(self, client, admin, sample_task_data):
+        """Activa tracemalloc, mide listados y compara snapshots"""
+        assert client.post("/admin/memory/snapshot", headers=admin).status_code == 409
+
+        status = client.post("/admin/memory/start", headers=admin).json()
+        assert status["tracing"] is True
+
+        first = client.post("/admin/memory/snapshot", headers=admin).json()
+        assert first["diff"] == []
+        client.post("/tasks", json=sample_task_data)
+        client.get("/tasks")
+        second = client.post("/admin/memory/snapshot", headers=admin).json()
+        assert second["since"] is not None
+
+        data = client.get("/admin/memory", headers=admin).json()
+        assert data["top_sites"]
+        assert data["request_peaks"]["list_tasks"]["count"] >= 1
+
+        assert client.post("/admin/memory/stop", headers=admin).json()["tracing"] is False
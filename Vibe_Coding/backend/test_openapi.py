@@ -0,0 +1,77 @@
+"""
+Tests para el documento OpenAPI precalculado (openapi_doc.py).
+"""
+import json
+
+import openapi_doc
+from main import app
+
+
+def build_document(tmp_path, fingerprint="abc", stored_fingerprint="abc"):
+    calls = []
+
+    def generate():
+        calls.append(1)
+        return {"openapi": "3.1.0", "info": {"title": "runtime"}}
+
+    path = tmp_path / "openapi.json"
+    openapi_doc.write_artifact({"openapi": "3.1.0", "info": {"title": "artefacto"}}, str(path), stored_fingerprint)
+    return openapi_doc.OpenApiDocument(generate, str(path), fingerprint=lambda: fingerprint), calls
+
+
+class TestOpenApiDocument:
+    """Tests de la carga del artefacto"""
+
+    def test_uses_fresh_artifact(self, tmp_path):
+        """Con la huella al día no se recorre ninguna ruta"""
+        document, calls = build_document(tmp_path)
+
+        assert json.loads(document.body)["info"]["title"] == "artefacto"
+        assert document.source == "artifact"
+        assert calls == []
+
+    def test_stale_artifact_is_regenerated(self, tmp_path):
+        """Si el código cambió se genera en tiempo de ejecución, una sola vez"""
+        document, calls = build_document(tmp_path, fingerprint="nueva")
+
+        assert document.schema["info"]["title"] == "runtime"
+        assert document.body == document.body
+        assert document.source == "runtime"
+        assert calls == [1]
+
+    def test_missing_artifact_falls_back(self, tmp_path):
+        """Sin artefacto se genera como antes"""
+        document = openapi_doc.OpenApiDocument(lambda: {"openapi": "3.1.0"}, str(tmp_path / "no.json"))
+        assert document.schema == {"openapi": "3.1.0"}
+        assert document.source == "runtime"
+
+    def test_fingerprint_tracks_sources(self, tmp_path):
+        """La huella cambia al cambiar main.py o schemas.py"""
+        for name in openapi_doc.SOURCE_FILES:
+            (tmp_path / name).write_text("x = 1\n")
+        before = openapi_doc.source_fingerprint(str(tmp_path))
+        (tmp_path / "schemas.py").write_text("x = 2\n")
+        assert openapi_doc.source_fingerprint(str(tmp_path)) != before
+
+
+class TestOpenApiEndpoints:
+    """Tests de /openapi.json y /docs"""
+
+    def test_schema_with_etag(self, client):
+        """El esquema se sirve ya serializado y revalida con If-None-Match"""
+        response = client.get("/openapi.json")
+        assert response.status_code == 200
+        assert response.json() == app.openapi()
+        assert "/tasks" in response.json()["paths"]
+        assert "/openapi.json" not in response.json()["paths"]
+
+        cached = client.get("/openapi.json", headers={"If-None-Match": response.headers["etag"]})
+        assert cached.status_code == 304
+        assert cached.content == b""
+
+    def test_docs_pages(self, client):
+        """Swagger UI y ReDoc apuntan al esquema precalculado"""
+        for path in ("/docs", "/redoc"):
+            response = client.get(path)
+            assert response.status_code == 200
+            assert "/openapi.json" in response.text
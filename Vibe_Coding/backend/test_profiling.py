@@ -0,0 +1,138 @@
+"""
+Tests para el perfilado de CPU por request (profiling.py).
+"""
+import asyncio
+import cProfile
+import pstats
+
+import pytest
+
+import config
+import profiling
+
+
+def busy():
+    return sum(i * i for i in range(2000))
+
+
+class TestCollapsedStacks:
+    """Tests para la reconstrucción de pilas"""
+
+    def test_stacks_include_call_path(self):
+        """Las pilas contienen la ruta llamador→llamado"""
+        profile = cProfile.Profile()
+        profile.enable()
+        busy()
+        profile.disable()
+        session = profiling.ProfileSession()
+        session._profiles.append(profile)
+
+        stacks = profiling.collapsed_stacks(session.stats())
+
+        assert any(";test_profiling.py" in line and ":busy" in line for line in stacks)
+        assert all(int(line.rsplit(" ", 1)[1]) > 0 for line in stacks)
+
+
+class TestProfileEndpoint:
+    """Tests del perfilado bajo demanda"""
+
+    @pytest.fixture
+    def client(self, sql_client):
+        """El perfil debe muestrear la consulta SQL de list_tasks: solo backend SQL"""
+        return sql_client
+
+    def test_profile_requires_admin(self, client, monkeypatch):
+        """Sin token de admin el parámetro se ignora"""
+        monkeypatch.setattr(config, "ADMIN_TOKEN", "secreto")
+
+        response = client.get("/tasks?__profile=1")
+
+        assert response.status_code == 200
+        assert "tasks" in response.json()
+
+    def test_profile_returns_report(self, client, sample_task_data, monkeypatch):
+        """El admin recibe el perfil en lugar de la respuesta"""
+        monkeypatch.setattr(config, "ADMIN_TOKEN", "secreto")
+        client.post("/tasks", json=sample_task_data)
+
+        response = client.get("/tasks?__profile=1", headers={"X-Admin-Token": "secreto"})
+
+        assert response.status_code == 200
+        report = response.json()
+        assert report["path"] == "/tasks"
+        assert report["status_code"] == 200
+        # El endpoint se ejecuta en el threadpool y también queda perfilado
+        assert report["threads"] >= 2
+        assert any("list_tasks" in row["function"] for row in report["top"])
+        assert report["collapsed"]
+
+    def test_profile_collapsed_format(self, client, monkeypatch):
+        """?__profile=collapsed retorna texto para flamegraph"""
+        monkeypatch.setattr(config, "ADMIN_TOKEN", "secreto")
+
+        response = client.get("/tasks?__profile=collapsed", headers={"X-Admin-Token": "secreto"})
+
+        assert response.headers["content-type"].startswith("text/plain")
+        assert ";" in response.text
+
+    def test_sampling_stores_profiles(self, client, tmp_path, monkeypatch):
+        """El muestreo guarda el perfil sin alterar la respuesta"""
+        monkeypatch.setattr(config, "ADMIN_TOKEN", "secreto")
+        sampler = profiling.Profiler(sample_every=2, output_dir=str(tmp_path))
+        monkeypatch.setattr(profiling, "profiler", sampler)
+
+        responses = [client.get("/tasks") for _ in range(4)]
+
+        assert all("tasks" in response.json() for response in responses)
+        names = client.get("/admin/profiles", headers={"X-Admin-Token": "secreto"}).json()["profiles"]
+        assert len(names) == 2
+        collapsed = client.get(f"/admin/profiles/{names[0]}", headers={"X-Admin-Token": "secreto"})
+        assert collapsed.status_code == 200
+        assert "list_tasks" in collapsed.text
+
+    def test_one_profile_at_a_time(self, client, tmp_path, monkeypatch):
+        """Con un perfil en curso no se habilita otro: 409 a pedido, sin perfilar si es muestreo"""
+        monkeypatch.setattr(config, "ADMIN_TOKEN", "secreto")
+        sampler = profiling.Profiler(sample_every=1, output_dir=str(tmp_path))
+        monkeypatch.setattr(profiling, "profiler", sampler)
+
+        with profiling._active:
+            requested = client.get("/tasks?__profile=1", headers={"X-Admin-Token": "secreto"})
+            sampled = client.get("/tasks")
+
+        assert requested.status_code == 409
+        assert "tasks" in sampled.json()
+        assert sampler.stats()["skipped"] == 2
+        assert sampler.list_profiles() == []
+
+
+class TestProfileCoroutine:
+    """Tests del perfilado de una sola corrutina en el event loop"""
+
+    def test_other_tasks_are_not_profiled(self):
+        """Lo que corre en el loop entre pasos de la corrutina no entra en el perfil"""
+        def noise():
+            return sum(i for i in range(2000))
+
+        async def request():
+            await asyncio.sleep(0)
+            busy()
+            await asyncio.sleep(0)
+            return "ok"
+
+        async def other():
+            for _ in range(3):
+                noise()
+                await asyncio.sleep(0)
+
+        async def main():
+            profile = cProfile.Profile()
+            result, _ = await asyncio.gather(profiling.profile_coroutine(request(), profile), other())
+            return result, profile
+
+        result, profile = asyncio.run(main())
+        names = {func[2] for func in pstats.Stats(profile).stats}
+
+        assert result == "ok"
+        assert "busy" in names
+        assert "noise" not in names
@@ -0,0 +1,105 @@
+"""
+Tests para el soft delete y la purga en segundo plano (purge.py).
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session, sessionmaker
+
+import crud
+import purge
+from database import Base
+from migrations import enable_incremental_vacuum, run_migrations
+from models import Task
+from schemas import TaskCreate
+
+
+class TestSoftDelete:
+    """Tests para la eliminación lógica"""
+
+    def test_delete_keeps_row_but_hides_it(self, test_db: Session):
+        """La fila se conserva con deleted_at y desaparece de las lecturas"""
+        task = crud.create_task(test_db, TaskCreate(title="Borrar", completed=True))
+        task_id = task.id
+
+        assert crud.delete_task(test_db, task_id) is True
+
+        assert crud.get_task(test_db, task_id) is None
+        assert crud.get_tasks(test_db) == []
+        assert crud.count_tasks(test_db, completed=True) == 0
+        assert crud.get_tasks_by_ids(test_db, [task_id]) == ([], [task_id])
+        assert test_db.query(Task).filter(Task.id == task_id).one().deleted_at is not None
+
+    def test_delete_twice_returns_false(self, test_db: Session):
+        """Una tarea ya eliminada no se puede volver a eliminar"""
+        task_id = crud.create_task(test_db, TaskCreate(title="Borrar")).id
+        crud.delete_task(test_db, task_id)
+
+        assert crud.delete_task(test_db, task_id) is False
+
+
+class TestPurger:
+    """Tests para la purga física y el vacuum incremental"""
+
+    def test_purges_only_after_grace_period(self, test_db: Session):
+        """Solo se borran físicamente las filas eliminadas antes del periodo de gracia"""
+        old_id = crud.create_task(test_db, TaskCreate(title="Vieja")).id
+        new_id = crud.create_task(test_db, TaskCreate(title="Nueva")).id
+        crud.delete_task(test_db, old_id)
+        crud.delete_task(test_db, new_id)
+        test_db.query(Task).filter(Task.id == old_id).update(
+            {Task.deleted_at: datetime.utcnow() - timedelta(days=2)}
+        )
+        test_db.commit()
+
+        purger = purge.Purger(
+            lambda: test_db, grace_seconds=86400, batch_size=1, duty_cycle=1.0, min_pause_seconds=0
+        )
+        purged = purger.run_once()
+
+        assert purged == 1
+        assert [task.id for task in test_db.query(Task)] == [new_id]
+
+    def test_incremental_vacuum_releases_pages(self, tmp_path):
+        """Con auto_vacuum=INCREMENTAL la purga devuelve las páginas libres"""
+        engine = create_engine(f"sqlite:///{tmp_path / 'purge.db'}")
+        with engine.begin() as connection:
+            connection.execute(text("PRAGMA auto_vacuum = INCREMENTAL"))
+        Base.metadata.create_all(bind=engine)
+        SessionLocal = sessionmaker(bind=engine)
+
+        db = SessionLocal()
+        for i in range(200):
+            db.add(Task(title=f"Tarea {i}", description="x" * 2000, deleted_at=datetime(2000, 1, 1)))
+        db.commit()
+        db.close()
+
+        db = SessionLocal()
+        assert purge.purge_batch(db, datetime.utcnow(), batch_size=500) == 200
+        free_pages = db.execute(text("PRAGMA freelist_count")).scalar()
+        db.close()
+        assert free_pages > 100
+
+        purger = purge.Purger(
+            SessionLocal, batch_size=50, vacuum_pages=10, duty_cycle=1.0, min_pause_seconds=0
+        )
+        purger.run_once()
+
+        # Cada paso libera `vacuum_pages` páginas, no una sola
+        assert purger.freelist_pages == 0
+        assert purger.vacuum_steps == -(-free_pages // 10)
+        engine.dispose()
+
+    def test_migration_enables_incremental_vacuum(self, tmp_path):
+        """Una base creada sin auto_vacuum pasa a INCREMENTAL con un VACUUM único"""
+        engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+        Base.metadata.create_all(bind=engine)
+        with engine.connect() as connection:
+            assert connection.execute(text("PRAGMA auto_vacuum")).scalar() == 0
+
+        run_migrations(engine)
+
+        with engine.connect() as connection:
+            assert connection.execute(text("PRAGMA auto_vacuum")).scalar() == 2
+        assert enable_incremental_vacuum(engine) is False
+        engine.dispose()
@@ -0,0 +1,164 @@
+"""
+Tests unitarios para el programador de recordatorios (reminders.py).
+"""
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import Session
+
+import crud
+import events
+import reminders
+from schemas import TaskCreate, TaskUpdate
+
+
+NOW = datetime(2025, 10, 30, 10, 0, 0)
+
+
+@pytest.fixture
+def sink():
+    return reminders.QueueSink()
+
+
+@pytest.fixture
+def scheduler(test_db: Session, sink):
+    """Programador con reloj fijo, conectado al hub de eventos"""
+    scheduler = reminders.ReminderScheduler(
+        lambda: test_db, sink, window_seconds=3600, clock=lambda: NOW
+    )
+    events.hub.add_listener(scheduler.on_event)
+    yield scheduler
+    events.hub.remove_listener(scheduler.on_event)
+
+
+def drain(sink):
+    items = []
+    while not sink.queue.empty():
+        items.append(sink.queue.get_nowait())
+    return items
+
+
+class TestReminderScheduler:
+    """Tests para la carga de ventanas y el disparo de recordatorios"""
+
+    def test_loads_only_pending_tasks_in_window(self, test_db: Session, scheduler):
+        """Solo entran al heap las tareas pendientes dentro de la ventana"""
+        crud.create_task(test_db, TaskCreate(title="Pronto", due_date=NOW + timedelta(minutes=10)))
+        crud.create_task(test_db, TaskCreate(title="Lejos", due_date=NOW + timedelta(days=2)))
+        crud.create_task(test_db, TaskCreate(
+            title="Hecha", due_date=NOW + timedelta(minutes=5), completed=True
+        ))
+
+        scheduler.load_window(NOW)
+
+        assert scheduler.stats()["tracked_tasks"] == 1
+
+    def test_fires_due_reminders_in_order(self, test_db: Session, scheduler, sink):
+        """Los recordatorios vencidos se envían en orden de vencimiento"""
+        late = crud.create_task(test_db, TaskCreate(title="B", due_date=NOW + timedelta(minutes=20)))
+        early = crud.create_task(test_db, TaskCreate(title="A", due_date=NOW + timedelta(minutes=10)))
+        expected = [early.id, late.id]
+        scheduler.load_window(NOW)
+
+        scheduler.run_pending(NOW + timedelta(minutes=30))
+
+        assert [r["task_id"] for r in drain(sink)] == expected
+        stats = scheduler.stats()
+        assert stats["fired"] == 2
+        assert stats["lag_max_ms"] == 20 * 60 * 1000
+
+    def test_incremental_updates_from_crud(self, test_db: Session, scheduler, sink):
+        """Crear, completar y mover tareas actualiza el heap sin recargar"""
+        scheduler.load_window(NOW)
+        moved = crud.create_task(test_db, TaskCreate(title="Mover", due_date=NOW + timedelta(minutes=5)))
+        done = crud.create_task(test_db, TaskCreate(title="Completar", due_date=NOW + timedelta(minutes=5)))
+
+        moved_id = moved.id
+
+        crud.update_task(test_db, moved_id, TaskUpdate(due_date=NOW + timedelta(minutes=15)))
+        crud.update_task(test_db, done.id, TaskUpdate(completed=True))
+
+        scheduler.run_pending(NOW + timedelta(minutes=10))
+        assert drain(sink) == []
+
+        scheduler.run_pending(NOW + timedelta(minutes=20))
+        assert [r["task_id"] for r in drain(sink)] == [moved_id]
+
+    def test_deleted_task_does_not_fire(self, test_db: Session, scheduler, sink):
+        """Eliminar una tarea cancela su recordatorio"""
+        task_id = crud.create_task(
+            test_db, TaskCreate(title="Borrar", due_date=NOW + timedelta(minutes=5))
+        ).id
+        scheduler.load_window(NOW)
+
+        crud.delete_task(test_db, task_id)
+        scheduler.run_pending(NOW + timedelta(minutes=10))
+
+        assert drain(sink) == []
+
+    def test_reload_picks_up_other_workers(self, test_db: Session, scheduler, sink):
+        """Releer la ventana incluye escrituras que no pasaron por el hub del proceso"""
+        fired_id = crud.create_task(test_db, TaskCreate(title="Antes", due_date=NOW + timedelta(minutes=5))).id
+        scheduler.load_window(NOW)
+        scheduler.run_pending(NOW + timedelta(minutes=10))
+        assert [r["task_id"] for r in drain(sink)] == [fired_id]
+
+        # Escrituras de otro worker: su hub no avisa a este programador
+        events.hub.remove_listener(scheduler.on_event)
+        other_id = crud.create_task(test_db, TaskCreate(title="Otro", due_date=NOW + timedelta(minutes=15))).id
+        events.hub.add_listener(scheduler.on_event)
+
+        scheduler.reload_window()
+        scheduler.run_pending(NOW + timedelta(minutes=30))
+
+        assert [r["task_id"] for r in drain(sink)] == [other_id]
+        assert scheduler.stats()["refreshes"] == 1
+
+    def test_writes_during_window_query_are_kept(self, test_db: Session, scheduler, sink, monkeypatch):
+        """Un evento que llega mientras se consulta la ventana se aplica después de las filas"""
+        query = scheduler._query
+        created = []
+
+        def query_with_concurrent_write(start, end):
+            rows = query(start, end)
+            # Se confirma después de la lectura: la consulta no la ve
+            created.append(crud.create_task(
+                test_db, TaskCreate(title=f"Durante {len(created)}", due_date=NOW + timedelta(minutes=5))
+            ).id)
+            return rows
+
+        monkeypatch.setattr(scheduler, "_query", query_with_concurrent_write)
+        scheduler.load_window(NOW)
+        assert scheduler.stats()["tracked_tasks"] == 1
+
+        scheduler.reload_window()
+        assert scheduler.stats()["tracked_tasks"] == 2
+
+        scheduler.run_pending(NOW + timedelta(minutes=10))
+        assert sorted(r["task_id"] for r in drain(sink)) == created
+
+    def test_thread_survives_failing_first_load(self, test_db: Session, sink, monkeypatch):
+        """Si la primera consulta falla el hilo sigue vivo y reintenta"""
+        monkeypatch.setattr(reminders, "RETRY_SECONDS", 0.01)
+        attempts = []
+
+        def session_factory():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise RuntimeError("base no disponible")
+            return test_db
+
+        scheduler = reminders.ReminderScheduler(
+            session_factory, sink, window_seconds=3600, clock=lambda: NOW, refresh_seconds=30
+        )
+        scheduler.start()
+        try:
+            deadline = time.monotonic() + 5
+            while scheduler._refreshed_at is None:
+                assert time.monotonic() < deadline
+                time.sleep(0.01)
+            assert scheduler._thread.is_alive()
+            assert len(attempts) >= 2
+        finally:
+            scheduler.stop()
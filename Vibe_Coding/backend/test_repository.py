@@ -0,0 +1,87 @@
+"""
+Tests para el repositorio de tareas en memoria (repository.py).
+Los tests de la API (test_api.py) corren además con ambos backends.
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+import config
+from crud import VersionConflict
+from repository import MemoryStore, MemoryTaskRepository, TaskRepository
+from main import app
+from schemas import DeleteOperation, TaskCreate, TaskUpdate, UpdateOperation
+
+
+@pytest.fixture
+def repo():
+    return MemoryTaskRepository(MemoryStore())
+
+
+class TestMemoryIndexes:
+    """Tests de los índices secundarios ordenados"""
+
+    def test_completed_index_follows_updates(self, repo):
+        """El índice por estado se actualiza en cada escritura y conserva el orden de ID"""
+        for i in range(4):
+            repo.create_task(TaskCreate(title=f"T{i}", completed=i % 2 == 0))
+        repo.update_task(2, TaskUpdate(completed=True))
+
+        assert [task.id for task in repo.get_tasks(completed=True)] == [1, 2, 3]
+        assert [task.id for task in repo.get_tasks(completed=False)] == [4]
+        assert repo.count_tasks(completed=True) == 3
+
+    def test_delete_clears_indexes(self, repo):
+        """Eliminar quita la tarea de todos los índices y de las facetas"""
+        repo.create_task(TaskCreate(title="Tarea", tags=["casa"]))
+        assert repo.delete_task(1) is True
+
+        assert repo.get_tag_counts() == []
+        assert all(len(index) == 0 for index in repo.store.indexes.values())
+
+
+class TestMemoryWrites:
+    """Tests de las escrituras en memoria"""
+
+    def test_version_conflict(self, repo):
+        """If-Match con una versión vieja se rechaza"""
+        repo.create_task(TaskCreate(title="Tarea"))
+        repo.update_task(1, TaskUpdate(title="Nueva"))
+
+        with pytest.raises(VersionConflict):
+            repo.update_task(1, TaskUpdate(title="Otra"), expected_versions=[1])
+        assert repo.get_task(1).version == 2
+
+    def test_atomic_batch_leaves_store_untouched(self, repo):
+        """Un lote atómico fallido no aplica ninguna operación"""
+        repo.create_task(TaskCreate(title="Tarea"))
+        results, committed = repo.apply_batch([
+            UpdateOperation(op="update", task_id=1, data=TaskUpdate(title="Cambiada")),
+            DeleteOperation(op="delete", task_id=99),
+        ])
+
+        assert committed is False
+        assert [result.status for result in results] == [424, 404]
+        assert repo.get_task(1).title == "Tarea"
+
+
+class TestRepositoryInterface:
+    """Tests de la interfaz común de los backends"""
+
+    def test_incomplete_backend_cannot_be_created(self):
+        """Un backend sin todas las operaciones falla al instanciarse, no al usarse"""
+        class Partial(TaskRepository):
+            def get_task(self, task_id):
+                return None
+
+        with pytest.raises(TypeError):
+            Partial()
+        assert MemoryTaskRepository(MemoryStore()).get_tasks_json() is None
+
+    def test_memory_backend_disables_reminders(self, monkeypatch):
+        """Con el backend en memoria no se consulta la ventana de recordatorios en SQLite"""
+        monkeypatch.setattr(config, "REMINDERS_ENABLED", True)
+        monkeypatch.setattr(config, "STORAGE_BACKEND", "memory")
+
+        with TestClient(app) as client:
+            assert client.app.state.reminders == []
+            assert client.get("/metrics").json()["reminders"] is None
@@ -0,0 +1,142 @@
+"""
+Tests para las tareas por usuario y el particionado en varios archivos SQLite.
+"""
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import cache
+import config
+import database
+import main
+import models
+import suggest
+from main import app
+from migrations import run_migrations
+
+
+@pytest.fixture
+def shards(tmp_path, monkeypatch):
+    """Tres shards en archivos temporales"""
+    router = database.ShardRouter(
+        database.shard_urls(3, f"sqlite:///{tmp_path}/shard{{shard}}.db")
+    )
+    for shard_engine in router.engines:
+        models.Base.metadata.create_all(bind=shard_engine)
+        run_migrations(shard_engine)
+    monkeypatch.setattr(database, "shards", router)
+    yield router
+    router.dispose()
+
+
+@pytest.fixture
+def sharded_client(shards, monkeypatch):
+    """Cliente con el repositorio particionado por usuario"""
+    monkeypatch.setattr(config, "ADMIN_TOKEN", "secreto")
+    app.dependency_overrides[main.get_repository] = main.get_sharded_repository
+    cache.response_cache.clear()
+    suggest.index.reset()
+    with TestClient(app) as test_client:
+        yield test_client
+    app.dependency_overrides.clear()
+
+
+def users_in_distinct_shards(router, count):
+    """Primeros `count` user_id que caen en shards distintos"""
+    found = {}
+    for user_id in range(1, 1000):
+        found.setdefault(router.shard_for(user_id), user_id)
+        if len(found) == count:
+            return list(found.values())
+    raise AssertionError("No hay suficientes usuarios distintos")
+
+
+class TestShardRouter:
+    """Tests del reparto de usuarios"""
+
+    def test_routing_is_stable(self, shards):
+        """El mismo usuario siempre cae en el mismo shard"""
+        assert [shards.shard_for(7) for _ in range(3)] == [shards.shard_for(7)] * 3
+        assert {shards.shard_for(user_id) for user_id in range(1, 100)} == {0, 1, 2}
+
+    def test_shard_urls(self):
+        """La plantilla genera una URL por shard"""
+        assert database.shard_urls(2, "sqlite:///./q{shard}.db") == [
+            "sqlite:///./q0.db", "sqlite:///./q1.db"
+        ]
+
+
+class TestShardedApi:
+    """Tests de la API con particionado"""
+
+    def test_user_header_required(self, sharded_client):
+        """Sin X-User-Id no se sabe qué shard usar"""
+        assert sharded_client.get("/tasks").status_code == 400
+
+    def test_tasks_land_in_user_shard(self, sharded_client, shards):
+        """Cada usuario escribe solo en su archivo"""
+        first, second = users_in_distinct_shards(shards, 2)
+        sharded_client.post("/tasks", json={"title": "Uno"}, headers={"X-User-Id": str(first)})
+        sharded_client.post("/tasks", json={"title": "Dos"}, headers={"X-User-Id": str(second)})
+
+        for user_id, title in [(first, "Uno"), (second, "Dos")]:
+            session = shards.sessionmaker_for(user_id)()
+            try:
+                assert [task.title for task in session.query(models.Task)] == [title]
+            finally:
+                session.close()
+        listed = sharded_client.get("/tasks", headers={"X-User-Id": str(first)}).json()
+        assert [task["title"] for task in listed["tasks"]] == ["Uno"]
+
+    def test_admin_listing_merges_shards(self, sharded_client, shards):
+        """El listado de admin recorre todos los shards en orden de (ID, shard)"""
+        users = users_in_distinct_shards(shards, 3)
+        for user_id in users:
+            for i in range(2):
+                sharded_client.post(
+                    "/tasks", json={"title": f"{user_id}-{i}"}, headers={"X-User-Id": str(user_id)}
+                )
+
+        response = sharded_client.get(
+            "/admin/tasks", params={"batch_size": 1}, headers={"X-Admin-Token": "secreto"}
+        )
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert response.headers["content-type"] == "application/x-ndjson"
+        assert [(row["id"], row["shard"]) for row in rows] == sorted(
+            (task_id, shards.shard_for(user_id)) for user_id in users for task_id in (1, 2)
+        )
+        assert {row["user_id"] for row in rows} == set(users)
+
+    def test_events_are_filtered_by_user(self, sharded_client, shards):
+        """Cada usuario recibe solo sus eventos, con user_id y shard (los IDs se repiten)"""
+        first, second = users_in_distinct_shards(shards, 2)
+        with sharded_client.websocket_connect("/tasks/ws", headers={"X-User-Id": str(first)}) as websocket:
+            sharded_client.post("/tasks", json={"title": "Ajena"}, headers={"X-User-Id": str(second)})
+            sharded_client.post("/tasks", json={"title": "Propia"}, headers={"X-User-Id": str(first)})
+            sharded_client.delete("/tasks/1", headers={"X-User-Id": str(first)})
+
+            created = websocket.receive_json()
+            deleted = websocket.receive_json()
+
+        assert created["task"]["title"] == "Propia"
+        assert (created["task_id"], created["user_id"], created["shard"]) == (1, first, shards.shard_for(first))
+        assert (deleted["type"], deleted["user_id"], deleted["shard"]) == ("deleted", first, shards.shard_for(first))
+
+    def test_background_jobs_run_per_shard(self, shards, tmp_path, monkeypatch):
+        """Recordatorios, archivado, purga y backups corren una vez por shard"""
+        monkeypatch.setattr(config, "REMINDERS_ENABLED", True)
+        monkeypatch.setattr(config, "ARCHIVE_AFTER_DAYS", 30)
+        monkeypatch.setattr(config, "PURGE_ENABLED", True)
+        monkeypatch.setattr(config, "BACKUP_DIR", str(tmp_path / "backups"))
+        with TestClient(app) as test_client:
+            state = test_client.app.state
+            assert [scheduler.shard for scheduler in state.reminders] == [0, 1, 2]
+            assert [archiver.session_factory for archiver in state.archiver] == shards.sessionmakers
+            assert [purger.session_factory for purger in state.purger] == shards.sessionmakers
+            assert len(test_client.get("/metrics").json()["reminders"]) == 3
+
+            report = state.backups.run(compress=False)
+
+        assert [r.status for r in report.reports] == ["done"] * 3
+        assert sorted(p.name for p in (tmp_path / "backups").iterdir()) == ["shard0", "shard1", "shard2"]
@@ -0,0 +1,64 @@
+"""
+Tests unitarios para la coalescencia de peticiones (singleflight.py).
+"""
+import threading
+import time
+
+import pytest
+
+import singleflight
+
+
+class TestSingleFlight:
+    """Tests para la ejecución compartida por clave"""
+
+    def test_concurrent_calls_share_one_execution(self):
+        """Las llamadas concurrentes con la misma clave ejecutan una sola vez"""
+        group = singleflight.SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            release.wait(5)
+            return b"payload"
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(group.do("k", slow)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        deadline = time.monotonic() + 5
+        while group.stats()["coalesced"] < 4 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+        assert all(value == b"payload" for value, _ in results)
+        assert group.stats() == {"executions": 1, "coalesced": 4, "in_flight": 0}
+
+    def test_sequential_calls_execute_again(self):
+        """Sin concurrencia cada llamada ejecuta la función"""
+        group = singleflight.SingleFlight()
+
+        group.do("k", lambda: 1)
+        value, shared = group.do("k", lambda: 2)
+
+        assert value == 2
+        assert shared is False
+
+    def test_error_propagates_and_clears_key(self):
+        """Un error se propaga y la clave queda libre"""
+        group = singleflight.SingleFlight()
+
+        def fail():
+            raise RuntimeError("boom")
+
+        with pytest.raises(RuntimeError):
+            group.do("k", fail)
+        assert group.do("k", lambda: "ok") == ("ok", False)
@@ -0,0 +1,179 @@
+"""
+Tests para las subtareas: árbol con una consulta y contadores acumulados.
+"""
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.orm import Session, sessionmaker
+
+import archive
+import crud
+import writebehind
+from models import Task
+from schemas import TaskCreate, TaskListResponse, TaskUpdate
+
+
+def create(client: TestClient, title: str, parent_id=None, completed=False) -> int:
+    response = client.post("/tasks", json={"title": title, "parent_id": parent_id, "completed": completed})
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+def counts(client: TestClient, task_id: int) -> tuple[int, int]:
+    task = client.get(f"/tasks/{task_id}").json()
+    return task["subtask_count"], task["subtasks_completed"]
+
+
+class TestSubtaskApi:
+    """Tests de los endpoints con subtareas"""
+
+    def test_counts_roll_up_to_root(self, client: TestClient):
+        """Crear, completar y eliminar subtareas actualiza a todos los ancestros"""
+        root = create(client, "Proyecto")
+        child = create(client, "Fase", parent_id=root)
+        leaf = create(client, "Paso", parent_id=child)
+        create(client, "Otro paso", parent_id=child, completed=True)
+
+        assert counts(client, root) == (3, 1)
+        assert counts(client, child) == (2, 1)
+
+        client.patch(f"/tasks/{leaf}", json={"completed": True})
+        assert counts(client, root) == (3, 2)
+
+        client.put(f"/tasks/{child}", json={"title": "Fase", "completed": True})
+        assert counts(client, root) == (3, 3)
+        assert client.get(f"/tasks/{child}").json()["parent_id"] == root
+
+        assert client.delete(f"/tasks/{leaf}").status_code == 204
+        assert counts(client, root) == (2, 2)
+
+    def test_delete_cascades(self, client: TestClient):
+        """Eliminar una tarea elimina todo su subárbol"""
+        root = create(client, "Proyecto")
+        child = create(client, "Fase", parent_id=root)
+        leaf = create(client, "Paso", parent_id=child)
+
+        assert client.delete(f"/tasks/{child}").status_code == 204
+
+        assert client.get(f"/tasks/{leaf}").status_code == 404
+        assert counts(client, root) == (0, 0)
+        assert client.get("/tasks").json()["total"] == 1
+
+    def test_tree_with_depth(self, client: TestClient):
+        """?depth=N anida las subtareas hasta N niveles"""
+        root = create(client, "Proyecto")
+        first = create(client, "Fase 1", parent_id=root)
+        second = create(client, "Fase 2", parent_id=root)
+        leaf = create(client, "Paso", parent_id=first)
+
+        response = client.get(f"/tasks/{root}", params={"depth": 2})
+        assert response.status_code == 200
+        assert response.headers["etag"] == '"1"'
+        tree = response.json()
+        assert [node["id"] for node in tree["subtasks"]] == [first, second]
+        assert [node["id"] for node in tree["subtasks"][0]["subtasks"]] == [leaf]
+
+        shallow = client.get(f"/tasks/{root}", params={"depth": 1}).json()
+        assert shallow["subtasks"][0]["subtasks"] == []
+        assert client.get(f"/tasks/{root}", params={"depth": 0}).json()["subtasks"] == []
+        assert "subtasks" not in client.get(f"/tasks/{root}").json()
+        assert client.get("/tasks/999", params={"depth": 1}).status_code == 404
+
+    def test_unknown_parent(self, client: TestClient):
+        """Un parent_id inexistente o de otro usuario da 422"""
+        assert client.post("/tasks", json={"title": "Huérfana", "parent_id": 999}).status_code == 422
+
+        other = client.post("/tasks", json={"title": "Ajena"}, headers={"X-User-Id": "2"}).json()["id"]
+        response = client.post(
+            "/tasks", json={"title": "Mía", "parent_id": other}, headers={"X-User-Id": "1"}
+        )
+        assert response.status_code == 422
+
+    def test_batch(self, client: TestClient):
+        """Los lotes validan el padre y eliminan en cascada"""
+        root = create(client, "Proyecto")
+        child = create(client, "Fase", parent_id=root)
+
+        response = client.post("/batch", json={"mode": "best_effort", "operations": [
+            {"op": "create", "data": {"title": "Paso", "parent_id": child}},
+            {"op": "create", "data": {"title": "Huérfana", "parent_id": 999}},
+        ]})
+        assert [result["status"] for result in response.json()["results"]] == [201, 422]
+        assert counts(client, root) == (2, 0)
+
+        client.post("/batch", json={"operations": [{"op": "delete", "task_id": child}]})
+        assert counts(client, root) == (0, 0)
+        assert client.get("/tasks").json()["total"] == 1
+
+    def test_batch_delete_cascades_to_tasks_created_in_batch(self, client: TestClient):
+        """Eliminar un padre alcanza a las subtareas creadas antes en el mismo lote"""
+        root = create(client, "Proyecto")
+
+        response = client.post("/batch", json={"operations": [
+            {"op": "create", "data": {"title": "Paso", "parent_id": root}},
+            {"op": "delete", "task_id": root},
+        ]})
+
+        assert response.json()["committed"] is True
+        assert client.get("/tasks").json()["tasks"] == []
+
+
+class TestSubtaskStorage:
+    """Tests de la consulta del árbol y los triggers de SQLite"""
+
+    def test_tree_is_one_query(self, test_db: Session):
+        """El subárbol completo se lee con una sola consulta (más la de etiquetas)"""
+        root_id = parent_id = crud.create_task(test_db, TaskCreate(title="Proyecto")).id
+        for level in range(5):
+            parent_id = crud.create_task(test_db, TaskCreate(title=f"Nivel {level}", parent_id=parent_id)).id
+        statements = []
+        engine = test_db.get_bind()
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            tree = crud.get_task_tree(test_db, root_id, depth=10)
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+
+        assert len(statements) == 2
+        assert statements[0].startswith("WITH RECURSIVE")
+        assert "FROM task_tags" in statements[1]
+        assert [task.id for task in tree] == list(range(root_id, root_id + 6))
+
+    def test_write_behind_flush_updates_counts(self, test_db: Session, monkeypatch):
+        """El UPDATE masivo del write-behind también actualiza los contadores"""
+        factory = sessionmaker(autocommit=False, autoflush=False, bind=test_db.get_bind())
+        buffer = writebehind.CompletionBuffer(factory, enabled=True)
+        monkeypatch.setattr(writebehind, "buffer", buffer)
+        root = crud.create_task(test_db, TaskCreate(title="Proyecto"))
+        child = crud.create_task(test_db, TaskCreate(title="Paso", parent_id=root.id))
+
+        buffer.record(child.id, True)
+        buffer.flush()
+
+        test_db.expire_all()
+        assert (root.subtask_count, root.subtasks_completed) == (1, 1)
+
+    def test_archive_waits_for_subtasks(self, test_db: Session):
+        """Una tarea con subtareas visibles no se archiva; la subtarea sí"""
+        root = crud.create_task(test_db, TaskCreate(title="Proyecto", completed=True))
+        child = crud.create_task(test_db, TaskCreate(title="Paso", completed=True, parent_id=root.id))
+        for task in (root, child):
+            task.completed_at = datetime.utcnow() - timedelta(days=40)
+        test_db.commit()
+
+        assert archive.archive_completed_tasks(test_db, older_than_days=30, batch_size=1) == 2
+        assert test_db.query(Task).count() == 0
+
+    def test_json_list_matches_pydantic(self, test_db: Session):
+        """El listado JSON de SQLite incluye los campos de subtareas"""
+        root = crud.create_task(test_db, TaskCreate(title="Proyecto"))
+        crud.create_task(test_db, TaskCreate(title="Paso", completed=True, parent_id=root.id))
+        crud.update_task(test_db, root.id, TaskUpdate(title="Proyecto 2"))
+
+        expected = TaskListResponse(total=2, tasks=crud.get_tasks(test_db)).model_dump_json()
+        assert crud.get_tasks_json(test_db) == expected
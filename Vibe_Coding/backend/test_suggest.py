@@ -0,0 +1,133 @@
+"""
+Tests para el autocompletado por prefijo (suggest.py).
+"""
+import pytest
+
+import suggest
+from repository import SqlTaskRepository
+from crud import create_task
+from schemas import TaskCreate
+
+
+class TestNormalize:
+    """Tests para la normalización de títulos"""
+
+    def test_folds_accents_and_case(self):
+        """Quita acentos, pasa a minúsculas y colapsa espacios"""
+        assert suggest.normalize("  Reunión   ÁREA Niño ") == "reunion area nino"
+
+    def test_index_keys_start_at_each_word(self):
+        """Cada palabra inicia una clave"""
+        assert suggest.index_keys("Comprar leche fresca", max_words=2) == [
+            "comprar leche fresca", "leche fresca"
+        ]
+
+
+class TestTitleIndex:
+    """Tests para el índice en memoria"""
+
+    @pytest.fixture
+    def index(self, test_db):
+        for title in ["Comprar leche", "Llamar a mamá", "Comprar pan", "Revisar código"]:
+            create_task(test_db, TaskCreate(title=title))
+        index = suggest.TitleIndex()
+        index.ensure_built(SqlTaskRepository(test_db))
+        return index
+
+    def test_prefix_search(self, index):
+        """Coincide por prefijo, sin acentos y en orden alfabético"""
+        assert [title for _, title in index.search("compr", 10)] == ["Comprar leche", "Comprar pan"]
+        assert [title for _, title in index.search("CODI", 10)] == ["Revisar código"]
+        assert index.search("compr", 1) == [(1, "Comprar leche")]
+
+    def test_events_update_index(self, index):
+        """Los eventos de escritura mantienen el índice al día"""
+        class Event:
+            def __init__(self, type, task_id, task=None):
+                self.type, self.task_id, self.task = type, task_id, task
+
+        index.on_event(Event("created", 10, {"title": "Comprar café"}))
+        index.on_event(Event("updated", 1, {"title": "Pagar luz"}))
+        index.on_event(Event("deleted", 3))
+
+        assert [title for _, title in index.search("comprar", 10)] == ["Comprar café"]
+        assert index.search("pagar", 10) == [(1, "Pagar luz")]
+
+    def test_expired_index_is_rebuilt(self, test_db):
+        """Con edad máxima el índice se reconstruye y ve escrituras sin evento"""
+        index = suggest.TitleIndex(max_age_seconds=30)
+        repo = SqlTaskRepository(test_db)
+        assert index.ensure_built(repo) is True
+
+        # Escritura de otro worker: este índice no recibe su evento
+        create_task(test_db, TaskCreate(title="Comprar leche"))
+        index.ensure_built(repo)
+        assert index.search("compr", 10) == []
+
+        index.built_at -= 31
+        index.ensure_built(repo)
+        assert [title for _, title in index.search("compr", 10)] == ["Comprar leche"]
+        assert index.stats()["rebuilds"] == 1
+
+    def test_over_budget_disables_index(self, test_db):
+        """Si supera el presupuesto de memoria el índice se desactiva"""
+        create_task(test_db, TaskCreate(title="Tarea larga"))
+        index = suggest.TitleIndex(max_bytes=10)
+
+        assert index.ensure_built(SqlTaskRepository(test_db)) is False
+        assert index.stats()["over_budget"] is True
+
+
+class TestSuggestEndpoint:
+    """Tests del endpoint GET /tasks/suggest"""
+
+    def test_suggest_follows_writes(self, client):
+        """Las sugerencias reflejan altas, cambios y bajas"""
+        first = client.post("/tasks", json={"title": "Preparar presentación"}).json()
+        client.post("/tasks", json={"title": "Pagar alquiler"})
+
+        response = client.get("/tasks/suggest?prefix=pre")
+        assert response.status_code == 200
+        assert response.json() == {
+            "prefix": "pre",
+            "suggestions": [{"id": first["id"], "title": "Preparar presentación"}],
+        }
+
+        client.patch(f"/tasks/{first['id']}", json={"title": "Enviar informe"})
+        client.delete("/tasks/2")
+        assert client.get("/tasks/suggest?prefix=p").json()["suggestions"] == []
+        assert client.get("/tasks/suggest?prefix=inf").json()["suggestions"][0]["id"] == first["id"]
+
+        stats = client.get("/metrics").json()["suggest"]
+        assert stats["lookups"] == 3
+        assert stats["hit_rate"] == 1.0
+
+    def test_fallback_when_over_budget(self, client, monkeypatch):
+        """Sin índice disponible se consulta la base"""
+        monkeypatch.setattr(suggest.index, "max_bytes", 1)
+        client.post("/tasks", json={"title": "Preparar informe"})
+
+        response = client.get("/tasks/suggest?prefix=prep")
+
+        assert [item["title"] for item in response.json()["suggestions"]] == ["Preparar informe"]
+        assert client.get("/metrics").json()["suggest"]["fallbacks"] == 1
+
+    @pytest.mark.parametrize("backend", ["sql", "memory"])
+    def test_repository_search_matches_index(self, backend, request):
+        """La búsqueda del repositorio ignora acentos, coincide por palabra y no usa comodines"""
+        client = request.getfixturevalue(f"{backend}_client")
+        headers = {"X-User-Id": "1"}
+        for title in ("Revisión de código", "Pagar alquiler", "Subir 100% del plan", "Plan_b listo", "Planb"):
+            client.post("/tasks", json={"title": title}, headers=headers)
+
+        def search(prefix):
+            # Con X-User-Id la búsqueda va al repositorio, no al índice global
+            response = client.get("/tasks/suggest", params={"prefix": prefix}, headers=headers)
+            return [item["title"] for item in response.json()["suggestions"]]
+
+        assert search("REVISION") == ["Revisión de código"]
+        assert search("codi") == ["Revisión de código"]
+        assert search("quiler") == []
+        assert search("100%") == ["Subir 100% del plan"]
+        assert search("plan_") == ["Plan_b listo"]
+        assert search("%") == []
@@ -0,0 +1,100 @@
+"""
+Tests para el almacenamiento de fechas (timestamps.py) y su migración.
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import Column, Integer, MetaData, Table, create_engine, select, text
+
+import crud
+from migrations import convert_timestamps
+from timestamps import EpochMicros, from_epoch_us, to_epoch_us
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite:///:memory:")
+    yield engine
+    engine.dispose()
+
+
+class TestEpochMicros:
+    """Tests del tipo de columna entero"""
+
+    def test_conversion_is_exact(self):
+        """Ida y vuelta sin perder microsegundos, también antes de 1970"""
+        for value in [datetime(2025, 3, 1, 12, 30, 15, 123456), datetime(1969, 12, 31, 23, 59, 59, 1)]:
+            assert from_epoch_us(to_epoch_us(value)) == value
+        assert to_epoch_us(datetime(1970, 1, 1, 0, 0, 1)) == 1_000_000
+
+    def test_aware_values_compare_in_utc(self, engine):
+        """Una fecha con zona se guarda y compara como su instante UTC"""
+        table = Table("t", MetaData(), Column("id", Integer, primary_key=True), Column("at", EpochMicros))
+        table.metadata.create_all(engine)
+        madrid = timezone(timedelta(hours=2))
+        with engine.begin() as connection:
+            connection.execute(table.insert(), [
+                {"id": 1, "at": datetime(2025, 1, 1, 10, 0, tzinfo=madrid)},
+                {"id": 2, "at": datetime(2025, 1, 1, 9, 0)},
+            ])
+            ordered = connection.execute(select(table.c.id, table.c.at).order_by(table.c.at)).all()
+            stored = connection.execute(text("SELECT typeof(at) FROM t")).scalars().all()
+
+        assert ordered == [(1, datetime(2025, 1, 1, 8, 0)), (2, datetime(2025, 1, 1, 9, 0))]
+        assert stored == ["integer", "integer"]
+
+    def test_json_matches_pydantic_format(self, engine):
+        """El JSON armado en SQLite usa el mismo formato ISO que Pydantic"""
+        table = Table("t", MetaData(), Column("id", Integer, primary_key=True), Column("at", EpochMicros))
+        table.metadata.create_all(engine)
+        values = [datetime(2025, 1, 1, 10, 0), datetime(2025, 1, 1, 10, 0, 0, 5000), datetime(1969, 7, 20, 20, 17, 40, 1)]
+        with engine.begin() as connection:
+            connection.execute(table.insert(), [{"id": i, "at": at} for i, at in enumerate(values)])
+            rendered = connection.execute(
+                select(crud._json_datetime(table.c.at)).order_by(table.c.id)
+            ).scalars().all()
+
+        assert rendered == [value.isoformat() for value in values]
+
+
+class TestTimestampMigration:
+    """Tests de la conversión de datos existentes"""
+
+    def test_round_trip_between_formats(self, engine):
+        """texto -> entero -> texto deja los valores como estaban"""
+        with engine.begin() as connection:
+            connection.execute(text(
+                "CREATE TABLE tasks (id INTEGER PRIMARY KEY, due_date DATETIME, created_at DATETIME)"
+            ))
+            connection.execute(text(
+                "INSERT INTO tasks VALUES (1, '2025-03-01 12:30:15.123456', '2025-01-01 00:00:00.000000'), "
+                "(2, NULL, '2024-12-31 23:59:59')"
+            ))
+            original = connection.execute(text("SELECT * FROM tasks ORDER BY id")).all()
+
+            assert convert_timestamps(connection, "epoch_us") == 3
+            assert convert_timestamps(connection, "epoch_us") == 0
+            epoch = connection.execute(text("SELECT due_date, created_at FROM tasks ORDER BY id")).all()
+            assert epoch[0] == (
+                to_epoch_us(datetime(2025, 3, 1, 12, 30, 15, 123456)),
+                to_epoch_us(datetime(2025, 1, 1)),
+            )
+            assert epoch[1][1] == to_epoch_us(datetime(2024, 12, 31, 23, 59, 59))
+
+            convert_timestamps(connection, "text")
+            restored = connection.execute(text("SELECT * FROM tasks ORDER BY id")).all()
+
+        assert restored[0] == original[0]
+        assert restored[1] == (2, None, "2024-12-31 23:59:59.000000")
+
+
+class TestTimezoneInput:
+    """Tests de fechas con zona horaria en la API"""
+
+    def test_due_date_is_stored_in_utc(self, client):
+        """Una fecha con offset se guarda como UTC y se filtra en UTC"""
+        response = client.post("/tasks", json={"title": "Tarea", "due_date": "2025-01-01T10:00:00+02:00"})
+        assert response.json()["due_date"] == "2025-01-01T08:00:00"
+
+        listed = client.get("/tasks").json()["tasks"]
+        assert listed[0]["due_date"] == "2025-01-01T08:00:00"
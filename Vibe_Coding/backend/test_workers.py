@@ -0,0 +1,96 @@
+"""
+Tests para el perfil multi-proceso (workers.py y la generación compartida).
+"""
+import os
+import signal
+
+import cache
+import workers
+
+
+def write_cgroup(root, relative, content):
+    path = root / relative
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content)
+
+
+class TestWorkerCount:
+    """Tests del cálculo de workers a partir de la cuota de CPU"""
+
+    def test_cgroup_v2_quota(self, tmp_path):
+        """cpu.max con cuota se convierte a CPUs"""
+        write_cgroup(tmp_path, "cpu.max", "150000 100000\n")
+        assert workers.cpu_quota(str(tmp_path)) == 1.5
+
+    def test_cgroup_v2_unlimited(self, tmp_path):
+        """cpu.max en 'max' significa sin límite"""
+        write_cgroup(tmp_path, "cpu.max", "max 100000\n")
+        assert workers.cpu_quota(str(tmp_path)) is None
+
+    def test_cgroup_v1_quota(self, tmp_path):
+        """En cgroups v1 se usan cfs_quota_us y cfs_period_us (-1 = sin límite)"""
+        write_cgroup(tmp_path, "cpu/cpu.cfs_quota_us", "200000")
+        write_cgroup(tmp_path, "cpu/cpu.cfs_period_us", "100000")
+        assert workers.cpu_quota(str(tmp_path)) == 2.0
+
+        write_cgroup(tmp_path, "cpu/cpu.cfs_quota_us", "-1")
+        assert workers.cpu_quota(str(tmp_path)) is None
+
+    def test_count_rounds_quota_up_within_cpus(self, tmp_path, monkeypatch):
+        """Una cuota fraccionaria redondea hacia arriba sin pasar las CPUs visibles"""
+        monkeypatch.setattr(workers, "available_cpus", lambda: 4)
+        write_cgroup(tmp_path, "cpu.max", "150000 100000")
+        assert workers.worker_count({}, str(tmp_path)) == 2
+
+        write_cgroup(tmp_path, "cpu.max", "800000 100000")
+        assert workers.worker_count({}, str(tmp_path)) == 4
+
+    def test_explicit_and_memory_backend(self, tmp_path):
+        """WEB_CONCURRENCY manda, salvo con el backend en memoria"""
+        assert workers.worker_count({"QUICKTASK_WEB_CONCURRENCY": "3"}, str(tmp_path)) == 3
+        assert workers.worker_count({"WEB_CONCURRENCY": "0"}, str(tmp_path)) == 1
+        assert workers.worker_count(
+            {"QUICKTASK_WEB_CONCURRENCY": "3", "QUICKTASK_STORAGE_BACKEND": "memory"}, str(tmp_path)
+        ) == 1
+
+
+class TestProcessCoordination:
+    """Tests de la coordinación entre workers"""
+
+    def test_jobs_lock_is_exclusive(self, tmp_path):
+        """Solo un dueño del lock a la vez; al cerrarlo queda libre"""
+        path = str(tmp_path / "locks" / "jobs.lock")
+        first = workers.acquire_jobs_lock(path)
+        assert first is not None
+        assert workers.acquire_jobs_lock(path) is None
+
+        first.close()
+        second = workers.acquire_jobs_lock(path)
+        assert second is not None
+        second.close()
+
+    def test_shared_generation_crosses_fork(self):
+        """Una escritura en un proceso hijo se ve en el padre"""
+        generation = cache.WriteGeneration(shared=True)
+        generation.bump()
+
+        pid = os.fork()
+        if pid == 0:
+            generation.bump()
+            os._exit(0)
+        os.waitpid(pid, 0)
+        assert generation.value == 2
+
+    def test_watchdog_recycles_once(self):
+        """Al superar la RSS se pide un único reinicio ordenado"""
+        rss = [100]
+        signals = []
+        watchdog = workers.MemoryWatchdog(
+            150, rss=lambda: rss[0], kill=lambda pid, sig: signals.append((pid, sig))
+        )
+
+        assert watchdog.check() is False
+        rss[0] = 200
+        assert watchdog.check() is True
+        assert watchdog.check() is False
+        assert signals == [(os.getpid(), signal.SIGTERM)]
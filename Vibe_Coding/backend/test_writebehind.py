@@ -0,0 +1,148 @@
+"""
+Tests para el buffer write-behind de estado completado (writebehind.py).
+"""
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+import writebehind
+from crud import create_task, get_task
+from schemas import TaskCreate
+
+
+@pytest.fixture
+def buffer(test_db, monkeypatch):
+    """Buffer activo sobre la base de test, sin hilo (se vuelca a mano)"""
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=test_db.get_bind())
+    completion_buffer = writebehind.CompletionBuffer(factory, enabled=True, max_entries=3)
+    monkeypatch.setattr(writebehind, "buffer", completion_buffer)
+    return completion_buffer
+
+
+class TestCompletionBuffer:
+    """Tests del buffer en memoria"""
+
+    def test_last_writer_wins(self, test_db, buffer):
+        """Varios cambios de la misma tarea se reducen a una escritura"""
+        task = create_task(test_db, TaskCreate(title="Tarea"))
+        buffer.record(task.id, True)
+        buffer.record(task.id, False)
+        buffer.record(task.id, True)
+
+        assert buffer.get(task.id) is True
+        assert buffer.flush() == 1
+        test_db.expire_all()
+        stored = get_task(test_db, task.id)
+        assert stored.completed is True
+        assert stored.completed_at is not None
+        assert stored.version == 2
+        assert buffer.stats()["coalesced"] == 2
+
+    def test_flush_skips_unchanged_and_deleted(self, test_db, buffer):
+        """Solo se escriben las filas cuyo estado cambia"""
+        done = create_task(test_db, TaskCreate(title="Hecha", completed=True))
+        pending = create_task(test_db, TaskCreate(title="Pendiente"))
+        buffer.record(done.id, True)
+        buffer.record(pending.id, True)
+        buffer.record(999, True)
+
+        assert buffer.flush() == 1
+        assert buffer.pending == 0
+
+    def test_full_buffer_flushes_in_caller(self, test_db, buffer):
+        """Con el buffer lleno, la siguiente entrada nueva fuerza un volcado"""
+        tasks = [create_task(test_db, TaskCreate(title=f"T{i}")) for i in range(4)]
+        for task in tasks:
+            buffer.record(task.id, True)
+
+        assert buffer.pending == 1
+        assert buffer.forced_flushes == 1
+        assert buffer.flushed_rows == 3
+
+    def test_stop_flushes_pending(self, test_db, buffer):
+        """Al detenerse vuelca lo pendiente"""
+        task = create_task(test_db, TaskCreate(title="Tarea"))
+        buffer.start()
+        buffer.record(task.id, True)
+        buffer.stop()
+
+        test_db.expire_all()
+        assert buffer.pending == 0
+        assert get_task(test_db, task.id).completed is True
+
+
+class TestWriteBehindApi:
+    """Tests de la integración con la API"""
+
+    @pytest.fixture
+    def client(self, sql_client):
+        """El buffer escribe con sesiones SQL propias: solo backend SQL"""
+        return sql_client
+
+    def test_patch_is_buffered_and_visible(self, client, buffer):
+        """El PATCH de solo `completed` se guarda en el buffer y se lee de inmediato"""
+        task_id = client.post("/tasks", json={"title": "Tarea"}).json()["id"]
+
+        response = client.patch(f"/tasks/{task_id}", json={"completed": True})
+        assert response.status_code == 200
+        assert response.json()["completed"] is True
+        # Versión y ETag que tendrá la tarea al volcarse el buffer
+        assert response.json()["version"] == 2
+        assert response.headers["etag"] == '"2"'
+        assert buffer.pending == 1
+
+        buffered = client.get(f"/tasks/{task_id}")
+        assert buffered.json()["completed"] is True
+        assert buffered.json()["version"] == 2
+        assert buffered.headers["etag"] == '"2"'
+        # El listado vacía el buffer antes de leer
+        listed = client.get("/tasks", params={"completed": True}).json()
+        assert [task["id"] for task in listed["tasks"]] == [task_id]
+        assert listed["tasks"][0]["version"] == 2
+        assert buffer.pending == 0
+
+    def test_buffered_etag_matches_after_flush(self, client, buffer):
+        """El ETag de la respuesta en buffer sirve para un If-Match posterior"""
+        task_id = client.post("/tasks", json={"title": "Tarea"}).json()["id"]
+        client.patch(f"/tasks/{task_id}", json={"completed": True})
+        # Volver al estado guardado no cambia la versión al volcarse
+        response = client.patch(f"/tasks/{task_id}", json={"completed": False})
+        assert response.headers["etag"] == '"1"'
+
+        updated = client.patch(
+            f"/tasks/{task_id}", json={"title": "Otra"}, headers={"If-Match": response.headers["etag"]}
+        )
+        assert updated.status_code == 200
+        assert updated.json()["version"] == 2
+
+    def test_other_writes_keep_order(self, client, buffer):
+        """Una escritura directa posterior gana sobre el cambio en buffer"""
+        task_id = client.post("/tasks", json={"title": "Tarea"}).json()["id"]
+        client.patch(f"/tasks/{task_id}", json={"completed": True})
+
+        response = client.patch(f"/tasks/{task_id}", json={"completed": False, "title": "Otra"})
+        assert response.json()["completed"] is False
+        assert buffer.pending == 0
+        assert client.get(f"/tasks/{task_id}").json()["completed"] is False
+
+    def test_missing_task_not_buffered(self, client, buffer):
+        """Un PATCH a una tarea inexistente sigue retornando 404"""
+        assert client.patch("/tasks/999", json={"completed": True}).status_code == 404
+        assert buffer.pending == 0
+
+    def test_disabled_by_default(self, client):
+        """Sin activarlo, el PATCH escribe directamente"""
+        task_id = client.post("/tasks", json={"title": "Tarea"}).json()["id"]
+        response = client.patch(f"/tasks/{task_id}", json={"completed": True})
+
+        assert response.headers["etag"] == '"2"'
+        assert writebehind.buffer.pending == 0
+
+    def test_memory_backend_skips_buffer(self, memory_client, buffer):
+        """Con el backend en memoria el PATCH escribe en el store, no en el buffer"""
+        task_id = memory_client.post("/tasks", json={"title": "Tarea"}).json()["id"]
+        response = memory_client.patch(f"/tasks/{task_id}", json={"completed": True})
+
+        assert response.json()["version"] == 2
+        assert buffer.pending == 0
+        listed = memory_client.get("/tasks", params={"completed": True}).json()
+        assert [task["id"] for task in listed["tasks"]] == [task_id]
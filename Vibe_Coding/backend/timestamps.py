@@ -0,0 +1,84 @@
+"""
+Almacenamiento de fechas de las tareas.
+
+Por defecto SQLAlchemy guarda DateTime en SQLite como texto ISO
+("YYYY-MM-DD HH:MM:SS.ffffff", 26 bytes por valor y por entrada de
+índice). Con QUICKTASK_TIMESTAMP_STORAGE=epoch_us las columnas de fecha
+de 'tasks' y 'tasks_archive' guardan microsegundos desde 1970 (UTC) como
+INTEGER: 8 bytes o menos y comparaciones numéricas. Los schemas de
+Pydantic siguen exponiendo ISO 8601.
+
+En ambos modos los valores se guardan en UTC sin zona: las fechas con
+zona horaria se convierten a UTC antes de guardarse o compararse.
+La migración (migrations.convert_timestamps) pasa los datos existentes
+al formato configurado.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import BigInteger, DateTime
+from sqlalchemy.types import TypeDecorator
+
+import config
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def to_utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+    """Fecha con zona -> UTC sin zona; las fechas sin zona ya son UTC"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def to_epoch_us(value: datetime) -> int:
+    """Microsegundos desde 1970-01-01 UTC (exacto, sin pasar por float)"""
+    return (to_utc_naive(value) - EPOCH) // MICROSECOND
+
+
+def from_epoch_us(value: int) -> datetime:
+    return EPOCH + timedelta(microseconds=value)
+
+
+class EpochMicros(TypeDecorator):
+    """
+    datetime en Python, INTEGER de microsegundos desde 1970 en SQLite.
+    """
+    impl = BigInteger
+    cache_ok = True
+
+    def coerce_compared_value(self, op, value):
+        # Aritmética con enteros (p. ej. `columna % 1000000`) no es una fecha
+        if isinstance(value, int):
+            return BigInteger()
+        return self
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return to_epoch_us(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, str):
+            # Fila aún sin migrar
+            return datetime.fromisoformat(value)
+        return from_epoch_us(value)
+
+
+class UtcDateTime(TypeDecorator):
+    """
+    DateTime de texto que convierte a UTC las fechas con zona horaria
+    (DateTime de SQLite descartaría la zona y guardaría la hora local).
+    """
+    impl = DateTime
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return to_utc_naive(value)
+
+
+# Tipo de las columnas de fecha de las tareas
+Timestamp = EpochMicros if config.TIMESTAMP_STORAGE == "epoch_us" else UtcDateTime
@@ -0,0 +1,172 @@
+"""
+Soporte para servir la API con varios procesos (gunicorn + UvicornWorker).
+
+- Número de workers a partir de la cuota de CPU del contenedor (cgroups).
+- Reinicio de los engines tras el fork: cada worker abre sus propias
+  conexiones SQLite en vez de heredar las del proceso maestro.
+- Un solo worker (el que obtiene un lock de archivo) corre los trabajos
+  en segundo plano: archivado, purga, backups y recordatorios.
+- Vigilancia de memoria: un worker que supera el límite de RSS se
+  reinicia de forma ordenada (termina lo que tiene en curso).
+
+Este módulo no importa config a nivel de módulo: gunicorn_conf.py lo usa
+antes de fijar QUICKTASK_WORKERS, que config lee al importarse.
+"""
+import math
+import os
+import signal
+import threading
+from typing import IO, Optional
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cpu_quota(cgroup_root: str = CGROUP_ROOT) -> Optional[float]:
+    """
+    CPUs asignadas por la cuota de cgroups (v2 `cpu.max` o v1
+    `cpu.cfs_quota_us`/`cpu.cfs_period_us`). None si no hay límite.
+    """
+    cpu_max = _read(os.path.join(cgroup_root, "cpu.max"))
+    if cpu_max:
+        quota, _, period = cpu_max.partition(" ")
+        if quota != "max" and period:
+            return int(quota) / int(period)
+        return None
+
+    quota = _read(os.path.join(cgroup_root, "cpu", "cpu.cfs_quota_us"))
+    period = _read(os.path.join(cgroup_root, "cpu", "cpu.cfs_period_us"))
+    if quota and period and int(quota) > 0:
+        return int(quota) / int(period)
+    return None
+
+
+def available_cpus() -> int:
+    """CPUs en las que puede correr el proceso (afinidad, si existe)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def worker_count(environ=os.environ, cgroup_root: str = CGROUP_ROOT) -> int:
+    """
+    Workers a lanzar. Por defecto uno por CPU de la cuota (redondeando
+    hacia arriba, sin pasar de las CPUs visibles): cada UvicornWorker es
+    asíncrono, así que más procesos que núcleos solo agregan cambios de
+    contexto y conexiones SQLite.
+
+    QUICKTASK_WEB_CONCURRENCY (o WEB_CONCURRENCY) fija el valor a mano.
+    El backend en memoria siempre usa un worker: cada proceso tendría su
+    propia copia de las tareas.
+    """
+    if environ.get("QUICKTASK_STORAGE_BACKEND", "sql") == "memory":
+        return 1
+    explicit = environ.get("QUICKTASK_WEB_CONCURRENCY") or environ.get("WEB_CONCURRENCY")
+    if explicit:
+        return max(1, int(explicit))
+    cpus = available_cpus()
+    quota = cpu_quota(cgroup_root)
+    if quota is not None:
+        cpus = min(cpus, math.ceil(quota))
+    return max(1, cpus)
+
+
+def after_fork() -> None:
+    """
+    Descarta, sin cerrarlas, las conexiones heredadas del maestro.
+
+    Con preload_app el maestro importa main (que crea las tablas y corre
+    las migraciones), así que el pool ya tiene conexiones abiertas. Usar
+    un handle SQLite en dos procesos corrompe los locks; close=False deja
+    que el maestro las siga siendo dueño y el worker abre las suyas.
+    """
+    import database
+
+    database.engine.dispose(close=False)
+    if database.shards is not None:
+        for shard_engine in database.shards.engines:
+            shard_engine.dispose(close=False)
+
+
+def acquire_jobs_lock(path: str) -> Optional[IO]:
+    """
+    Intenta quedarse con el lock de los trabajos en segundo plano.
+    Retorna el archivo abierto (hay que mantenerlo vivo) o None si otro
+    worker ya lo tiene. El sistema operativo lo libera si el worker muere,
+    y el reemplazo que lanza gunicorn puede tomarlo en su arranque.
+    """
+    import fcntl
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    lock_file = open(path, "a")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+def current_rss_bytes() -> int:
+    """Memoria residente del proceso (Linux: /proc/self/statm)"""
+    statm = _read("/proc/self/statm")
+    if statm:
+        return int(statm.split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    import resource
+
+    # Sin /proc solo queda el pico (ru_maxrss, en KB en Linux)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class MemoryWatchdog:
+    """
+    Reinicia el worker de forma ordenada al superar `max_rss_bytes`.
+
+    Envía SIGTERM al propio proceso: UvicornWorker deja de aceptar
+    conexiones, termina los requests en curso (hasta graceful_timeout) y
+    el maestro de gunicorn lanza un reemplazo. Complementa max_requests,
+    que recicla por número de requests sin mirar la memoria.
+    """
+
+    def __init__(self, max_rss_bytes: int, interval_seconds: float = 10.0,
+                 rss=current_rss_bytes, kill=os.kill):
+        self.max_rss_bytes = max_rss_bytes
+        self.interval_seconds = interval_seconds
+        self._rss = rss
+        self._kill = kill
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.triggered = False
+
+    def check(self) -> bool:
+        """Retorna True si pidió el reinicio"""
+        if self.triggered or self._rss() <= self.max_rss_bytes:
+            return False
+        self.triggered = True
+        self._kill(os.getpid(), signal.SIGTERM)
+        return True
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_seconds):
+            if self.check():
+                return
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="memory-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
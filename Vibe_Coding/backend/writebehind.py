@@ -0,0 +1,209 @@
+"""
+Buffer write-behind para cambios de estado completado.
+
+Los clientes tipo checklist envían ráfagas de PATCH {"completed": ...}.
+Con el modo write-behind activo, cada cambio se guarda en un mapa en
+memoria (gana la última escritura por tarea) y un hilo lo vuelca a
+SQLite en un único UPDATE cada pocos milisegundos o al juntar N
+entradas. Las lecturas ven el valor del buffer de inmediato: la tarea
+individual lo superpone y los listados vacían el buffer antes de leer.
+Las demás escrituras también lo vacían primero, para conservar el orden.
+"""
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Optional
+
+from sqlalchemy import case, literal, update
+from sqlalchemy.orm import Session
+
+import cache
+import config
+import events
+from crud import SQLITE_MAX_VARIABLES
+from database import SessionLocal
+from models import Task
+
+logger = logging.getLogger(__name__)
+
+
+class CompletionBuffer:
+    """
+    Mapa acotado task_id -> completed con volcado periódico por lotes.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[..., Session],
+        enabled: bool = False,
+        interval_ms: float = 50,
+        flush_entries: int = 256,
+        max_entries: int = 10000
+    ):
+        self.session_factory = session_factory
+        self.enabled = enabled
+        self.interval_ms = interval_ms
+        self.flush_entries = flush_entries
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending: dict[int, bool] = {}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.recorded = 0
+        self.coalesced = 0
+        self.forced_flushes = 0
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.last_flush_ms = 0.0
+
+    def record(self, task_id: int, completed: bool) -> None:
+        """
+        Guarda un cambio de estado. Si el buffer está lleno se vuelca en
+        el hilo que llama (contrapresión) antes de aceptar la entrada.
+        """
+        with self._lock:
+            full = task_id not in self._pending and len(self._pending) >= self.max_entries
+        if full:
+            self.forced_flushes += 1
+            self.flush()
+        with self._lock:
+            if task_id in self._pending:
+                self.coalesced += 1
+            self._pending[task_id] = completed
+            self.recorded += 1
+            size = len(self._pending)
+        if size >= self.flush_entries:
+            self._wake.set()
+
+    def get(self, task_id: int) -> Optional[bool]:
+        """
+        Valor pendiente de la tarea, o None si no hay cambios en el buffer.
+        """
+        with self._lock:
+            return self._pending.get(task_id)
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def flush(self) -> int:
+        """
+        Vuelca los cambios pendientes en una transacción.
+
+        Returns:
+            Número de tareas cuyo estado cambió
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                pending, self._pending = self._pending, {}
+            started = time.perf_counter()
+            db = self.session_factory(expire_on_commit=False)
+            try:
+                changed = self._write(db, pending)
+                db.commit()
+            except Exception:
+                db.rollback()
+                db.close()
+                # Reencolar lo no sobrescrito mientras tanto
+                with self._lock:
+                    for task_id, completed in pending.items():
+                        self._pending.setdefault(task_id, completed)
+                raise
+            if changed:
+                cache.write_generation.bump()
+            for task in changed:
+                events.hub.publish("updated", task.id, task)
+            db.close()
+            self.flushes += 1
+            self.flushed_rows += len(changed)
+            self.last_flush_ms = (time.perf_counter() - started) * 1000
+            return len(changed)
+
+    def _write(self, db: Session, pending: dict[int, bool]) -> list[Task]:
+        """
+        Un UPDATE por bloque de IDs: solo toca las filas cuyo estado cambia.
+        """
+        now = datetime.utcnow()
+        ids = list(pending)
+        changed: list[Task] = []
+        # Cada ID aparece dos veces en la sentencia (WHERE y CASE)
+        chunk_size = SQLITE_MAX_VARIABLES // 2
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            done = [task_id for task_id in chunk if pending[task_id]]
+            target = case((Task.id.in_(done), True), else_=False) if done else False
+            changed += db.scalars(
+                update(Task)
+                .where(Task.id.in_(chunk), Task.deleted_at.is_(None), Task.completed != target)
+                .values(
+                    completed=target,
+                    completed_at=(
+                        case((Task.id.in_(done), literal(now, Task.completed_at.type)), else_=None)
+                        if done else None
+                    ),
+                    version=Task.version + 1,
+                )
+                .returning(Task),
+                execution_options={"synchronize_session": False},
+            ).all()
+        return changed
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.interval_ms / 1000)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Error volcando el buffer write-behind")
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Detiene el hilo y vuelca lo pendiente (apagado ordenado).
+        """
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "pending": self.pending,
+            "max_entries": self.max_entries,
+            "recorded": self.recorded,
+            "coalesced": self.coalesced,
+            "forced_flushes": self.forced_flushes,
+            "flushes": self.flushes,
+            "flushed_rows": self.flushed_rows,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+        }
+
+
+# Buffer global del proceso (solo con QUICKTASK_WRITE_BEHIND_ENABLED y el
+# backend SQL de un solo archivo: con shards los IDs se repiten entre archivos;
+# con varios workers otro proceso leería la fila sin el cambio pendiente)
+buffer = CompletionBuffer(
+    SessionLocal,
+    enabled=(
+        config.WRITE_BEHIND_ENABLED
+        and config.STORAGE_BACKEND == "sql"
+        and config.SHARD_COUNT <= 1
+        and config.WORKERS <= 1
+    ),
+    interval_ms=config.WRITE_BEHIND_INTERVAL_MS,
+    flush_entries=config.WRITE_BEHIND_FLUSH_ENTRIES,
+    max_entries=config.WRITE_BEHIND_MAX_ENTRIES,
+)